@@ -19,6 +19,10 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 
 from utils.user import User
 from utils.config_loader import load_config
+from utils.storage_backends import get_storage
+from utils.media_cache import start_media_cache_warm_up
+from utils.media_manifest import configure_media_manifest, list_videos
+from utils.counterbalancing import precompute_orderings
 
 # Page configuration
 st.set_page_config(
@@ -62,6 +66,31 @@ def init_session_state():
     if 'user_id_confirmed' not in st.session_state:
         st.session_state.user_id_confirmed = False
 
+    # Warm the process-wide storage backends and their indexes (no-op after the first session)
+    if st.session_state.config:
+        try:
+            get_storage(st.session_state.config)
+        except Exception as e:
+            print(f"[WARNING] Failed to warm storage backends: {e}")
+
+        # Load the media manifest once per process and watch the media folders
+        try:
+            configure_media_manifest(st.session_state.config)
+        except Exception as e:
+            print(f"[WARNING] Failed to load media manifest: {e}")
+
+        # Build the counterbalanced presentation orders for the configured session length
+        try:
+            precompute_orderings(
+                st.session_state.config,
+                len(list_videos(st.session_state.config['paths']['video_path']))
+            )
+        except Exception as e:
+            print(f"[WARNING] Failed to precompute presentation orders: {e}")
+
+        # Pre-encode the stimulus set in the background (if settings.media_cache.warm_up)
+        start_media_cache_warm_up(st.session_state.config)
+
 # Navigation function
 def navigate_to(page_name):
     """Navigate to a specific page."""
@@ -7,11 +7,14 @@ import streamlit as st
 import streamlit.components.v1 as components
 import os
 import pandas as pd
-import base64
 
 from utils.config_loader import load_rating_scales
-from utils.video_rating_display import display_video_rating_interface
+from utils.video_rating_display import display_video_rating_interface, ONCE_MODE_STOP_SECONDS
 from utils.gdrive_manager import get_all_video_filenames, get_video_path
+from utils.media_manifest import get_media_entry
+from utils.media_server import get_video_sources, get_source_tags
+from utils.renditions import select_video_sources
+from utils.device_detection import get_device_info_cached
 
 def display_video_with_mode(video_file_path, playback_mode='loop', video_width=None, enable_auto_advance=False):
     """
@@ -25,12 +28,15 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
     - video_width: Width of video in pixels
     - enable_auto_advance: If True, trigger Streamlit rerun when video ends
     """
-    if not os.path.exists(video_file_path):
+    if get_media_entry(video_file_path) is None:
         st.error(f"Video file not found: {video_file_path}")
         return
 
     if playback_mode == 'loop':
-        # Loop mode: autoplay with controls and looping
+        # Loop mode: autoplay with controls and looping (smallest H.264 rendition covering the player)
+        video_file_path = select_video_sources(
+            video_file_path, st.session_state.get('config'), st.session_state.get('device_info'), video_width
+        )[-1]['path']
         if video_width:
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
@@ -40,9 +46,9 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
 
     elif playback_mode == 'once':
         # Once mode: Play for 2 seconds, then stop and show black first frame
-        with open(video_file_path, 'rb') as f:
-            video_bytes = f.read()
-        video_base64 = base64.b64encode(video_bytes).decode()
+        # Reference the video by URL (or data: URI fallback), see settings.media_delivery;
+        # smallest renditions covering the player, best codec first
+        source_tags = get_source_tags(get_video_sources(video_file_path, st.session_state.get('config'), video_width))
 
         # Determine width style
         if video_width:
@@ -60,9 +66,11 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
                 id="main-video-fam"
                 autoplay
                 muted
+                playsinline
+                preload="auto"
                 style="{width_style} max-height: 85vh; height: auto; object-fit: contain;"
             >
-                <source src="data:video/mp4;base64,{video_base64}" type="video/mp4">
+                {source_tags}
                 Your browser does not support the video tag.
             </video>
         </div>
@@ -79,7 +87,7 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
             
             // Play for 2 seconds, then pause and reset to first frame (black screen)
             video.addEventListener('timeupdate', function() {{
-                if (video.currentTime >= 2.0) {{
+                if (video.currentTime >= {ONCE_MODE_STOP_SECONDS}) {{
                     video.pause();
                     video.currentTime = 0;
                 }}
@@ -179,6 +187,9 @@ def show():
         st.error("Configuration not loaded. Please restart the application.")
         return
 
+    # Detect device information early (used to pick video renditions)
+    get_device_info_cached()
+
     # Initialize familiarization state
     if 'familiarization_initialized' not in st.session_state:
         initialize_familiarization(config)
@@ -251,23 +262,13 @@ def initialize_familiarization(config):
         if scale.get('required_to_proceed', True) and not scale.get('group')
     ]
 
-    # Get videos from local filesystem
+    # Get videos from the in-memory media manifest (sorted: same order for all users)
     familiarization_path = config['paths'].get('familiarization_video_path', 'videos_familiarization')
-    try:
-        all_videos = [f for f in os.listdir(familiarization_path) if f.lower().endswith('.mp4')]
-        # Sort to ensure consistent order for all users
-        all_videos.sort()
-        print(f"[INFO] Found {len(all_videos)} familiarization videos in {familiarization_path}")
-        st.session_state.familiarization_path = familiarization_path
-    except FileNotFoundError:
+    all_videos = get_all_video_filenames(familiarization_path)
+    st.session_state.familiarization_path = familiarization_path
+    if not all_videos and not os.path.isdir(familiarization_path):
         st.error(f"Familiarization video directory not found: {familiarization_path}")
-        print(f"[ERROR] Directory not found: {familiarization_path}")
         print(f"[INFO] Current working directory: {os.getcwd()}")
-        all_videos = []
-    except Exception as e:
-        st.error(f"Error loading familiarization videos: {e}")
-        print(f"[ERROR] Error loading videos from {familiarization_path}: {e}")
-        all_videos = []
 
     # Store in session state
     st.session_state.familiarization_videos = all_videos
@@ -7,144 +7,78 @@ import streamlit as st
 import streamlit.components.v1 as components
 import os
 import pandas as pd
-import random
-import base64
+import numpy as np
+import threading
 from io import BytesIO
 
 from utils.config_loader import load_rating_scales
-from utils.data_persistence import save_rating, get_rated_videos_for_user
-from utils.video_rating_display import display_video_rating_interface
+from utils.data_persistence import (
+    save_rating, get_rated_videos_for_user, get_videos_below_quota, get_rating_counts,
+    reserve_videos, release_session_leases
+)
+from utils.video_rating_display import (
+    display_video_rating_interface, find_stimulus_image, IMAGE_EXTENSIONS, ONCE_MODE_STOP_SECONDS
+)
 from utils.gdrive_manager import get_all_video_filenames, get_video_path
+from utils.media_manifest import get_media_entry
+from utils.media_server import get_video_src, get_video_sources, get_source_tags
+from utils.renditions import select_video_sources
 from utils.device_detection import get_device_info_cached
-
-def stratified_sample_videos(videos_to_rate, df_metadata, number_of_videos, strat_config):
+from utils.stratified_sampler import stratified_sample
+from utils.assignment import get_assignment_policy, least_rated_first
+from utils.video_leases import is_leasing_enabled
+from utils.session_plans import is_session_plans_enabled, get_plan_store, plan_fingerprint, plan_rng, plan_seed
+from utils.media_probe import file_hash
+from utils.counterbalancing import presentation_order
+
+# Process-wide metadata cache: path -> ((size, mtime_ns), DataFrame, content hash)
+_metadata_cache = {}
+_metadata_cache_lock = threading.Lock()
+
+def stratified_sample_videos(videos_to_rate, df_metadata, number_of_videos, strat_config, rng=None):
     """
     Perform hierarchical stratified sampling of videos based on metadata variables.
 
     Priority-based approach: First variable has highest priority in ensuring balance,
     then within each first-level stratum, second variable is applied, and so on.
+    Quotas use largest-remainder rounding, so exactly number_of_videos are selected
+    when enough videos are available (see utils/stratified_sampler.py).
 
     Args:
         videos_to_rate: List of video filenames (e.g., ['event_001.mp4', ...])
         df_metadata: DataFrame with metadata including 'id' column matching video IDs
         number_of_videos: Target number of videos to select (None = all available)
         strat_config: List of stratification configs, each with 'variable', 'levels', 'proportions'
+        rng: numpy Generator for sampling (default: fresh, unseeded)
 
     Returns:
-        List of selected video filenames (shuffled)
+        List of selected video filenames (not yet in presentation order, see
+        utils/counterbalancing.presentation_order)
     """
+    rng = rng if rng is not None else np.random.default_rng()
+
     # If no stratification config or empty, use simple random sampling
     if not strat_config or len(strat_config) == 0:
         if number_of_videos and number_of_videos < len(videos_to_rate):
-            selected = random.sample(videos_to_rate, number_of_videos)
-            random.shuffle(selected)
-            return selected
-        else:
-            random.shuffle(videos_to_rate)
-            return videos_to_rate
+            picks = rng.choice(len(videos_to_rate), number_of_videos, replace=False)
+            return [videos_to_rate[i] for i in sorted(picks)]
+        return list(videos_to_rate)
 
     # Get event IDs from video filenames
     event_ids = [v.replace('.mp4', '') for v in videos_to_rate]
 
     # Filter metadata to only available videos
-    df = df_metadata[df_metadata['id'].isin(event_ids)].copy()
+    df = df_metadata[df_metadata['id'].isin(event_ids)]
 
     if df.empty:
         print("[WARNING] No metadata found for available videos")
         return videos_to_rate
 
-    # Determine target count
-    target = number_of_videos if number_of_videos else len(df)
-    target = min(target, len(df))  # Cap at available
-
     # Apply hierarchical stratification
-    selected_ids = _stratified_sample_recursive(df, strat_config, target, 0)
+    selected_ids = stratified_sample(df, strat_config, number_of_videos or None, rng)
 
     # Convert back to video filenames
-    selected_videos = [vid_id + '.mp4' for vid_id in selected_ids]
-
-    # Shuffle to randomize presentation order within strata
-    random.shuffle(selected_videos)
-
-    return selected_videos
-
-
-def _stratified_sample_recursive(df, strat_config, target_count, level):
-    """
-    Recursively apply stratification by each variable in hierarchy.
-
-    Args:
-        df: DataFrame of available videos at this level
-        strat_config: Full stratification configuration
-        target_count: Number of videos to select at this level
-        level: Current stratification level (0-indexed)
-
-    Returns:
-        List of selected video IDs
-    """
-    # Base case: no more stratification levels
-    if level >= len(strat_config):
-        # Sample randomly from remaining videos
-        if target_count and target_count < len(df):
-            sampled = df.sample(n=target_count, replace=False)
-            return sampled['id'].tolist()
-        else:
-            return df['id'].tolist()
-
-    # Get current stratification variable configuration
-    var_config = strat_config[level]
-    variable = var_config.get('variable')
-    levels_list = var_config.get('levels', [])
-    proportions = var_config.get('proportions', [])
-
-    # Validate configuration
-    if not variable or not levels_list or not proportions:
-        print(f"[WARNING] Invalid stratification config at level {level}: {var_config}")
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
-
-    if len(levels_list) != len(proportions):
-        print(f"[WARNING] Levels and proportions length mismatch for '{variable}'")
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
-
-    if abs(sum(proportions) - 1.0) > 0.01:
-        print(f"[WARNING] Proportions for '{variable}' don't sum to 1.0: {sum(proportions)}")
-
-    # Check if variable exists in metadata
-    if variable not in df.columns:
-        print(f"[WARNING] Variable '{variable}' not found in metadata. Skipping stratification.")
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
-
-    # Filter to only specified levels
-    df_filtered = df[df[variable].isin(levels_list)]
-
-    if len(df_filtered) == 0:
-        print(f"[WARNING] No videos found for '{variable}' with levels {levels_list}")
-        # Fallback: return from unfiltered
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
-
-    # Calculate target counts per level and sample
-    selected_ids = []
-
-    for i, level_value in enumerate(levels_list):
-        level_df = df_filtered[df_filtered[variable] == level_value]
-
-        if len(level_df) == 0:
-            print(f"[INFO] No videos for {variable}={level_value}, skipping")
-            continue
-
-        # Calculate target count for this level based on proportion
-        level_target = int(round(target_count * proportions[i])) if target_count else None
-
-        # If too few videos available, take all
-        if level_target and len(level_df) < level_target:
-            print(f"[INFO] {variable}={level_value}: requested {level_target}, only {len(level_df)} available. Taking all.")
-            level_target = len(level_df)
-
-        # Recursively stratify by next variable within this stratum
-        level_selected = _stratified_sample_recursive(level_df, strat_config, level_target, level + 1)
-        selected_ids.extend(level_selected)
-
-    return selected_ids
+    return [vid_id + '.mp4' for vid_id in selected_ids]
 
 def display_video_with_mode(video_file_path, playback_mode='loop', video_width=None, enable_auto_advance=False):
     """
@@ -158,12 +92,15 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
     - video_width: Width of video in pixels (for centered display) or percentage string
     - enable_auto_advance: If True, trigger Streamlit rerun when video ends
     """
-    if not os.path.exists(video_file_path):
+    if get_media_entry(video_file_path) is None:
         st.error(f"Video file not found: {video_file_path}")
         return
 
     if playback_mode == 'loop':
-        # Loop mode: autoplay with controls and looping
+        # Loop mode: autoplay with controls and looping (smallest H.264 rendition covering the player)
+        video_file_path = select_video_sources(
+            video_file_path, st.session_state.get('config'), st.session_state.get('device_info'), video_width
+        )[-1]['path']
         if video_width:
             # Centered with specified width
             col1, col2, col3 = st.columns([1, 2, 1])
@@ -174,9 +111,9 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
 
     elif playback_mode == 'once':
         # Once mode: Play for 2 seconds, then stop and show black first frame
-        with open(video_file_path, 'rb') as f:
-            video_bytes = f.read()
-        video_base64 = base64.b64encode(video_bytes).decode()
+        # Reference the video by URL (or data: URI fallback), see settings.media_delivery;
+        # smallest renditions covering the player, best codec first
+        source_tags = get_source_tags(get_video_sources(video_file_path, st.session_state.get('config'), video_width))
 
         # Determine width style
         if video_width:
@@ -194,9 +131,11 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
                 id="main-video"
                 autoplay
                 muted
+                playsinline
+                preload="auto"
                 style="{width_style} max-height: 85vh; height: auto; object-fit: contain;"
             >
-                <source src="data:video/mp4;base64,{video_base64}" type="video/mp4">
+                {source_tags}
                 Your browser does not support the video tag.
             </video>
         </div>
@@ -213,7 +152,7 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
             
             // Play for 2 seconds, then pause and reset to first frame (black screen)
             video.addEventListener('timeupdate', function() {{
-                if (video.currentTime >= 2.0) {{
+                if (video.currentTime >= {ONCE_MODE_STOP_SECONDS}) {{
                     video.pause();
                     video.currentTime = 0;
                 }}
@@ -227,6 +166,93 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
         st.video(video_file_path)
 
 
+def get_trial_metadata(action_id):
+    """
+    Return the metadata row(s) for a trial, prepared ahead by prepare_upcoming_trials.
+
+    Parameters:
+    - action_id: Video/action ID
+
+    Returns:
+    - DataFrame slice of st.session_state.metadata for this ID (empty if unavailable)
+    """
+    prepared = st.session_state.setdefault('prepared_trials', {})
+    trial = prepared.get(action_id)
+    if trial is None:
+        metadata = st.session_state.get('metadata')
+        if metadata is not None and not metadata.empty and 'id' in metadata.columns:
+            metadata = metadata[metadata['id'] == action_id]
+        trial = prepared[action_id] = {'metadata': metadata, 'video_sources': None}
+    return trial['metadata']
+
+
+def prepare_upcoming_trials(config):
+    """
+    Prepare the next trials while the participant is rating the current one.
+
+    For the next settings.preload_lookahead videos in videos_to_rate, the
+    metadata row is looked up and the media payload is prepared (published
+    for URL delivery, encoded into the shared cache for inline delivery).
+
+    Returns:
+    - List of source lists [(url, MIME type), ...] the browser should start fetching
+      (empty for inline delivery)
+    """
+    lookahead = int(config['settings'].get('preload_lookahead', 1) or 0)
+    videos = st.session_state.get('videos_to_rate', [])
+    current_index = st.session_state.get('current_video_index', 0)
+    once_mode = config['settings'].get('video_playback_mode', 'loop') == 'once'
+    # Same player width as display_video_only / the combined layout, so the same rendition is fetched
+    video_width = config['settings'].get('video_width', 800) if config['settings'].get('display_mode') == 'separate' else None
+
+    prepared = st.session_state.setdefault('prepared_trials', {})
+    upcoming = videos[current_index + 1:current_index + 1 + lookahead] if lookahead > 0 else []
+    keep_ids = {os.path.splitext(v)[0] for v in videos[current_index:current_index + 1 + lookahead]}
+
+    # Drop trials that are already done
+    for action_id in [a for a in prepared if a not in keep_ids]:
+        del prepared[action_id]
+
+    preload_sources = []
+    for video_filename in upcoming:
+        action_id = os.path.splitext(video_filename)[0]
+        get_trial_metadata(action_id)
+        trial = prepared[action_id]
+
+        if once_mode and trial['video_sources'] is None:
+            video_file_path = os.path.join(st.session_state.video_path, video_filename)
+            image_file_path = None
+            if config['settings'].get('stimulus_type', 'video') == 'image':
+                image_file_path = find_stimulus_image(video_file_path, config)
+            try:
+                if image_file_path:
+                    trial['video_sources'] = [(get_video_src(image_file_path, config), None)]
+                else:
+                    trial['video_sources'] = get_video_sources(video_file_path, config, video_width)
+            except OSError as e:
+                print(f"[WARNING] Failed to prepare {video_filename}: {e}")
+                continue
+
+        if trial['video_sources'] and not trial['video_sources'][0][0].startswith('data:'):
+            preload_sources.append(trial['video_sources'])
+
+    return preload_sources
+
+
+def render_media_preload(config):
+    """Prepare upcoming trials and let the browser start fetching their media (hidden elements)."""
+    preload_sources = prepare_upcoming_trials(config)
+    if not preload_sources:
+        return
+
+    preload_tags = ''.join(
+        f'<img src="{sources[0][0]}" alt="">' if sources[0][0].split('?')[0].lower().endswith(IMAGE_EXTENSIONS)
+        else f'<video preload="auto" muted playsinline>{get_source_tags(sources)}</video>'
+        for sources in preload_sources
+    )
+    components.html(f'<div style="display: none;">{preload_tags}</div>', height=0)
+
+
 def show():
     """Display the video player screen."""
     user = st.session_state.user
@@ -236,6 +262,10 @@ def show():
         st.error("Configuration not loaded. Please restart the application.")
         return
 
+    # Detect and cache device information (attached to each rating, used to pick video renditions);
+    # repeated on each run until the browser has reported its window size
+    get_device_info_cached()
+
     # Initialize video player state
     if 'video_initialized' not in st.session_state:
         initialize_video_player(config)
@@ -251,6 +281,8 @@ def show():
     videos = st.session_state.videos_to_rate
 
     if current_video_index >= len(videos):
+        # All assigned videos rated: free any leases left over
+        release_session_leases()
         st.session_state.page = 'completion'
         st.rerun()
         return
@@ -282,7 +314,7 @@ def show():
 def display_video_screen(action_id, video_filename, config):
     """Display only the video (centered, no ratings)."""
     video_path = st.session_state.video_path
-    metadata = st.session_state.metadata
+    metadata = get_trial_metadata(action_id)
     rating_scales = st.session_state.rating_scales
 
     # Add custom CSS to eliminate vertical spacing
@@ -361,6 +393,9 @@ def display_rating_screen(action_id, video_filename, config):
         display_mode='rating_only'
     )
 
+    # While the participant rates, fetch the next trial's media
+    render_media_preload(config)
+
     # Navigation buttons
     col1, col2, col3 = st.columns([1, 1, 1])
 
@@ -396,10 +431,6 @@ def display_rating_screen(action_id, video_filename, config):
                 st.session_state.current_screen = 'video'  # Reset to video screen for next video
                 st.session_state.confirm_back = False
 
-                # Small delay to show success message
-                import time
-                time.sleep(0.5)
-
                 # Clear and move to next video
                 st.rerun()
             else:
@@ -415,10 +446,6 @@ def initialize_video_player(config):
     if 'session_ratings' not in st.session_state:
         st.session_state.session_ratings = {}
 
-    # Detect and cache device information (once per session)
-    # This will be attached to each rating submitted
-    device_info = get_device_info_cached()
-
     # Load rating scales (now returns dict with scales, groups, and requirements)
     rating_data = load_rating_scales(config)
     st.session_state.rating_scales = rating_data['scales']
@@ -434,95 +461,268 @@ def initialize_video_player(config):
     # Get configuration
     metadata_path = config['paths']['metadata_path']
     video_path = config['paths']['video_path']
-    min_ratings_per_video = config['settings']['min_ratings_per_video']
+    st.session_state.video_path = video_path
 
-    # Get all video files from local filesystem
-    try:
-        all_videos = [f for f in os.listdir(video_path) if f.lower().endswith('.mp4')]
-        st.session_state.video_path = video_path
-        print(f"[INFO] Loaded {len(all_videos)} videos from {video_path}")
-    except FileNotFoundError:
-        st.error(f"Video directory not found: {video_path}")
-        all_videos = []
+    # Load FULL metadata (keep all rows for completion screen); cached per process
+    df_metadata_full, metadata_hash = load_metadata(metadata_path)
+    st.session_state.metadata = df_metadata_full
 
-    # Filter out videos already rated by this user
-    videos_rated_by_user = get_rated_videos_for_user(user.user_id)
-    unrated_videos = [v for v in all_videos if v.replace('.mp4', '') not in videos_rated_by_user]
+    if is_session_plans_enabled(config):
+        # Seeded plan stored per user: returning users resume without re-sampling
+        videos_to_rate, current_video_index = resume_or_create_plan(user, config, df_metadata_full, metadata_hash)
+    else:
+        videos_to_rate = assign_videos(user, config, df_metadata_full)
+        current_video_index = 0
 
-    # Count total ratings per video and filter out fully-rated videos
+    # Store in session state
+    st.session_state.videos_to_rate = videos_to_rate
+    st.session_state.current_video_index = current_video_index
+    st.session_state.video_initialized = True
+
+def load_metadata(metadata_path):
+    """
+    Load the video metadata (CSV or DuckDB), cached per process until the file changes.
+
+    Parameters:
+    - metadata_path: Path to the metadata file
+
+    Returns:
+    - Tuple (DataFrame with all rows, or empty on error; content hash of the file, or None)
+    """
     try:
-        rated_files = os.listdir('user_ratings')
-        rated_ids = [f.split('_')[1].replace('.json', '') for f in rated_files if f.endswith('.json')]
-        rating_counts = pd.Series(rated_ids).value_counts()
-        videos_fully_rated = rating_counts[rating_counts >= min_ratings_per_video].index.tolist()
-        videos_to_rate = [v for v in unrated_videos if v.replace('.mp4', '') not in videos_fully_rated]
-    except Exception as e:
-        print(f"[WARNING] Error filtering fully-rated videos: {e}")
-        videos_to_rate = unrated_videos
+        stat_result = os.stat(metadata_path)
+        stamp = (stat_result.st_size, stat_result.st_mtime_ns)
+    except OSError as e:
+        print(f"[WARNING] Failed to load metadata: {e}")
+        return pd.DataFrame(), None
+
+    with _metadata_cache_lock:
+        cached = _metadata_cache.get(metadata_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
 
-    # Load FULL metadata (keep all rows for completion screen)
-    df_metadata_full = pd.DataFrame()
-    df_metadata_filtered = pd.DataFrame()
     try:
         # Detect file type and load metadata accordingly
         if metadata_path.endswith('.duckdb'):
             # Load from DuckDB (lazy import to avoid binary conflicts on Streamlit Cloud)
             import duckdb
             conn = duckdb.connect(metadata_path, read_only=True)
-            df_metadata_full = conn.execute("SELECT * FROM events").fetchdf()
+            df_metadata = conn.execute("SELECT * FROM events").fetchdf()
             conn.close()
         elif metadata_path.endswith('.csv'):
             # Load FULL CSV (don't filter yet - needed for completion screen)
-            df_metadata_full = pd.read_csv(metadata_path)
+            df_metadata = pd.read_csv(metadata_path)
         else:
             print(f"[WARNING] Unsupported metadata file type: {metadata_path}")
-            df_metadata_full = pd.DataFrame()
+            df_metadata = pd.DataFrame()
+        metadata_hash = file_hash(metadata_path)
+    except Exception as e:
+        print(f"[WARNING] Failed to load metadata: {e}")
+        return pd.DataFrame(), None
 
-        # Create filtered version for stratification (only videos available to rate)
-        if videos_to_rate and not df_metadata_full.empty:
-            event_ids = [v.replace('.mp4', '') for v in videos_to_rate]
-            df_metadata_filtered = df_metadata_full[df_metadata_full['id'].isin(event_ids)]
-        else:
-            df_metadata_filtered = df_metadata_full.copy()
+    with _metadata_cache_lock:
+        _metadata_cache[metadata_path] = (stamp, df_metadata, metadata_hash)
+    return df_metadata, metadata_hash
 
+def assign_videos(user, config, df_metadata_full, rng=None, draw_inputs=None):
+    """
+    Choose a session's videos among those the user has not rated and that are below quota.
+
+    Parameters:
+    - user: User object
+    - config: Configuration dictionary
+    - df_metadata_full: Metadata of all videos
+    - rng: numpy Generator for all random draws (default: fresh, unseeded)
+    - draw_inputs: Optional dict, filled with the candidate IDs and the rating counts
+      (plus other sessions' leases) the draw used, so a session plan can be replayed
+
+    Returns:
+    - List of video filenames in presentation order
+    """
+    video_path = config['paths']['video_path']
+    min_ratings_per_video = config['settings']['min_ratings_per_video']
+
+    # Get all video files from the in-memory media manifest (sorted, so seeded draws are reproducible)
+    all_videos = sorted(get_all_video_filenames(video_path))
+    if not all_videos and not os.path.isdir(video_path):
+        st.error(f"Video directory not found: {video_path}")
+
+    # Filter out videos already rated by this user
+    videos_rated_by_user = get_rated_videos_for_user(user.user_id)
+    unrated_videos = [v for v in all_videos if v.replace('.mp4', '') not in videos_rated_by_user]
+
+    # Filter out fully-rated videos using the shared rating count index
+    try:
+        ids_below_quota = set(get_videos_below_quota(
+            [v.replace('.mp4', '') for v in unrated_videos],
+            min_ratings_per_video
+        ))
+        videos_to_rate = [v for v in unrated_videos if v.replace('.mp4', '') in ids_below_quota]
     except Exception as e:
-        print(f"[WARNING] Failed to load metadata: {e}")
-        df_metadata_full = pd.DataFrame()
-        df_metadata_filtered = pd.DataFrame()
+        print(f"[WARNING] Error filtering fully-rated videos: {e}")
+        videos_to_rate = unrated_videos
+
+    # Create filtered metadata for stratification (only videos available to rate)
+    if videos_to_rate and not df_metadata_full.empty:
+        event_ids = [v.replace('.mp4', '') for v in videos_to_rate]
+        df_metadata_filtered = df_metadata_full[df_metadata_full['id'].isin(event_ids)]
+    else:
+        df_metadata_filtered = df_metadata_full.copy()
+
+    def record(candidates, counts):
+        # What the draw depended on besides the seed and the metadata
+        if draw_inputs is not None:
+            draw_inputs.clear()
+            draw_inputs['candidates'] = [v.replace('.mp4', '') for v in candidates]
+            draw_inputs['counts'] = {vid: int(count) for vid, count in (counts or {}).items()}
+
+    video_ids = [v.replace('.mp4', '') for v in videos_to_rate]
+    leasing = is_leasing_enabled(config)
+    rating_counts = None
+    if leasing or get_assignment_policy(config) == 'least_rated':
+        try:
+            rating_counts = get_rating_counts(video_ids)
+        except Exception as e:
+            print(f"[WARNING] Failed to read rating counts, treating all videos as unrated: {e}")
+            rating_counts = {}
+
+    if not leasing:
+        record(videos_to_rate, rating_counts)
+        selected = select_videos_for_session(videos_to_rate, df_metadata_filtered, config, rating_counts, rng)
+    else:
+        # Rating counts plus other sessions' active leases gate assignment;
+        # choosing and leasing happen in one transaction across processes
+        def select(pending):
+            counts = {vid: rating_counts.get(vid, 0) + pending.get(vid, 0) for vid in video_ids}
+            open_videos = [v for v in videos_to_rate if counts[v.replace('.mp4', '')] < min_ratings_per_video]
+            record(open_videos, {v.replace('.mp4', ''): counts[v.replace('.mp4', '')] for v in open_videos})
+            chosen = select_videos_for_session(open_videos, df_metadata_filtered, config, counts, rng)
+            return [v.replace('.mp4', '') for v in chosen]
+
+        try:
+            leased_ids = reserve_videos(user.user_id, select)
+            print(f"[INFO] Leased {len(leased_ids)} videos to this session")
+            selected = [vid + '.mp4' for vid in leased_ids]
+        except Exception as e:
+            print(f"[WARNING] Video leasing failed, assigning without leases: {e}")
+            record(videos_to_rate, rating_counts)
+            selected = select_videos_for_session(videos_to_rate, df_metadata_filtered, config, rating_counts, rng)
+
+    # Counterbalanced (Williams square row, round-robin) or shuffled presentation order.
+    # Applied once to the final selection, so a failed lease attempt doesn't use up a row
+    return presentation_order(selected, config, rng)
+
+def resume_or_create_plan(user, config, df_metadata_full, metadata_hash):
+    """
+    Resume the user's stored session plan, or generate and store a new seeded one.
+
+    A plan is resumed if it was drawn from the current settings and metadata and
+    has videos left; otherwise the same round is regenerated (changed settings) or
+    the next round is drawn (finished plan). New plans record the candidates and
+    counts they were drawn from. See utils/session_plans.py.
+
+    Parameters:
+    - user: User object
+    - config: Configuration dictionary
+    - df_metadata_full: Metadata of all videos
+    - metadata_hash: Content hash of the metadata file
+
+    Returns:
+    - Tuple (list of video filenames in plan order, index of the next video to rate)
+    """
+    fingerprint = plan_fingerprint(config, metadata_hash)
+    try:
+        store = get_plan_store(config)
+        plan = store.get(user.user_id)
+    except Exception as e:
+        print(f"[WARNING] Failed to read session plan, assigning without a plan: {e}")
+        return assign_videos(user, config, df_metadata_full), 0
+
+    if plan is not None and plan['fingerprint'] == fingerprint and plan['cursor'] < len(plan['video_ids']):
+        remaining = plan['video_ids'][plan['cursor']:]
+        print(f"[INFO] Resuming session plan of user {user.user_id} at {plan['cursor']}/{len(plan['video_ids'])}")
+        if is_leasing_enabled(config):
+            try:
+                reserve_videos(user.user_id, lambda pending: remaining)
+            except Exception as e:
+                print(f"[WARNING] Failed to lease the remaining plan videos: {e}")
+        return [vid + '.mp4' for vid in plan['video_ids']], plan['cursor']
+
+    if plan is None:
+        plan_round = 0
+    elif plan['fingerprint'] != fingerprint:
+        plan_round = plan['plan_round']
+    else:
+        plan_round = plan['plan_round'] + 1
+
+    draw_inputs = {}
+    videos_to_rate = assign_videos(user, config, df_metadata_full, plan_rng(user.user_id, plan_round), draw_inputs)
+    if videos_to_rate:
+        try:
+            store.save(user.user_id, plan_round, plan_seed(user.user_id, plan_round), fingerprint,
+                       [v.replace('.mp4', '') for v in videos_to_rate], draw_inputs)
+            print(f"[INFO] Created session plan round {plan_round} for user {user.user_id} ({len(videos_to_rate)} videos)")
+        except Exception as e:
+            print(f"[WARNING] Failed to store session plan: {e}")
+    return videos_to_rate, 0
+
+def select_videos_for_session(videos_to_rate, df_metadata_filtered, config, rating_counts=None, rng=None):
+    """
+    Choose a session's videos: least-rated-first, stratified or simple random sampling.
+
+    Parameters:
+    - videos_to_rate: Candidate video filenames (unrated by this user, below quota)
+    - df_metadata_filtered: Metadata of the candidate videos (for stratification)
+    - config: Configuration dictionary
+    - rating_counts: Optional dict video ID -> count (read from storage if needed and not given)
+    - rng: numpy Generator for all random draws (default: fresh, unseeded)
+
+    Returns:
+    - List of selected video filenames (not yet in presentation order; assign_videos
+      orders the final selection with utils/counterbalancing.presentation_order)
+    """
+    rng = rng if rng is not None else np.random.default_rng()
 
-    # Apply stratified sampling or simple random sampling
     # Use FILTERED metadata for stratification (only available videos)
     number_of_videos = config['settings'].get('number_of_videos', None)
     strat_config = config['settings'].get('variables_for_stratification', [])
 
-    if strat_config and len(strat_config) > 0:
+    if get_assignment_policy(config) == 'least_rated':
+        print(f"[INFO] Assigning least-rated videos first ({len(strat_config or [])} stratification variable(s))")
+        if rating_counts is None:
+            try:
+                rating_counts = get_rating_counts([v.replace('.mp4', '') for v in videos_to_rate])
+            except Exception as e:
+                print(f"[WARNING] Failed to read rating counts, treating all videos as unrated: {e}")
+                rating_counts = {}
+        selected = least_rated_first(
+            videos_to_rate,
+            df_metadata_filtered,
+            number_of_videos,
+            strat_config,
+            rating_counts,
+            rng
+        )
+    elif strat_config and len(strat_config) > 0:
         # Use stratified sampling
         print(f"[INFO] Applying stratified sampling with {len(strat_config)} variable(s)")
-        videos_to_rate = stratified_sample_videos(
+        selected = stratified_sample_videos(
             videos_to_rate,
             df_metadata_filtered,
             number_of_videos,
-            strat_config
+            strat_config,
+            rng
         )
     else:
         # Use simple random sampling
-        if number_of_videos and number_of_videos < len(videos_to_rate):
-            videos_to_rate = random.sample(videos_to_rate, number_of_videos)
-        random.shuffle(videos_to_rate)
-
-    # Store in session state
-    st.session_state.videos_to_rate = videos_to_rate
-    st.session_state.current_video_index = 0
-    # Note: video_path or gdrive_folder_id already set above based on video_source
+        selected = stratified_sample_videos(videos_to_rate, df_metadata_filtered, number_of_videos, [], rng)
 
-    # Store FULL metadata (all rows from CSV) - needed for completion screen
-    st.session_state.metadata = df_metadata_full
-    st.session_state.video_initialized = True
+    return selected
 
 def display_rating_interface(action_id, video_filename, config):
     """Display the main rating interface with video and scales."""
     user = st.session_state.user
-    metadata = st.session_state.metadata
+    metadata = get_trial_metadata(action_id)
     rating_scales = st.session_state.rating_scales
 
     # Get video path from local filesystem
@@ -541,12 +741,16 @@ def display_rating_interface(action_id, video_filename, config):
         display_video_func=display_video_with_mode
     )
 
+    # While the participant rates, fetch the next trial's media
+    render_media_preload(config)
+
     # Navigation and submission buttons
     col1, col2, col3 = st.columns([1, 1, 1])
 
     with col1:
         if st.button("◀️ Back to Questionnaire", use_container_width=True):
             if st.session_state.get('confirm_back', False):
+                release_session_leases()
                 st.session_state.page = 'questionnaire'
                 st.session_state.user_id_confirmed = False
                 st.session_state.video_initialized = False
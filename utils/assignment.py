@@ -0,0 +1,64 @@
+"""
+Video assignment policies for a session's videos_to_rate.
+
+settings.assignment_policy:
+    "random"       - random or stratified sample of the videos below quota
+                     (pages/videoplayer.stratified_sample_videos)
+    "least_rated"  - least-rated-first: within each stratum (same quotas as
+                     stratified sampling) the videos with the fewest ratings
+                     so far are taken first, ties broken at random
+
+Random draws let popular videos pile up ratings while others starve.
+Serving the least-rated videos first fills the quota of every video evenly,
+so full coverage needs fewer sessions.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.stratified_sampler import stratified_sample
+
+ASSIGNMENT_POLICIES = ('random', 'least_rated')
+DEFAULT_ASSIGNMENT_POLICY = 'random'
+
+
+def get_assignment_policy(config):
+    """Return settings.assignment_policy, falling back to "random" if unknown."""
+    policy = config['settings'].get('assignment_policy', DEFAULT_ASSIGNMENT_POLICY)
+    if policy not in ASSIGNMENT_POLICIES:
+        print(f"[WARNING] Unknown assignment_policy '{policy}', using '{DEFAULT_ASSIGNMENT_POLICY}'")
+        return DEFAULT_ASSIGNMENT_POLICY
+    return policy
+
+
+def least_rated_first(videos_to_rate, df_metadata, number_of_videos, strat_config, rating_counts, rng=None):
+    """
+    Select the least-rated videos, respecting the stratification proportions.
+
+    Parameters:
+        videos_to_rate: Candidate video filenames (e.g., ['event_001.mp4', ...])
+        df_metadata: Metadata DataFrame with an 'id' column (used for stratification)
+        number_of_videos: Number of videos to select (None = all candidates)
+        strat_config: variables_for_stratification (empty = no strata)
+        rating_counts: Dict video ID -> current number of ratings
+        rng: numpy Generator for tie-breaks (default: fresh, unseeded)
+
+    Returns:
+        List of selected video filenames, grouped by stratum (order them with
+        utils/counterbalancing.presentation_order)
+    """
+    event_ids = [v.replace('.mp4', '') for v in videos_to_rate]
+
+    df = None
+    if strat_config and df_metadata is not None and not df_metadata.empty:
+        df = df_metadata[df_metadata['id'].isin(event_ids)]
+        if df.empty:
+            # Don't end the session empty: rank all candidates without strata
+            print("[WARNING] No metadata found for available videos, assigning without stratification")
+            df = None
+    if df is None:
+        df = pd.DataFrame({'id': event_ids})
+        strat_config = []
+
+    priority = np.array([rating_counts.get(str(vid_id), 0) for vid_id in df['id']], dtype=np.int64)
+    selected_ids = stratified_sample(df, strat_config, number_of_videos or None, rng, priority)
+    return [vid_id + '.mp4' for vid_id in selected_ids]
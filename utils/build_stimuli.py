@@ -0,0 +1,573 @@
+"""
+Stimulus build tool (replaces convert_images_to_videos.sh and append_black_screen.sh).
+
+Build jobs are configured under stimulus_build in config.yaml:
+    "images"     - still images -> black intro + image + black end clips
+    "pad_videos" - videos with a black screen prepended and appended
+
+Every input file is one task; tasks run in parallel on a process pool.
+Each output is a single ffmpeg encode: the black screens are generated
+inside the filtergraph (tpad), so no intermediate segments are written.
+A manifest records, per output, the content hash of its input and a hash of
+the build settings, so a rerun only rebuilds outputs whose input or
+settings changed (or whose output file is missing or was modified).
+ffprobe results are kept in the manifest by input hash, so unchanged inputs
+are never probed twice.
+Outputs are written into the folders named by paths.video_path /
+paths.familiarization_video_path (or any folder given in the job).
+
+Usage:
+    python -m utils.build_stimuli              # build all enabled jobs
+    python -m utils.build_stimuli --force      # rebuild everything
+    python -m utils.build_stimuli --workers 8 --job image_clips
+    python -m utils.build_stimuli --compare-profiles --limit 10   # size/decode-time report
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from utils.config_loader import load_config
+from utils.media_probe import file_hash, probe_media, run_ffmpeg
+from utils.renditions import RENDITION_CODECS, rendition_path
+
+BUILD_VERSION = 2   # bump to invalidate all outputs after changing the encode pipeline
+DEFAULT_MANIFEST_PATH = 'data/stimulus_build_manifest.json'
+DEFAULT_PROFILE_REPORT_PATH = 'data/encoding_profile_report.csv'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+MANIFEST_SAVE_EVERY = 20   # completed tasks between manifest checkpoints
+CONTAINER_FORMATS = {'.mp4': 'mp4', '.mov': 'mov', '.mkv': 'matroska', '.avi': 'avi', '.webm': 'webm'}
+FASTSTART_FORMATS = ('mp4', 'mov')
+AUDIO_CODECS = {'webm': 'libopus'}   # container -> audio encoder (default aac)
+
+DEFAULT_JOB_SETTINGS = {
+    'images': {
+        'black_intro_seconds': 0.5,
+        'image_seconds': 2.0,
+        'black_end_seconds': 0.0,
+        'width': 1920,
+        'height': 1080,
+        'fps': 30,
+        'video_codec': 'libx264',
+        'pixel_format': 'yuv420p',
+        'crf': None,     # None = encoder default
+        'profile': 'default',
+    },
+    'pad_videos': {
+        'black_before_seconds': 0.5,
+        'black_after_seconds': 1.0,
+        'video_codec': 'libx264',
+        'pixel_format': 'yuv420p',
+        'crf': 18,       # the source is re-encoded in the same pass, keep it near-lossless
+        'scale_height': None,   # set for renditions; None = source size
+    },
+}
+
+
+# Encoding profiles for image clips. "static" encodes the still at the lowest
+# frame rate that keeps every segment boundary on a frame (so the black
+# intro/image/end timing is unchanged) with one GOP per clip and x264's
+# still-image tuning; x264 still places a keyframe at the black -> image cut.
+ENCODING_PROFILES = {
+    'default': {},
+    'static': {'fps': 'lowest_exact', 'gop': 'clip', 'tune': 'stillimage'},
+}
+PROFILE_TUNE_CODECS = ('libx264',)
+
+
+def _settings_hash(job_type, settings):
+    payload = json.dumps({'version': BUILD_VERSION, 'type': job_type, 'settings': settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_manifest(manifest_path):
+    """
+    Load the build manifest, empty if missing or corrupt.
+
+    {"outputs": {output path: entry}, "probes": {input content hash: ffprobe metadata}}
+    """
+    manifest = {'version': BUILD_VERSION, 'outputs': {}, 'probes': {}}
+    if not os.path.exists(manifest_path):
+        return manifest
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest.update(json.load(f))
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[WARNING] Ignoring unreadable build manifest {manifest_path}: {e}")
+    return manifest
+
+
+def save_manifest(manifest, manifest_path):
+    """Atomically write the build manifest."""
+    directory = os.path.dirname(manifest_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _input_hash(path, previous):
+    """Content hash of an input, reusing the manifest's hash if size and mtime are unchanged."""
+    stat_result = os.stat(path)
+    if (previous and previous.get('input_size') == stat_result.st_size
+            and previous.get('input_mtime_ns') == stat_result.st_mtime_ns):
+        return previous['input_hash'], stat_result
+    return file_hash(path), stat_result
+
+
+def _output_unchanged(output_path, entry):
+    """True if the output exists and was not modified since it was built."""
+    try:
+        stat_result = os.stat(output_path)
+    except OSError:
+        return False
+    return entry.get('output_size') == stat_result.st_size and entry.get('output_mtime_ns') == stat_result.st_mtime_ns
+
+
+def _rendition_settings(job_type, settings, rendition):
+    """
+    Settings of one rendition of a job ({height, video_codec?, crf?} in the job's "renditions").
+
+    Returns:
+        Settings dict, or None if the codec has no rendition naming
+    """
+    rendition_settings = dict(settings)
+    rendition_settings.update({k: v for k, v in rendition.items() if k in ('video_codec', 'crf')})
+    if rendition_settings['video_codec'] not in RENDITION_CODECS:
+        return None
+
+    height = int(rendition['height'])
+    if job_type == 'images':
+        # Keep the aspect ratio, even width for yuv420p
+        rendition_settings['width'] = round(settings['width'] * height / settings['height'] / 2) * 2
+        rendition_settings['height'] = height
+    else:
+        rendition_settings['scale_height'] = height
+    return rendition_settings
+
+
+def _resolve_output_dir(output, config):
+    """Job output: a key of paths in config.yaml (e.g. "video_path") or a folder."""
+    return config.get('paths', {}).get(output, output)
+
+
+def collect_tasks(config, job_names=None):
+    """
+    Expand the enabled build jobs into one task per input file.
+
+    Parameters:
+        config: Configuration dictionary (reads stimulus_build.jobs)
+        job_names: Optional list of job names to restrict to
+
+    Returns:
+        List of task dicts (type, input_path, output_path, settings, settings_hash)
+    """
+    build_config = config.get('stimulus_build', {}) or {}
+    tasks = []
+
+    for job in build_config.get('jobs', []) or []:
+        name = job.get('name', job.get('type'))
+        if job_names and name not in job_names:
+            continue
+        if not job.get('enabled', True) and not job_names:
+            continue
+
+        job_type = job.get('type')
+        if job_type not in DEFAULT_JOB_SETTINGS:
+            print(f"[WARNING] Skipping job '{name}': unknown type {job_type}")
+            continue
+
+        input_dir = job.get('input_dir')
+        if not input_dir or not os.path.isdir(input_dir):
+            print(f"[WARNING] Skipping job '{name}': input folder not found: {input_dir}")
+            continue
+
+        output_dir = _resolve_output_dir(job.get('output', 'video_path'), config)
+        settings = dict(DEFAULT_JOB_SETTINGS[job_type])
+        settings.update({k: v for k, v in job.items() if k in settings})
+        variants = [(None, settings, _settings_hash(job_type, settings))]
+        for rendition in job.get('renditions', []) or []:
+            rendition_settings = _rendition_settings(job_type, settings, rendition)
+            if rendition_settings is None:
+                print(f"[WARNING] Job '{name}': skipping rendition {rendition} (unknown video_codec)")
+                continue
+            variants.append((rendition, rendition_settings, _settings_hash(job_type, rendition_settings)))
+
+        extensions = IMAGE_EXTENSIONS if job_type == 'images' else VIDEO_EXTENSIONS
+        for filename in sorted(os.listdir(input_dir)):
+            if not filename.lower().endswith(extensions):
+                continue
+            stem, extension = os.path.splitext(filename)
+            output_extension = '.mp4' if job_type == 'images' else extension
+            output_path = os.path.join(output_dir, stem + output_extension)
+            for rendition, variant_settings, settings_hash in variants:
+                tasks.append({
+                    'job': name,
+                    'type': job_type,
+                    'input_path': os.path.join(input_dir, filename),
+                    'output_path': output_path if rendition is None else rendition_path(
+                        output_path, rendition['height'], variant_settings['video_codec']),
+                    'settings': variant_settings,
+                    'settings_hash': settings_hash,
+                })
+
+    return tasks
+
+
+def _container_format(task):
+    return CONTAINER_FORMATS.get(os.path.splitext(task['output_path'])[1].lower(), 'mp4')
+
+
+def _lowest_exact_fps(fps, durations):
+    """Lowest divisor of fps for which every duration is a whole number of frames."""
+    for candidate in range(1, int(fps) + 1):
+        if int(fps) % candidate == 0 and all(abs(d * candidate - round(d * candidate)) < 1e-6 for d in durations):
+            return candidate
+    return fps
+
+
+def _image_clip_encoding(settings):
+    """
+    Resolve the encoding profile of an image clip job.
+
+    Returns:
+        Tuple (fps, extra encoder args)
+    """
+    profile_name = settings.get('profile', 'default')
+    if profile_name not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile '{profile_name}' (available: {', '.join(ENCODING_PROFILES)})")
+    profile = ENCODING_PROFILES[profile_name]
+
+    durations = (settings['black_intro_seconds'], settings['image_seconds'], settings['black_end_seconds'])
+    fps = settings['fps']
+    if profile.get('fps') == 'lowest_exact':
+        fps = _lowest_exact_fps(fps, durations)
+
+    args = []
+    if profile.get('gop') == 'clip':
+        args += ['-g', str(max(1, round(sum(durations) * fps)))]
+    if profile.get('tune') and settings['video_codec'] in PROFILE_TUNE_CODECS:
+        args += ['-tune', profile['tune']]
+    return fps, args
+
+
+def _encoder_args(task):
+    s = task['settings']
+    args = ['-c:v', s['video_codec'], '-pix_fmt', s['pixel_format']]
+    if _container_format(task) in FASTSTART_FORMATS:
+        args += ['-movflags', '+faststart']   # moov first: playback starts before the download ends
+    if s.get('crf') is not None:
+        args += ['-crf', str(s['crf'])]
+        if s['video_codec'] == 'libvpx-vp9':
+            args += ['-b:v', '0']   # constant-quality mode
+    return args
+
+
+def _black_padding_filter(before_seconds, after_seconds):
+    """tpad filter that adds generated black frames before/after the stream ('' if none)."""
+    options = []
+    if before_seconds > 0:
+        options.append(f"start_mode=add:start_duration={before_seconds}")
+    if after_seconds > 0:
+        options.append(f"stop_mode=add:stop_duration={after_seconds}")
+    return f",tpad={':'.join(options)}:color=black" if options else ''
+
+
+def _build_image_clip(task, output_path):
+    """Black intro + image + black end in one encode (single filtergraph, no temp files)."""
+    s = task['settings']
+    width, height = s['width'], s['height']
+    fps, profile_args = _image_clip_encoding(s)
+
+    video_filter = (
+        f"[0:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,setsar=1,fps={fps},format={s['pixel_format']}"
+        f"{_black_padding_filter(s['black_intro_seconds'], s['black_end_seconds'])}[v]"
+    )
+    run_ffmpeg([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-loop', '1', '-framerate', str(fps), '-t', str(s['image_seconds']), '-i', task['input_path'],
+        '-filter_complex', video_filter, '-map', '[v]',
+        *_encoder_args(task), *profile_args, '-r', str(fps),
+        '-f', _container_format(task), output_path,
+    ])
+
+
+def _build_padded_video(task, output_path):
+    """Black screen before and after the video in one encode; audio is delayed/padded to match."""
+    s = task['settings']
+    before, after = s['black_before_seconds'], s['black_after_seconds']
+
+    scale = f"scale=-2:{s['scale_height']}," if s.get('scale_height') else ''
+    filters = [f"[0:v]{scale}format={s['pixel_format']}{_black_padding_filter(before, after)}[v]"]
+    maps = ['-map', '[v]']
+    if task['probe'].get('has_audio'):
+        filters.append(f"[0:a]adelay=delays={int(before * 1000)}:all=1,apad=pad_dur={after}[a]")
+        maps += ['-map', '[a]', '-c:a', AUDIO_CODECS.get(_container_format(task), 'aac')]
+
+    run_ffmpeg([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-i', task['input_path'],
+        '-filter_complex', ';'.join(filters), *maps,
+        *_encoder_args(task),
+        '-f', _container_format(task), output_path,
+    ])
+
+
+_BUILDERS = {
+    'images': _build_image_clip,
+    'pad_videos': _build_padded_video,
+}
+
+
+def build_one(task):
+    """
+    Build one output (process pool worker).
+
+    The output is written to "<output>.partial" and renamed into place, so an
+    interrupted build never leaves a truncated stimulus in the media folder.
+    Video inputs are probed here unless the manifest already holds their probe.
+
+    Returns:
+        Tuple (task, error message or None, seconds)
+    """
+    start = time.perf_counter()
+    output_path = task['output_path']
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    partial_path = output_path + '.partial'
+
+    try:
+        if task['type'] == 'pad_videos' and task.get('probe') is None:
+            task['probe'] = probe_media(task['input_path'])
+        _BUILDERS[task['type']](task, partial_path)
+        os.replace(partial_path, output_path)
+        return task, None, time.perf_counter() - start
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return task, str(e), time.perf_counter() - start
+
+
+def build(config, force=False, workers=None, job_names=None):
+    """
+    Build all stale outputs of the configured jobs.
+
+    Parameters:
+        config: Configuration dictionary
+        force: Rebuild every output regardless of the manifest
+        workers: Number of parallel encodes (default: stimulus_build.workers or CPU count)
+        job_names: Optional list of job names to build
+
+    Returns:
+        Tuple (built, skipped, failed) counts
+    """
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError("FFmpeg is not installed (Ubuntu/Debian: sudo apt install ffmpeg, macOS: brew install ffmpeg)")
+
+    build_config = config.get('stimulus_build', {}) or {}
+    manifest_path = build_config.get('manifest_path', DEFAULT_MANIFEST_PATH)
+    workers = workers or build_config.get('workers') or os.cpu_count()
+
+    manifest = load_manifest(manifest_path)
+    outputs = manifest['outputs']
+    probes = manifest['probes']
+    tasks = collect_tasks(config, job_names)
+
+    stale = []
+    hashed = {}   # input path -> (hash, stat): renditions share their input
+    for task in tasks:
+        previous = outputs.get(task['output_path'])
+        if task['input_path'] not in hashed:
+            hashed[task['input_path']] = _input_hash(task['input_path'], previous)
+        input_hash, input_stat = hashed[task['input_path']]
+        task['input_hash'] = input_hash
+        task['input_size'] = input_stat.st_size
+        task['input_mtime_ns'] = input_stat.st_mtime_ns
+
+        if (not force and previous
+                and previous.get('input_hash') == input_hash
+                and previous.get('settings_hash') == task['settings_hash']
+                and _output_unchanged(task['output_path'], previous)):
+            # Refresh the cached stat so the next run skips hashing
+            previous['input_size'] = task['input_size']
+            previous['input_mtime_ns'] = task['input_mtime_ns']
+            continue
+        task['probe'] = probes.get(input_hash)
+        stale.append(task)
+
+    skipped = len(tasks) - len(stale)
+    print(f"[INFO] {len(tasks)} stimuli, {len(stale)} to build, {skipped} up to date ({workers} workers)")
+
+    built = failed = 0
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(build_one, task) for task in stale]
+            for future in as_completed(futures):
+                task, error, seconds = future.result()
+                if error:
+                    failed += 1
+                    print(f"[ERROR] {task['input_path']}: {error}")
+                    continue
+
+                built += 1
+                if task.get('probe') is not None:
+                    probes[task['input_hash']] = task['probe']
+                output_stat = os.stat(task['output_path'])
+                outputs[task['output_path']] = {
+                    'job': task['job'],
+                    'input_path': task['input_path'],
+                    'input_hash': task['input_hash'],
+                    'input_size': task['input_size'],
+                    'input_mtime_ns': task['input_mtime_ns'],
+                    'settings_hash': task['settings_hash'],
+                    'output_size': output_stat.st_size,
+                    'output_mtime_ns': output_stat.st_mtime_ns,
+                }
+                print(f"[INFO] Built {task['output_path']} ({seconds:.1f}s)")
+                if built % MANIFEST_SAVE_EVERY == 0:
+                    save_manifest(manifest, manifest_path)
+
+    manifest['version'] = BUILD_VERSION
+    save_manifest(manifest, manifest_path)
+    print(f"[INFO] Build complete: {built} built, {skipped} up to date, {failed} failed")
+
+    # Keep the app's media manifest in step with the media folders
+    from utils.media_manifest import write_media_manifest
+    write_media_manifest(config)
+    return built, skipped, failed
+
+
+def _decode_seconds(path, runs=3):
+    """Best-of-N wall time to decode a file with a single ffmpeg thread."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_ffmpeg(['ffmpeg', '-v', 'error', '-threads', '1', '-i', path, '-f', 'null', '-'])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare_profiles(config, job_names=None, profiles=None, limit=None, workers=None,
+                     report_path=DEFAULT_PROFILE_REPORT_PATH):
+    """
+    Encode the image clip inputs with each encoding profile and report size and decode time.
+
+    Outputs go to a temporary folder; the media folders and the build manifest
+    are not touched.
+
+    Parameters:
+        config: Configuration dictionary
+        job_names: Optional list of image job names (default: all enabled image jobs)
+        profiles: Profile names to compare (default: all ENCODING_PROFILES)
+        limit: Optional maximum number of inputs
+        workers: Number of parallel encodes
+        report_path: CSV file for the per-file results
+
+    Returns:
+        pandas DataFrame with one row per input and profile
+    """
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError("FFmpeg is not installed (Ubuntu/Debian: sudo apt install ffmpeg, macOS: brew install ffmpeg)")
+
+    profiles = profiles or list(ENCODING_PROFILES)
+    tasks = [task for task in collect_tasks(config, job_names) if task['type'] == 'images'][:limit]
+    if not tasks:
+        print("[WARNING] No image clip inputs to compare")
+        return pd.DataFrame()
+
+    workers = workers or (config.get('stimulus_build', {}) or {}).get('workers') or os.cpu_count()
+    rows = []
+    with tempfile.TemporaryDirectory(prefix='stimulus_profiles_') as work_dir:
+        variants = []
+        for task in tasks:
+            for profile_name in profiles:
+                settings = dict(task['settings'], profile=profile_name)
+                filename = os.path.basename(task['output_path'])
+                variants.append(dict(task, settings=settings,
+                                     output_path=os.path.join(work_dir, profile_name, filename)))
+
+        print(f"[INFO] Encoding {len(tasks)} input(s) x {len(profiles)} profile(s)")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(build_one, variants))
+
+        # Decode timing runs serially so encodes do not skew it
+        for task, error, encode_seconds in results:
+            row = {'input': task['input_path'], 'profile': task['settings']['profile']}
+            if error:
+                print(f"[ERROR] {task['input_path']} ({row['profile']}): {error}")
+                rows.append(row)
+                continue
+            probe = probe_media(task['output_path'])
+            row.update({
+                'fps': probe['fps'],
+                'duration_seconds': probe['duration'],
+                'size_bytes': os.path.getsize(task['output_path']),
+                'encode_seconds': round(encode_seconds, 3),
+                'decode_ms': round(_decode_seconds(task['output_path']) * 1000, 1),
+            })
+            rows.append(row)
+
+    df = pd.DataFrame(rows)
+    directory = os.path.dirname(report_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    df.to_csv(report_path, index=False)
+
+    if 'size_bytes' in df:
+        summary = df.groupby('profile', sort=False).agg(
+            files=('size_bytes', 'count'),
+            total_mb=('size_bytes', lambda x: round(x.sum() / 1e6, 2)),
+            mean_kb=('size_bytes', lambda x: round(x.mean() / 1e3, 1)),
+            mean_decode_ms=('decode_ms', lambda x: round(x.mean(), 1)),
+            min_duration=('duration_seconds', 'min'),
+            max_duration=('duration_seconds', 'max'),
+        )
+        print(summary.to_string())
+
+        # Presentation timing must not depend on the profile
+        spread = df.groupby('input')['duration_seconds'].agg(lambda x: x.max() - x.min())
+        mismatched = spread[spread > 1e-3]
+        if not mismatched.empty:
+            print(f"[WARNING] Duration differs between profiles for {len(mismatched)} input(s)")
+
+    print(f"[INFO] Report written to {report_path}")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build stimulus videos from the stimulus_build jobs in config.yaml")
+    parser.add_argument('--force', action='store_true', help="Rebuild all outputs")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel encodes (default: CPU count)")
+    parser.add_argument('--job', action='append', dest='jobs', help="Only build this job (repeatable)")
+    parser.add_argument('--compare-profiles', action='store_true',
+                        help="Encode image clips with every encoding profile and write a size/decode-time report")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum inputs for --compare-profiles")
+    args = parser.parse_args()
+
+    try:
+        if args.compare_profiles:
+            compare_profiles(load_config(), job_names=args.jobs, limit=args.limit, workers=args.workers)
+            sys.exit(0)
+        _, _, failed = build(load_config(), force=args.force, workers=args.workers, job_names=args.jobs)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Circuit breaker and bounded retry for calls to external services.
+
+When Google Sheets is slow or rate-limited (HTTP 429), every call used to
+wait out its full timeout before falling back. Calls now go through
+call_with_retry(): transient errors are retried with jittered exponential
+backoff within a per-operation deadline (each read attempt is cut off at the
+time left), and repeated failed operations open a shared circuit breaker. While the breaker is open, calls fail immediately with
+CircuitOpenError so callers can use their local fallback; after
+reset_timeout a single half-open probe is let through, and its success
+closes the breaker again.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Defaults
+DEFAULT_FAILURE_THRESHOLD = 3     # consecutive failures before opening
+DEFAULT_RESET_TIMEOUT = 30.0      # seconds open before a half-open probe
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.25         # seconds, first backoff step
+DEFAULT_MAX_DELAY = 4.0           # seconds, cap per backoff step
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Runs the attempts, so a hung request can be abandoned when the deadline passes
+_attempt_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='retry-attempt')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the service while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe three-state circuit breaker (closed -> open -> half-open).
+
+    Parameters:
+        name: Name used in log messages
+        failure_threshold: Consecutive failed operations that open the breaker
+            (call_with_retry records one failure per operation, not per attempt)
+        reset_timeout: Seconds to stay open before allowing a probe
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def is_open(self):
+        """Return True while calls would be rejected (open, probe not yet due)."""
+        return self.state == OPEN
+
+    def allow(self):
+        """
+        Decide whether a call may go through now.
+
+        Returns:
+            True if the call may proceed (closed, or this call is the half-open probe)
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+
+            # Half-open: exactly one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._state = HALF_OPEN
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"[INFO] Circuit '{self.name}' closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"[WARNING] Circuit '{self.name}' opened after {self._failures} failure(s)")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Forget an in-flight probe that ended without a verdict (non-retryable error)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+def is_retryable_error(error):
+    """
+    Return True for errors that indicate a transient availability problem:
+    rate limits, server errors, timeouts and connection failures.
+    """
+    response = getattr(error, 'response', None)
+    status_code = getattr(response, 'status_code', None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    # requests/urllib3/google-auth transport errors, without importing them here
+    error_name = type(error).__name__
+    return error_name in {'Timeout', 'ReadTimeout', 'ConnectTimeout', 'ConnectionError',
+                          'TransportError', 'ProtocolError', 'RemoteDisconnected'}
+
+
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base * 2**attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def _run_attempt(func, args, kwargs, timeout):
+    """
+    Run one attempt, giving up after timeout seconds (the request may still finish in the background).
+
+    timeout None waits for the request itself to return or fail (bounded by the client's own request timeout).
+    """
+    future = _attempt_executor.submit(func, *args, **kwargs)
+    try:
+        return future.result(timeout=max(timeout, 0.0) if timeout is not None else None)
+    except FutureTimeoutError:
+        raise TimeoutError(f"no response within {timeout:.1f}s") from None
+
+
+def call_with_retry(breaker, operation, func, *args, deadline=10.0, idempotent=True,
+                    max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                    max_delay=DEFAULT_MAX_DELAY, **kwargs):
+    """
+    Call func(*args, **kwargs) through a circuit breaker with bounded retries.
+
+    Each idempotent attempt is cut off at the time left until the deadline,
+    so the whole operation never takes (much) longer than deadline, even if
+    a request hangs. A non-idempotent attempt (an append) is never abandoned:
+    it runs until the request returns or hits the client's request timeout,
+    because an abandoned append can still be applied after the caller has
+    given up and retried it. The breaker counts one failure per failed operation,
+    so the retries of a single operation cannot open it on their own; a
+    failed half-open probe reopens it immediately.
+
+    Parameters:
+        breaker: CircuitBreaker shared by all calls to the same service
+        operation: Operation name for log messages
+        func: Callable performing the request
+        deadline: Total seconds budget for all attempts and backoff sleeps
+        idempotent: If False (e.g. appends), only retry errors that guarantee
+            the request was not applied (HTTP 429), never timeouts
+        max_attempts: Maximum number of attempts
+        base_delay, max_delay: Backoff parameters (seconds)
+
+    Returns:
+        Whatever func returns
+
+    Raises:
+        CircuitOpenError if the breaker rejects the call; the last error if
+        all attempts fail; non-retryable errors immediately (they do not
+        count against the breaker)
+    """
+    give_up_at = time.monotonic() + deadline
+    attempt = 0
+
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit '{breaker.name}' is open, skipping {operation}")
+
+        try:
+            result = _run_attempt(func, args, kwargs, give_up_at - time.monotonic() if idempotent else None)
+        except Exception as e:
+            if not is_retryable_error(e):
+                breaker.release_probe()
+                raise
+
+            attempt += 1
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            safe_to_retry = idempotent or status_code == 429
+            is_probe = breaker.state == HALF_OPEN
+            if is_probe or not safe_to_retry or attempt >= max_attempts or time.monotonic() + delay >= give_up_at:
+                breaker.record_failure()
+                print(f"[WARNING] {operation} failed after {attempt} attempt(s): {e}")
+                raise
+            print(f"[INFO] {operation} failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
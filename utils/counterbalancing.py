@@ -0,0 +1,262 @@
+"""
+Counterbalanced presentation orders (balanced Latin squares, Williams design).
+
+A per-session shuffle balances order effects only in expectation, so it takes
+many participants before every video has appeared in every position about
+equally often. A Williams square over n items has n rows (2n if n is odd).
+Each row is an order of the n items. Across the rows, every item appears
+exactly once in every position, and every item directly follows every other
+item exactly once. Handing the rows out round-robin therefore balances
+positions and first-order carryover after every n (or 2n) sessions.
+
+The square is built once per session length and cached per process. A
+persistent counter per study selects the next row; it lives in a small
+SQLite table, so rows keep rotating across restarts and across app
+processes on the same host. The study key is a hash of the settings that
+define the study's item sets, so a changed study starts a new rotation.
+
+The items are rank slots, not videos: a session's videos are put into
+canonical (sorted ID) order and then permuted by the row, so row position k
+shows the video with canonical rank row[k]. Rotations are kept per study key
+and session length. Only when every session of a rotation gets the same
+videos (e.g., a fixed item set) is this an exact Williams design over the
+videos. When the selection differs per session (least-rated assignment,
+video leases, quotas, number_of_videos: null), only the rank slots are
+balanced; a particular video's positions are balanced in expectation, as
+with shuffling, while every session still takes a row from the shared
+counter. "random" is therefore the default; use "williams" only when every
+session presents the same fixed set of videos.
+
+settings.presentation_order.method:
+    "williams"  - balanced Latin square rows, round-robin (fixed video sets only)
+    "random"    - independent shuffle per session (default)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from utils.assignment import get_assignment_policy
+from utils.video_leases import is_leasing_enabled
+
+DEFAULT_ORDER_PATH = 'data_store/presentation_order.sqlite3'
+ORDER_METHODS = ('williams', 'random')
+DEFAULT_ORDER_METHOD = 'random'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_counters (
+    study_key  TEXT NOT NULL,
+    n          INTEGER NOT NULL,
+    next_row   INTEGER NOT NULL,
+    PRIMARY KEY (study_key, n)
+);
+"""
+
+# Process-wide caches: session length -> square, path -> OrderCounterStore
+_squares = {}
+_squares_lock = threading.Lock()
+_order_stores = {}
+_order_stores_lock = threading.Lock()
+
+
+def williams_square(n):
+    """
+    Balanced Latin square (Williams design) for n items.
+
+    The first row is 0, 1, n-1, 2, n-2, ...; each following row adds 1 (mod n).
+    For odd n the mirrored rows are appended, because n rows alone cannot
+    balance first-order carryover.
+
+    Parameters:
+        n: Number of items (>= 1)
+
+    Returns:
+        Read-only numpy int array of shape (n, n) for even n, (2n, n) for odd n
+    """
+    with _squares_lock:
+        square = _squares.get(n)
+    if square is not None:
+        return square
+
+    first_row = np.empty(n, dtype=np.int64)
+    first_row[0] = 0
+    k = np.arange(1, n)
+    # Alternate from the front (1, 2, ...) and the back (n-1, n-2, ...)
+    first_row[1:] = np.where(k % 2 == 1, (k + 1) // 2, n - k // 2)
+    square = (first_row[None, :] + np.arange(n)[:, None]) % n
+    if n % 2 == 1:
+        square = np.vstack([square, square[:, ::-1]])
+    square.setflags(write=False)
+
+    with _squares_lock:
+        square = _squares.setdefault(n, square)
+    return square
+
+
+def study_key(config):
+    """Short hash of the settings that define the study's item sets (keys the row counter)."""
+    settings = config.get('settings', {}) or {}
+    payload = {
+        'number_of_videos': settings.get('number_of_videos'),
+        'variables_for_stratification': settings.get('variables_for_stratification'),
+        'video_path': config.get('paths', {}).get('video_path'),
+        'metadata_path': config.get('paths', {}).get('metadata_path'),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class OrderCounterStore:
+    """
+    SQLite-backed round-robin counters: (study key, session length) -> next row.
+
+    Parameters:
+        db_path: Path to the SQLite database file
+    """
+
+    def __init__(self, db_path=DEFAULT_ORDER_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        """This thread's connection (autocommit mode; transactions are explicit)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def take_row(self, key, n, rows):
+        """
+        Claim the next row of a rotation, atomically across processes.
+
+        Parameters:
+            key: Study key
+            n: Session length
+            rows: Number of rows in the square
+
+        Returns:
+            Row index in [0, rows)
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT next_row FROM order_counters WHERE study_key = ? AND n = ?", (key, n)
+            ).fetchone()
+            current = row[0] if row else 0
+            conn.execute(
+                "INSERT OR REPLACE INTO order_counters (study_key, n, next_row) VALUES (?, ?, ?)",
+                (key, n, (current + 1) % rows)
+            )
+            conn.execute('COMMIT')
+            return current % rows
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+def get_order_method(config):
+    """Return settings.presentation_order.method, falling back to "random" if unknown."""
+    settings = (config or {}).get('settings', {}) or {}
+    method = (settings.get('presentation_order', {}) or {}).get('method', DEFAULT_ORDER_METHOD)
+    if method not in ORDER_METHODS:
+        print(f"[WARNING] Unknown presentation_order method '{method}', using '{DEFAULT_ORDER_METHOD}'")
+        return DEFAULT_ORDER_METHOD
+    return method
+
+
+def get_order_store(config):
+    """
+    Get or create the process-wide counter store.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.presentation_order.path)
+
+    Returns:
+        OrderCounterStore instance
+    """
+    settings = (config or {}).get('settings', {}) or {}
+    db_path = (settings.get('presentation_order', {}) or {}).get('path', DEFAULT_ORDER_PATH)
+
+    with _order_stores_lock:
+        store = _order_stores.get(db_path)
+        if store is None:
+            store = OrderCounterStore(db_path)
+            _order_stores[db_path] = store
+
+    return store
+
+
+def precompute_orderings(config, available=None):
+    """
+    Build the square for the configured session length ahead of the first session.
+
+    Parameters:
+        config: Configuration dictionary
+        available: Number of videos available (caps number_of_videos; None = unknown)
+
+    Returns:
+        Session length the square was built for, or None
+    """
+    if get_order_method(config) != 'williams':
+        return None
+    if get_assignment_policy(config) == 'least_rated' or is_leasing_enabled(config):
+        print("[WARNING] Presentation order 'williams' with least_rated assignment or video leases: "
+              "sessions get different videos, so only rank slots are balanced (use 'random')")
+    n = config['settings'].get('number_of_videos') or available
+    if available is not None and n:
+        n = min(n, available)
+    if not n:
+        return None
+    n = int(n)
+    with _squares_lock:
+        cached = n in _squares
+    square = williams_square(n)
+    if not cached:
+        print(f"[INFO] Presentation orders: Williams square with {square.shape[0]} rows for {n} videos")
+    return n
+
+
+def presentation_order(videos, config, rng=None):
+    """
+    Order a session's selected videos for presentation.
+
+    With "williams", the next row of the (study key, session length) rotation
+    permutes the videos' sorted-ID ranks. This balances the rank slots; the
+    videos themselves only if every session of the rotation has the same ones.
+
+    Parameters:
+        videos: Selected video filenames (any order)
+        config: Configuration dictionary
+        rng: numpy Generator for the "random" method and as fallback (default: fresh, unseeded)
+
+    Returns:
+        List of video filenames in presentation order
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    n = len(videos)
+    if n <= 1:
+        return list(videos)
+
+    if get_order_method(config) == 'williams':
+        canonical = sorted(videos)
+        square = williams_square(n)
+        try:
+            row = get_order_store(config).take_row(study_key(config), n, square.shape[0])
+            print(f"[INFO] Presentation order: Williams row {row + 1}/{square.shape[0]} for {n} videos")
+            return [canonical[k] for k in square[row]]
+        except sqlite3.Error as e:
+            print(f"[WARNING] Order counter unavailable, shuffling instead: {e}")
+
+    return [videos[i] for i in rng.permutation(n)]
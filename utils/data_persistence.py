@@ -1,17 +1,14 @@
 """
 Data persistence functions for saving and loading user data and ratings.
-Implements flexible storage strategy based on config: local, online, or both.
+Implements flexible storage strategy based on config: local, online, both or sqlite.
+Storage backends and the concurrent fan-out live in utils/storage_backends.py.
 """
-import json
-import os
+import uuid
+
 import streamlit as st
-from datetime import datetime
-from utils.gsheets_manager import (
-    append_rating_to_gsheets,
-    get_rated_videos_for_user_from_gsheets,
-    append_user_to_gsheets,
-    user_exists_in_gsheets
-)
+from utils.storage_backends import get_storage
+from utils.video_leases import get_lease_table, is_leasing_enabled
+from utils.session_plans import get_plan_store, is_session_plans_enabled
 
 def save_user_data(user):
     """
@@ -20,55 +17,23 @@ def save_user_data(user):
     Storage modes:
     - "local": Save to local JSON only
     - "online": Save to Google Sheets only
-    - "both": Save to both Google Sheets and local JSON
+    - "both": Save to both Google Sheets and local JSON (concurrently)
+    - "sqlite": Save to the local SQLite database only
 
     Parameters:
     - user: User object with user_id and demographic data
 
     Returns:
-    - True if at least one save method successful, False if all fail
+    - True if the configured write quorum of backends succeeded, False otherwise
     """
     # Get user data dictionary
     user_data = user.to_dict()
 
-    # Get storage mode from config
     config = st.session_state.get('config', {})
-    storage_mode = config.get('settings', {}).get('storage_mode', 'both')
-
-    # Track success of each write method
-    gsheets_success = False
-    local_json_success = False
-
-    # ONLINE: Write to Google Sheets
-    if storage_mode in ['online', 'both']:
-        try:
-            gsheets_success = append_user_to_gsheets(user_data, worksheet="v2_ImageSliders_users")
-            if gsheets_success:
-                print(f"[INFO] ✓ User data saved to Google Sheets: {user.user_id}")
-        except Exception as e:
-            print(f"[WARNING] Google Sheets write failed for user data: {e}")
-
-    # LOCAL: Write to local JSON file
-    if storage_mode in ['local', 'both']:
-        try:
-            os.makedirs('user_data', exist_ok=True)
-            filename = f"{user.user_id}.json"
-            path = os.path.join('user_data', filename)
-
-            with open(path, 'w') as f:
-                json.dump(user_data, f, indent=2)
-
-            local_json_success = True
-            print(f"[INFO] ✓ User data saved to local JSON: {filename}")
-        except Exception as e:
-            print(f"[WARNING] Local JSON write failed for user data: {e}")
-
-    # Return True if at least one method succeeded
-    success = gsheets_success or local_json_success
-    if success:
+    if get_storage(config).save_user(user_data):
         return True
     else:
-        print(f"[ERROR] CRITICAL: All storage methods failed for user {user.user_id}")
+        print(f"[ERROR] CRITICAL: Storage write quorum not met for user {user.user_id}")
         return False
 
 def save_rating(user_id, action_id, scale_values):
@@ -76,9 +41,10 @@ def save_rating(user_id, action_id, scale_values):
     Save rating data based on configured storage_mode.
 
     Storage modes:
-    - "local": Save to local JSON only
-    - "online": Save to Google Sheets only
-    - "both": Save to both Google Sheets and local JSON
+    - "local": Append to local JSONL rating log only
+    - "online": Save to Google Sheets only (write-behind queue)
+    - "both": Save to both Google Sheets and local rating log (concurrently)
+    - "sqlite": Save to the local SQLite database only
 
     Parameters:
     - user_id: User identifier
@@ -86,7 +52,7 @@ def save_rating(user_id, action_id, scale_values):
     - scale_values: Dictionary of scale titles to values
 
     Returns:
-    - True if at least one save method successful, False if all fail
+    - True if the configured write quorum of backends succeeded, False otherwise
     """
     # Build rating data
     rating_data = {
@@ -112,129 +78,58 @@ def save_rating(user_id, action_id, scale_values):
         rating_data['screen_height'] = device_info.get('screen_height')
         rating_data['user_agent'] = device_info.get('user_agent')
 
-    # Get storage mode from config
     config = st.session_state.get('config', {})
-    storage_mode = config.get('settings', {}).get('storage_mode', 'both')
-
-    # Track success of each write method
-    gsheets_success = False
-    local_json_success = False
-
-    # ONLINE: Write to Google Sheets
-    if storage_mode in ['online', 'both']:
-        try:
-            gsheets_success = append_rating_to_gsheets(rating_data, worksheet="v2_ImageSliders_ratings")
-            if gsheets_success:
-                print(f"[INFO] ✓ Rating saved to Google Sheets: {user_id}_{action_id}")
-        except Exception as e:
-            print(f"[WARNING] Google Sheets write failed: {e}")
-
-    # LOCAL: Write to local JSON file
-    if storage_mode in ['local', 'both']:
-        try:
-            os.makedirs('user_ratings', exist_ok=True)
-            filename = os.path.join('user_ratings', f"{user_id}_{action_id}.json")
-            with open(filename, 'w') as f:
-                json.dump(rating_data, f, indent=2)
-            local_json_success = True
-            print(f"[INFO] ✓ Rating saved to local JSON: {user_id}_{action_id}.json")
-        except Exception as e:
-            print(f"[WARNING] Local JSON write failed: {e}")
-
-    # Return True if at least one method succeeded
-    success = gsheets_success or local_json_success
-    if success:
+    if get_storage(config).save_rating(rating_data):
+        release_video_lease(action_id)
+        advance_session_plan(user_id, action_id)
         return True
     else:
-        print(f"[ERROR] CRITICAL: All storage methods failed for {user_id}_{action_id}")
+        print(f"[ERROR] CRITICAL: Storage write quorum not met for {user_id}_{action_id}")
         return False
 
 def get_all_existing_user_ids():
     """
     Get all existing user IDs from the system.
-    Tries both Google Sheets and local JSON, combines results.
+    Union of the in-memory user registries of all configured backends.
 
     Returns:
     - List of all unique user IDs
     """
-    user_ids = set()
-
-    # Try Google Sheets first
-    try:
-        from utils.gsheets_manager import get_all_user_ids_from_gsheets
-        gsheets_ids = get_all_user_ids_from_gsheets(worksheet="v2_ImageSliders_users")
-        user_ids.update(gsheets_ids)
-        print(f"[INFO] Retrieved {len(gsheets_ids)} user IDs from Google Sheets")
-    except Exception as e:
-        print(f"[WARNING] Failed to get user IDs from Google Sheets: {e}")
-
-    # Also check local JSON files
+    config = st.session_state.get('config', {})
     try:
-        if os.path.exists('user_data'):
-            for filename in os.listdir('user_data'):
-                if filename.endswith('.json'):
-                    user_id = filename.replace('.json', '')
-                    user_ids.add(user_id)
-            print(f"[INFO] Found {len(user_ids)} total unique user IDs")
+        user_ids = get_storage(config).get_all_user_ids()
+        print(f"[INFO] Found {len(user_ids)} total unique user IDs")
+        return user_ids
     except Exception as e:
-        print(f"[WARNING] Failed to get user IDs from local files: {e}")
-
-    return list(user_ids)
+        print(f"[WARNING] Failed to get user IDs: {e}")
+        return []
 
 def user_exists(user_id):
     """
     Check if a user_id exists in the system (case-insensitive).
-    Tries Google Sheets first (primary), falls back to local JSON (backup).
+    Looks the ID up in the in-memory user registries of the configured
+    backends (fastest first).
 
     Parameters:
     - user_id: User identifier to check
 
     Returns:
-    - True if user has at least one rating file, False otherwise
+    - True if user is known, False otherwise
     """
-    # PRIMARY: Try Google Sheets first
+    config = st.session_state.get('config', {})
     try:
-        if user_exists_in_gsheets(user_id, worksheet="v2_ImageSliders_users"):
-            print(f"[INFO] User {user_id} found in Google Sheets")
+        if get_storage(config).user_exists(user_id):
+            print(f"[INFO] User {user_id} found")
             return True
-    except Exception as e:
-        print(f"[WARNING] Failed to check user existence in Google Sheets: {e}")
-
-    # FALLBACK: Check local JSON files (case-insensitive)
-    try:
-        if not os.path.exists('user_data'):
-            return False
-
-        # Check in user_data folder (primary storage for user info) - case insensitive
-        user_id_lower = user_id.lower()
-        for filename in os.listdir('user_data'):
-            if filename.endswith('.json'):
-                file_user_id = filename.replace('.json', '').lower()
-                if file_user_id == user_id_lower:
-                    print(f"[INFO] User {user_id} found in local JSON files")
-                    return True
-
-        # Also check user_ratings as fallback - case insensitive
-        if not os.path.exists('user_ratings'):
-            return False
-
-        user_ratings_files = os.listdir('user_ratings')
-        for f in user_ratings_files:
-            if '_' in f and f.endswith('.json'):
-                file_user_id = f.split('_')[0].lower()
-                if file_user_id == user_id_lower:
-                    print(f"[INFO] User {user_id} found in local JSON files")
-                    return True
-
         return False
     except Exception as e:
-        print(f"[ERROR] Failed to check user existence in both sources: {e}")
+        print(f"[ERROR] Failed to check user existence: {e}")
         return False
 
 def get_rated_videos_for_user(user_id):
     """
     Get list of video IDs already rated by a user (case-insensitive).
-    Tries Google Sheets first (primary), falls back to local JSON (backup).
+    Reads from the fastest healthy backend, falling back to the others.
 
     Parameters:
     - user_id: User identifier
@@ -242,37 +137,97 @@ def get_rated_videos_for_user(user_id):
     Returns:
     - List of action IDs (without .mp4 extension)
     """
-    # PRIMARY: Try Google Sheets first
+    config = st.session_state.get('config', {})
+    try:
+        rated_ids = get_storage(config).get_rated_videos(user_id)
+        print(f"[INFO] Retrieved {len(rated_ids)} rated videos for user {user_id}")
+        return rated_ids
+    except Exception as e:
+        print(f"[ERROR] Failed to get rated videos from all backends: {e}")
+        return []
+
+def get_videos_below_quota(video_ids, min_ratings):
+    """
+    Filter video IDs to those with fewer than min_ratings ratings overall.
+    Served from the rating count index of the fastest healthy backend.
+
+    Parameters:
+    - video_ids: Candidate video IDs (without .mp4 extension)
+    - min_ratings: Quota (min_ratings_per_video)
+
+    Returns:
+    - List of video IDs still below quota (input order preserved)
+    """
+    config = st.session_state.get('config', {})
+    return get_storage(config).get_videos_below_quota(video_ids, min_ratings)
+
+def get_rating_counts(video_ids):
+    """
+    Get the current number of ratings of each video (for least-rated-first assignment).
+    Served from the rating count index of the fastest healthy backend.
+
+    Parameters:
+    - video_ids: Candidate video IDs (without .mp4 extension)
+
+    Returns:
+    - Dict video ID -> number of ratings (0 if unrated)
+    """
+    config = st.session_state.get('config', {})
+    return get_storage(config).get_rating_counts(video_ids)
+
+def _lease_session_id():
+    """Unique ID of this Streamlit session for video leases."""
+    if 'lease_session_id' not in st.session_state:
+        st.session_state.lease_session_id = uuid.uuid4().hex
+    return st.session_state.lease_session_id
+
+def reserve_videos(user_id, select):
+    """
+    Choose this session's videos and lease them (see utils/video_leases.py).
+
+    Parameters:
+    - user_id: User identifier
+    - select: Callable(pending) -> list of video IDs; pending maps video ID ->
+      unrated leases of other sessions plus rated leases saved by other processes
+
+    Returns:
+    - List of leased video IDs
+    """
+    config = st.session_state.get('config', {})
+    return get_lease_table(config).reserve(_lease_session_id(), user_id, select)
+
+def release_video_lease(action_id):
+    """
+    Mark this session's lease on a rated video as rated (no-op if leasing is disabled).
+
+    The lease is kept until the rating is visible to every process's counts.
+    """
+    config = st.session_state.get('config', {})
+    if not is_leasing_enabled(config):
+        return
     try:
-        gsheets_ids = get_rated_videos_for_user_from_gsheets(user_id, worksheet="v2_ImageSliders_ratings")
-        if gsheets_ids:
-            print(f"[INFO] Retrieved {len(gsheets_ids)} rated videos from Google Sheets for user {user_id}")
-            return gsheets_ids
+        get_lease_table(config).release(_lease_session_id(), action_id)
     except Exception as e:
-        print(f"[WARNING] Failed to get rated videos from Google Sheets: {e}")
+        # The lease expires on its own; the rating itself is saved
+        print(f"[WARNING] Failed to release lease on {action_id}: {e}")
 
-    # FALLBACK: Use local JSON files (case-insensitive)
+def release_session_leases():
+    """Release all leases of this session (no-op if leasing is disabled)."""
+    config = st.session_state.get('config', {})
+    if not is_leasing_enabled(config):
+        return
     try:
-        if not os.path.exists('user_ratings'):
-            return []
-
-        files = os.listdir('user_ratings')
-        rated_ids = []
-        user_id_lower = user_id.lower()
-
-        for f in files:
-            if f.endswith('.json') and '_' in f:
-                # Extract user_id from filename (case-insensitive match)
-                file_user_id = f.split('_')[0].lower()
-                if file_user_id == user_id_lower:
-                    # Extract action_id from filename: {user_id}_{action_id}.json
-                    parts = f.replace('.json', '').split('_', 1)
-                    if len(parts) > 1:
-                        action_id = parts[1]
-                        rated_ids.append(action_id)
-
-        print(f"[INFO] Retrieved {len(rated_ids)} rated videos from JSON backup for user {user_id}")
-        return rated_ids
+        get_lease_table(config).release_session(_lease_session_id())
     except Exception as e:
-        print(f"[ERROR] Failed to get rated videos from both sources: {e}")
-        return []
+        print(f"[WARNING] Failed to release session leases: {e}")
+
+def advance_session_plan(user_id, action_id):
+    """Move the user's session plan cursor past a rated video (no-op if plans are disabled)."""
+    config = st.session_state.get('config', {})
+    if not is_session_plans_enabled(config):
+        return
+    try:
+        get_plan_store(config).advance(user_id, action_id)
+    except Exception as e:
+        # The rating itself is saved; on resume the user may see this video again
+        print(f"[WARNING] Failed to advance session plan of user {user_id}: {e}")
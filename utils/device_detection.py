@@ -8,6 +8,9 @@ import streamlit as st
 from user_agents import parse
 from streamlit_js_eval import streamlit_js_eval
 
+# JavaScript signals the rendition choice depends on (utils/renditions.required_height)
+RENDITION_SIGNALS = ('window_innerWidth', 'devicePixelRatio')
+
 
 def get_device_info() -> dict:
     """
@@ -26,6 +29,7 @@ def get_device_info() -> dict:
             - maxTouchPoints: int|None - Maximum number of simultaneous touch points
             - screen_width: int|None - Physical screen width in pixels
             - screen_height: int|None - Physical screen height in pixels
+            - devicePixelRatio: float|None - Device pixels per CSS pixel
             - user_agent: str - Raw User-Agent string
     """
     # Get User-Agent from Streamlit context headers
@@ -37,6 +41,7 @@ def get_device_info() -> dict:
     max_touch_points = streamlit_js_eval(js_expressions="navigator.maxTouchPoints", key="device_touch_pts")
     screen_width = streamlit_js_eval(js_expressions="window.screen.width", key="device_screen_w")
     screen_height = streamlit_js_eval(js_expressions="window.screen.height", key="device_screen_h")
+    pixel_ratio = streamlit_js_eval(js_expressions="window.devicePixelRatio", key="device_pixel_ratio")
 
     # Parse User-Agent
     ua = parse(ua_raw or "")
@@ -75,6 +80,7 @@ def get_device_info() -> dict:
         "maxTouchPoints": max_touch_points,
         "screen_width": screen_width,
         "screen_height": screen_height,
+        "devicePixelRatio": pixel_ratio,
         "user_agent": ua_raw,
     }
 
@@ -84,12 +90,16 @@ def get_device_info_cached() -> dict:
     Get device information with session state caching.
 
     Device info is collected once per session and cached to avoid
-    repeated JavaScript evaluations.
+    repeated JavaScript evaluations. Each JavaScript signal arrives on its own
+    rerun after the first render, so collection is repeated (call at most
+    once per script run) until every signal used to pick video renditions
+    (RENDITION_SIGNALS) is known.
 
     Returns:
         dict: Device information (same format as get_device_info())
     """
-    if 'device_info' not in st.session_state:
+    cached = st.session_state.get('device_info')
+    if cached is None or any(cached.get(key) is None for key in RENDITION_SIGNALS):
         st.session_state.device_info = get_device_info()
 
     return st.session_state.device_info
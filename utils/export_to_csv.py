@@ -52,6 +52,33 @@ def load_json_files_with_datetime(path, file_type='ratings'):
     df = pd.DataFrame(all_data)
     return df
 
+def load_ratings_from_log(config=None):
+    """
+    Load all ratings from the JSONL rating log, plus legacy per-rating JSON files.
+
+    Parameters:
+    - config: optional configuration dictionary (settings.rating_log)
+
+    Returns:
+    - DataFrame with all records, file_created_at and filename columns
+    """
+    from utils.rating_log import get_rating_log
+
+    all_data = []
+    for filename, record in get_rating_log(config).iter_records():
+        record = dict(record)
+        if 'timestamp' in record:
+            record['file_created_at'] = datetime.fromisoformat(record['timestamp'])
+        else:
+            # Legacy files carry no timestamp: fall back to file modification time
+            filepath = os.path.join('user_ratings', filename)
+            if os.path.exists(filepath):
+                record['file_created_at'] = datetime.fromtimestamp(os.path.getmtime(filepath))
+        record['filename'] = filename
+        all_data.append(record)
+
+    return pd.DataFrame(all_data)
+
 def export_all_data():
     """
     Export all ratings and user data to CSV files.
@@ -64,8 +91,22 @@ def export_all_data():
     # Create output directory
     os.makedirs(output_path, exist_ok=True)
 
-    # Load ratings
-    df_ratings = load_json_files_with_datetime(ratings_path, 'ratings')
+    # Load ratings (rating log + legacy per-rating files)
+    try:
+        from utils.config_loader import load_config
+        config = load_config()
+    except FileNotFoundError:
+        config = None
+    storage_mode = ((config or {}).get('settings', {}) or {}).get('storage_mode', 'both')
+    if storage_mode == 'sqlite':
+        from utils import sqlite_store
+        db_path = sqlite_store.get_sqlite_path(config)
+        df_ratings = pd.DataFrame(sqlite_store.read_table('ratings', db_path=db_path))
+        if not df_ratings.empty:
+            df_ratings['file_created_at'] = pd.to_datetime(df_ratings['timestamp'])
+            df_ratings['filename'] = os.path.basename(db_path)
+    else:
+        df_ratings = load_ratings_from_log(config)
 
     if not df_ratings.empty:
         df_ratings.to_csv(f'{output_path}ratings.csv', index=False)
@@ -73,7 +114,7 @@ def export_all_data():
         print(f"Number of rated actions: {df_ratings['id'].nunique()}")
 
         # Dynamically identify scale columns
-        metadata_columns = ['user_id', 'id', 'file_created_at', 'filename']
+        metadata_columns = ['user_id', 'id', 'timestamp', 'file_created_at', 'filename']
         all_columns = df_ratings.columns.tolist()
         scale_columns = [col for col in all_columns if col not in metadata_columns]
 
@@ -98,7 +139,12 @@ def export_all_data():
         print("No ratings data found")
 
     # Load user data
-    df_users = load_json_files_with_datetime(userdata_path, 'users')
+    if storage_mode == 'sqlite':
+        df_users = pd.DataFrame(sqlite_store.read_table('users', db_path=db_path))
+        if not df_users.empty:
+            df_users['filename'] = os.path.basename(db_path)
+    else:
+        df_users = load_json_files_with_datetime(userdata_path, 'users')
 
     if not df_users.empty:
         df_users.to_csv(f'{output_path}users.csv', index=False)
@@ -160,8 +206,18 @@ def export_all_data():
                     os.path.join('backup/user_ratings/', filename)
                 )
 
+    from utils.rating_log import get_rating_log
+    rating_log = get_rating_log(config)
+    if rating_log.segment_paths():
+        os.makedirs('backup/rating_log/', exist_ok=True)
+        for segment_path in rating_log.segment_paths():
+            shutil.copy(segment_path, os.path.join('backup/rating_log/', os.path.basename(segment_path)))
+
     print("\n[INFO] Backup of JSON files completed.")
     print("[INFO] Export completed successfully!")
 
 if __name__ == '__main__':
+    # Allow running as `python utils/export_to_csv.py` from the app directory
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     export_all_data()
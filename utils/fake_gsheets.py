@@ -0,0 +1,446 @@
+"""
+Offline stand-in for Google Sheets (gspread client + st.connection("gsheets")).
+
+Implements the subset of the gspread / GSheetsConnection API used by
+utils/gsheets_manager.py on top of an in-memory grid per worksheet, with
+configurable per-call latency, a transfer cost per cell, quota (HTTP 429)
+and random server errors, and pre-seeded synthetic rows. Select it with
+settings.gsheets_backend: "fake" in config.yaml or GSHEETS_BACKEND=fake.
+
+Benchmark the read and write paths against large sheets:
+    python -m utils.fake_gsheets --rows 100000
+"""
+import argparse
+import collections
+import random
+import string
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+from gspread.exceptions import APIError, WorksheetNotFound
+
+FAKE_SPREADSHEET_URL = 'fake://spreadsheet'
+RATINGS_WORKSHEET = "v2_ImageSliders_ratings"
+USERS_WORKSHEET = "v2_ImageSliders_users"
+
+# Defaults (overridable via settings.fake_gsheets in config.yaml)
+DEFAULT_SETTINGS = {
+    'latency_ms': 0,                  # fixed latency per API call
+    'latency_jitter_ms': 0,           # + uniform random [0, jitter]
+    'latency_per_1k_cells_ms': 0,     # transfer cost, per 1000 cells read or written
+    'read_quota_per_minute': 0,       # 0 = unlimited; Sheets allows 60 per user
+    'write_quota_per_minute': 0,      # 0 = unlimited; Sheets allows 60 per user
+    'error_rate': 0.0,                # probability of a random HTTP 503 per call
+    'seed_rows': {},                  # worksheet name -> synthetic rows to pre-seed
+    'random_seed': None,
+}
+
+# Process-wide fake spreadsheet (shared by the client and the connection)
+_fake_spreadsheet = None
+_fake_spreadsheet_lock = threading.Lock()
+
+
+class _FakeResponse:
+    """Minimal requests.Response look-alike so APIError and retry checks work."""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+
+    def json(self):
+        return {'error': {'code': self.status_code, 'message': self.text}}
+
+
+def _column_letters_to_index(letters):
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord('A') + 1)
+    return index
+
+
+def _parse_range(range_name):
+    """
+    Parse an A1 range ("A1", "C2:C", "1:1", "A1:D10") into 1-based
+    (first_row, first_col, last_row, last_col); open ends are None.
+    """
+    def parse_cell(cell):
+        letters = cell.rstrip(string.digits)
+        digits = cell[len(letters):]
+        row = int(digits) if digits else None
+        col = _column_letters_to_index(letters) if letters else None
+        return row, col
+
+    start, _, end = range_name.partition(':')
+    first_row, first_col = parse_cell(start)
+    if not end:
+        return first_row, first_col, first_row, first_col
+    # "C2:C" -> open-ended rows; "1:1" -> all columns
+    last_row, last_col = parse_cell(end)
+    return first_row or 1, first_col or 1, last_row, last_col
+
+
+class FakeSpreadsheet:
+    """In-memory spreadsheet: worksheet title -> FakeWorksheet, plus the fault model."""
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.url = FAKE_SPREADSHEET_URL
+
+        self._worksheets = {}
+        self._lock = threading.Lock()
+        self._calls = {'read': collections.deque(), 'write': collections.deque()}
+        self._random = random.Random(self.settings.get('random_seed'))
+        self.stats = collections.Counter()
+
+    def _api_call(self, kind, cells=0):
+        """Apply latency, quota and error injection for one API call."""
+        settings = self.settings
+        now = time.monotonic()
+        with self._lock:
+            self.stats[f'{kind}_calls'] += 1
+            self.stats[f'{kind}_cells'] += cells
+
+            quota = settings.get(f'{kind}_quota_per_minute') or 0
+            if quota:
+                window = self._calls[kind]
+                while window and now - window[0] >= 60.0:
+                    window.popleft()
+                if len(window) >= quota:
+                    self.stats['quota_errors'] += 1
+                    raise APIError(_FakeResponse(429, f"Quota exceeded for {kind} requests per minute"))
+                window.append(now)
+
+            if settings.get('error_rate') and self._random.random() < settings['error_rate']:
+                self.stats['server_errors'] += 1
+                raise APIError(_FakeResponse(503, "The service is currently unavailable"))
+
+            delay_ms = (settings.get('latency_ms') or 0)
+            delay_ms += self._random.uniform(0, settings.get('latency_jitter_ms') or 0)
+            delay_ms += (settings.get('latency_per_1k_cells_ms') or 0) * cells / 1000.0
+
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+    def worksheet(self, title):
+        self._api_call('read')
+        with self._lock:
+            ws = self._worksheets.get(title)
+        if ws is None:
+            raise WorksheetNotFound(title)
+        return ws
+
+    def worksheets(self):
+        self._api_call('read')
+        with self._lock:
+            return list(self._worksheets.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26, index=None):
+        self._api_call('write')
+        with self._lock:
+            if title in self._worksheets:
+                raise APIError(_FakeResponse(400, f'A sheet with the name "{title}" already exists'))
+            ws = FakeWorksheet(self, title)
+            self._worksheets[title] = ws
+        return ws
+
+    def seed(self, title, n_rows, kind=None):
+        """
+        Fill a worksheet with n_rows synthetic rows (plus a header row).
+
+        Parameters:
+            title: Worksheet name (created if missing)
+            n_rows: Number of data rows
+            kind: "ratings" or "users" (default: guessed from the title)
+        """
+        with self._lock:
+            ws = self._worksheets.get(title)
+            if ws is None:
+                ws = self._worksheets[title] = FakeWorksheet(self, title)
+
+        kind = kind or ('users' if 'user' in title.lower() else 'ratings')
+        rng = random.Random(self.settings.get('random_seed'))
+        timestamp = datetime.now().isoformat()
+
+        if kind == 'users':
+            header = ['user_id', 'age', 'gender', 'timestamp']
+            rows = [[f"user{i:06d}", str(rng.randint(18, 70)), rng.choice(['male', 'female', 'other']), timestamp]
+                    for i in range(n_rows)]
+        else:
+            header = ['user_id', 'id', 'video_id', 'valence', 'arousal', 'timestamp']
+            n_users = max(1, n_rows // 60)
+            rows = [[f"user{rng.randrange(n_users):06d}", str(i % 64 + 1), f"img_{i % 64 + 1}",
+                     str(rng.randint(1, 9)), str(rng.randint(1, 9)), timestamp]
+                    for i in range(n_rows)]
+
+        with ws._lock:
+            ws._rows = [header] + rows
+        return ws
+
+
+class FakeWorksheet:
+    """One worksheet as a list of rows (lists of strings), trailing cells trimmed."""
+
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self._rows = []
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        with self._lock:
+            return len(self._rows)
+
+    @staticmethod
+    def _to_cells(values):
+        cells = ['' if v is None else str(v) for v in values]
+        while cells and cells[-1] == '':
+            cells.pop()
+        return cells
+
+    def get_all_values(self, **kwargs):
+        with self._lock:
+            rows = [list(row) for row in self._rows]
+        self.spreadsheet._api_call('read', sum(len(row) for row in rows))
+        return rows
+
+    def get_all_records(self, **kwargs):
+        rows = self.get_all_values()
+        if not rows:
+            return []
+        header = rows[0]
+        return [dict(zip(header, row + [''] * (len(header) - len(row)))) for row in rows[1:]]
+
+    def row_values(self, row, **kwargs):
+        with self._lock:
+            values = list(self._rows[row - 1]) if 0 < row <= len(self._rows) else []
+        self.spreadsheet._api_call('read', len(values))
+        return values
+
+    def col_values(self, col, **kwargs):
+        with self._lock:
+            values = [row[col - 1] if len(row) >= col else '' for row in self._rows]
+        self.spreadsheet._api_call('read', len(values))
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def _get_range(self, range_name):
+        first_row, first_col, last_row, last_col = _parse_range(range_name)
+        rows = self._rows[first_row - 1:last_row]
+        values = []
+        for row in rows:
+            cells = row[first_col - 1:last_col]
+            while cells and cells[-1] == '':
+                cells.pop()
+            values.append(cells)
+        # Sheets trims trailing empty rows
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def get(self, range_name=None, **kwargs):
+        with self._lock:
+            values = self._get_range(range_name) if range_name else [list(r) for r in self._rows]
+        self.spreadsheet._api_call('read', sum(len(row) for row in values))
+        return values
+
+    def batch_get(self, ranges, **kwargs):
+        with self._lock:
+            value_ranges = [self._get_range(r) for r in ranges]
+        self.spreadsheet._api_call('read', sum(len(row) for vr in value_ranges for row in vr))
+        return value_ranges
+
+    def append_row(self, values, value_input_option='RAW', **kwargs):
+        return self.append_rows([values], value_input_option=value_input_option)
+
+    def append_rows(self, values, value_input_option='RAW', **kwargs):
+        rows = [self._to_cells(row) for row in values]
+        self.spreadsheet._api_call('write', sum(len(row) for row in rows))
+        with self._lock:
+            start = len(self._rows) + 1
+            self._rows.extend(rows)
+        return {'updates': {'updatedRange': f"{self.title}!A{start}", 'updatedRows': len(rows)}}
+
+    def update(self, range_name, values=None, value_input_option='RAW', **kwargs):
+        if values is None:
+            # gspread also accepts update(values) for A1
+            range_name, values = 'A1', range_name
+        first_row, first_col, _, _ = _parse_range(range_name)
+        self.spreadsheet._api_call('write', sum(len(row) for row in values))
+        with self._lock:
+            for offset, new_values in enumerate(values):
+                index = first_row - 1 + offset
+                while len(self._rows) <= index:
+                    self._rows.append([])
+                row = self._rows[index]
+                needed = first_col - 1 + len(new_values)
+                if len(row) < needed:
+                    row.extend([''] * (needed - len(row)))
+                row[first_col - 1:first_col - 1 + len(new_values)] = ['' if v is None else str(v) for v in new_values]
+                self._rows[index] = self._to_cells(row)
+        return {'updatedRange': f"{self.title}!{range_name}"}
+
+    def clear(self):
+        self.spreadsheet._api_call('write')
+        with self._lock:
+            self._rows = []
+
+
+class FakeGspreadClient:
+    """Stand-in for gspread.Client: every URL/key opens the shared fake spreadsheet."""
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def set_timeout(self, timeout=None):
+        pass
+
+    def open_by_url(self, url):
+        self.spreadsheet._api_call('read')
+        return self.spreadsheet
+
+    def open_by_key(self, key):
+        return self.open_by_url(key)
+
+    def open(self, title, folder_id=None):
+        return self.open_by_url(title)
+
+
+class FakeGSheetsConnection:
+    """Stand-in for st.connection("gsheets", type=GSheetsConnection)."""
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def read(self, worksheet=None, ttl=None, **kwargs):
+        """Return the worksheet as a DataFrame (row 1 = column names), like GSheetsConnection."""
+        try:
+            rows = self.spreadsheet.worksheet(worksheet).get_all_values()
+        except WorksheetNotFound:
+            return pd.DataFrame()
+        if not rows:
+            return pd.DataFrame()
+        header = rows[0]
+        data = [row + [''] * (len(header) - len(row)) for row in rows[1:]]
+        return pd.DataFrame([row[:len(header)] for row in data], columns=header)
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        """Replace the worksheet contents with a DataFrame."""
+        try:
+            ws = self.spreadsheet.worksheet(worksheet)
+        except WorksheetNotFound:
+            ws = self.spreadsheet.add_worksheet(title=worksheet)
+        values = [list(data.columns)] + data.astype(str).values.tolist()
+        ws.clear()
+        ws.update('A1', values)
+        return data
+
+
+def get_fake_spreadsheet(settings=None):
+    """
+    Get or create the process-wide fake spreadsheet.
+
+    Parameters:
+        settings: Dict like settings.fake_gsheets (used only on first call)
+
+    Returns:
+        FakeSpreadsheet instance
+    """
+    global _fake_spreadsheet
+
+    with _fake_spreadsheet_lock:
+        if _fake_spreadsheet is None:
+            _fake_spreadsheet = FakeSpreadsheet(settings)
+            for title, n_rows in (_fake_spreadsheet.settings.get('seed_rows') or {}).items():
+                _fake_spreadsheet.seed(title, int(n_rows))
+            print(f"[INFO] Using offline Google Sheets stand-in ({FAKE_SPREADSHEET_URL})")
+
+    return _fake_spreadsheet
+
+
+def reset_fake_spreadsheet():
+    """Drop the process-wide fake spreadsheet (next get_fake_spreadsheet starts empty)."""
+    global _fake_spreadsheet
+
+    with _fake_spreadsheet_lock:
+        _fake_spreadsheet = None
+
+
+def _timed(label, func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<45} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+def run_benchmark(n_rows, latency_ms=0.0, latency_per_1k_cells_ms=0.0, repeat=3):
+    """
+    Time the gsheets_manager read/write paths against pre-seeded fake sheets.
+
+    Parameters:
+        n_rows: Rows seeded into the ratings and users worksheets
+        latency_ms: Simulated fixed latency per API call
+        latency_per_1k_cells_ms: Simulated transfer cost per 1000 cells
+        repeat: Repetitions per read measurement
+    """
+    # Use the module instance gsheets_manager imported (this file may run as __main__)
+    from utils import gsheets_manager
+    from utils import fake_gsheets
+
+    fake_gsheets.reset_fake_spreadsheet()
+    gsheets_manager.use_fake_gsheets({
+        'latency_ms': latency_ms,
+        'latency_per_1k_cells_ms': latency_per_1k_cells_ms,
+        'seed_rows': {RATINGS_WORKSHEET: n_rows, USERS_WORKSHEET: n_rows},
+        'random_seed': 0,
+    })
+    spreadsheet = fake_gsheets.get_fake_spreadsheet(gsheets_manager._fake_gsheets_settings)
+    print(f"Benchmark: {n_rows} rows per worksheet, latency {latency_ms} ms/call, "
+          f"{latency_per_1k_cells_ms} ms/1k cells")
+
+    print("Reads:")
+    _timed("read_ratings_from_gsheets (full sheet)",
+           lambda: gsheets_manager.read_ratings_from_gsheets(RATINGS_WORKSHEET), repeat)
+    _timed("read_users_from_gsheets (full sheet)",
+           lambda: gsheets_manager.read_users_from_gsheets(USERS_WORKSHEET), repeat)
+    _timed("read_columns_from_gsheets(user_id, id)",
+           lambda: gsheets_manager.read_columns_from_gsheets(['user_id', 'id'], RATINGS_WORKSHEET), repeat)
+    _timed("read_columns_from_gsheets (incremental, tail)",
+           lambda: gsheets_manager.read_columns_from_gsheets(['user_id', 'id'], RATINGS_WORKSHEET,
+                                                             start_row=n_rows + 2), repeat)
+
+    def rated_videos_uncached():
+        gsheets_manager._rated_videos_cache.clear()
+        return gsheets_manager.get_rated_videos_for_user_from_gsheets('user000001', RATINGS_WORKSHEET)
+    _timed("get_rated_videos_for_user (uncached)", rated_videos_uncached, repeat)
+
+    print("Writes:")
+    rating = {'user_id': 'bench', 'id': '1', 'video_id': 'img_1', 'valence': 5, 'arousal': 5}
+    _timed("append_rating_to_gsheets (single row)",
+           lambda: gsheets_manager.append_rating_to_gsheets(dict(rating), RATINGS_WORKSHEET), repeat)
+    batch = [dict(rating, id=str(i), timestamp=datetime.now().isoformat()) for i in range(20)]
+    _timed("append_ratings_to_gsheets (batch of 20)",
+           lambda: gsheets_manager.append_ratings_to_gsheets(batch, RATINGS_WORKSHEET), repeat)
+
+    print(f"API calls: {dict(spreadsheet.stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Google Sheets access against the offline stand-in")
+    parser.add_argument('--rows', type=int, default=100000, help="Rows to seed per worksheet")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Fixed latency per API call")
+    parser.add_argument('--latency-per-1k-cells-ms', type=float, default=0.0, help="Transfer cost per 1000 cells")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetitions per measurement")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.latency_ms, args.latency_per_1k_cells_ms, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,29 +4,23 @@ Handles video file operations from local filesystem.
 """
 import os
 
+from utils.media_manifest import list_videos, get_media_entry
+
 
 def get_all_video_filenames(folder_path):
     """
     Get list of all video filenames in a local folder.
 
+    Served from the in-memory media manifest (see utils/media_manifest.py).
+
     Args:
         folder_path: Path to local video folder
 
     Returns:
         List of video filenames (e.g., ['event_001.mp4', 'event_002.mp4'])
     """
-    if not os.path.exists(folder_path):
-        print(f"[WARNING] Video folder not found: {folder_path}")
-        return []
-
     try:
-        # List all .mp4 files in the directory
-        video_files = [
-            f for f in os.listdir(folder_path)
-            if f.lower().endswith('.mp4')
-        ]
-        print(f"[INFO] Found {len(video_files)} video files in {folder_path}")
-        return sorted(video_files)
+        return list_videos(folder_path)
     except Exception as e:
         print(f"[ERROR] Failed to list videos in {folder_path}: {e}")
         return []
@@ -49,7 +43,7 @@ def get_video_path(filename, folder_path):
 
     full_path = os.path.join(folder_path, filename)
 
-    if not os.path.exists(full_path):
+    if get_media_entry(full_path) is None:
         print(f"[WARNING] Video file not found: {full_path}")
         return None
 
@@ -6,13 +6,91 @@ import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 import pandas as pd
 from datetime import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, call_with_retry
 
 # Global connection cache
 _gsheets_connection = None
 _gspread_client = None
 
+# Offline stand-in settings (None = live Google Sheets unless GSHEETS_BACKEND=fake)
+_fake_gsheets_settings = None
+
+# Global worksheet/schema cache (worksheet name -> handle + known header order)
+_spreadsheet = None
+_worksheet_cache = {}
+_worksheet_cache_lock = threading.Lock()
+
+# Shared circuit breaker for every Google Sheets call
+READ_DEADLINE = 5.0       # seconds budget per read operation (all retries; each attempt is cut off at the time left)
+WRITE_DEADLINE = 10.0     # seconds budget per write operation (retries only; an append attempt is never abandoned)
+REQUEST_TIMEOUT = 10.0    # seconds per single HTTP request (ends hung appends and abandoned read attempts)
+_gsheets_breaker = CircuitBreaker('gsheets')
+
+# Memoized rated-video lists: (worksheet, lowercase user_id) -> {'ids': [...], 'time': t},
+# least recently used first; expired entries are swept and the size is capped
+RATED_VIDEOS_CACHE_TTL = 300       # seconds
+RATED_VIDEOS_CACHE_MAX_USERS = 1024
+_rated_videos_cache = OrderedDict()
+_rated_videos_cache_lock = threading.Lock()
+
+
+def _call(operation, func, *args, idempotent=True, **kwargs):
+    """Run one Google Sheets API call through the shared breaker with bounded retries."""
+    return call_with_retry(
+        _gsheets_breaker, f"Google Sheets {operation}", func, *args,
+        deadline=READ_DEADLINE if idempotent else WRITE_DEADLINE,
+        idempotent=idempotent, **kwargs
+    )
+
+
+def configure_gsheets_breaker(config):
+    """Apply settings.gsheets_circuit_breaker (failure_threshold, reset_timeout_seconds)."""
+    breaker_config = (config or {}).get('settings', {}).get('gsheets_circuit_breaker', {}) or {}
+    _gsheets_breaker.failure_threshold = int(breaker_config.get('failure_threshold', _gsheets_breaker.failure_threshold))
+    _gsheets_breaker.reset_timeout = float(breaker_config.get('reset_timeout_seconds', _gsheets_breaker.reset_timeout))
+
+
+def is_gsheets_available():
+    """Return False while the Google Sheets circuit breaker is open."""
+    return not _gsheets_breaker.is_open()
+
+
+def use_fake_gsheets(settings=None):
+    """
+    Route all Google Sheets access through the offline stand-in (utils/fake_gsheets.py).
+
+    Parameters:
+        settings: Dict like settings.fake_gsheets (latency, quotas, seed_rows)
+    """
+    global _fake_gsheets_settings, _gsheets_connection, _gspread_client, _spreadsheet
+
+    _fake_gsheets_settings = dict(settings or {})
+    _gsheets_connection = None
+    _gspread_client = None
+    _spreadsheet = None
+    invalidate_worksheet_cache()
+    with _rated_videos_cache_lock:
+        _rated_videos_cache.clear()
+
+
+def configure_gsheets_backend(config):
+    """Select the offline stand-in if settings.gsheets_backend is "fake"."""
+    settings = (config or {}).get('settings', {}) or {}
+    if settings.get('gsheets_backend', 'live') == 'fake' and _fake_gsheets_settings is None:
+        use_fake_gsheets(settings.get('fake_gsheets'))
+
+
+def _fake_gsheets_enabled():
+    return _fake_gsheets_settings is not None or os.environ.get('GSHEETS_BACKEND') == 'fake'
+
+
 def get_gsheets_connection():
     """
     Get or create a cached Google Sheets connection.
@@ -23,6 +101,12 @@ def get_gsheets_connection():
     global _gsheets_connection
 
     if _gsheets_connection is None:
+        if _fake_gsheets_enabled():
+            from utils import fake_gsheets  # offline stand-in, only loaded when selected
+            spreadsheet = fake_gsheets.get_fake_spreadsheet(_fake_gsheets_settings)
+            _gsheets_connection = fake_gsheets.FakeGSheetsConnection(spreadsheet)
+            return _gsheets_connection
+
         try:
             _gsheets_connection = st.connection("gsheets", type=GSheetsConnection)
             print("[INFO] Google Sheets connection established")
@@ -44,6 +128,12 @@ def get_gspread_client():
     global _gspread_client
 
     if _gspread_client is None:
+        if _fake_gsheets_enabled():
+            from utils import fake_gsheets  # offline stand-in, only loaded when selected
+            spreadsheet = fake_gsheets.get_fake_spreadsheet(_fake_gsheets_settings)
+            _gspread_client = fake_gsheets.FakeGspreadClient(spreadsheet)
+            return _gspread_client
+
         try:
             # Get credentials from secrets
             credentials_dict = dict(st.secrets["connections"]["gsheets"])
@@ -65,6 +155,7 @@ def get_gspread_client():
 
             # Create gspread client
             _gspread_client = gspread.authorize(credentials)
+            _gspread_client.set_timeout(REQUEST_TIMEOUT)
             print("[INFO] gspread client created successfully")
 
         except Exception as e:
@@ -76,6 +167,202 @@ def get_gspread_client():
     return _gspread_client
 
 
+def get_spreadsheet():
+    """
+    Get or create the cached spreadsheet handle for the configured URL.
+
+    Returns:
+        gspread.Spreadsheet object or None if connection fails
+    """
+    global _spreadsheet
+
+    if _spreadsheet is None:
+        gspread_client = get_gspread_client()
+        if gspread_client is None:
+            print("[WARNING] No gspread client available")
+            return None
+
+        # Get spreadsheet URL from secrets
+        if _fake_gsheets_enabled():
+            from utils import fake_gsheets  # offline stand-in, only loaded when selected
+            spreadsheet_url = fake_gsheets.FAKE_SPREADSHEET_URL
+        else:
+            spreadsheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
+        _spreadsheet = _call('open_by_url', gspread_client.open_by_url, spreadsheet_url)
+
+    return _spreadsheet
+
+
+def get_cached_worksheet(worksheet):
+    """
+    Get the cache entry for a worksheet, opening (or creating) it on first use.
+
+    The entry holds the gspread worksheet object, the known header order
+    (None until row 1 has been read) and a lock that serializes header changes
+    within this process.
+
+    Parameters:
+        worksheet: Name of worksheet
+
+    Returns:
+        Cache entry dict or None if the spreadsheet is unavailable
+    """
+    with _worksheet_cache_lock:
+        entry = _worksheet_cache.get(worksheet)
+        if entry is not None:
+            return entry
+
+        spreadsheet = get_spreadsheet()
+        if spreadsheet is None:
+            return None
+
+        # Try to get the worksheet, create if it doesn't exist
+        try:
+            ws = _call('worksheet', spreadsheet.worksheet, worksheet)
+        except gspread.exceptions.WorksheetNotFound:
+            # Worksheet doesn't exist, create it
+            ws = _call('add_worksheet', spreadsheet.add_worksheet, title=worksheet, rows=1000, cols=26,
+                       idempotent=False)
+            print(f"[INFO] Created new worksheet: {worksheet}")
+
+        entry = {'worksheet': ws, 'headers': None, 'lock': threading.Lock()}
+        _worksheet_cache[worksheet] = entry
+        return entry
+
+
+def invalidate_worksheet_cache(worksheet=None):
+    """
+    Drop cached worksheet handles so the next write re-opens them.
+
+    Parameters:
+        worksheet: Name of worksheet to drop (default: None = drop all)
+    """
+    global _spreadsheet
+
+    with _worksheet_cache_lock:
+        if worksheet is None:
+            _worksheet_cache.clear()
+            _spreadsheet = None
+        else:
+            _worksheet_cache.pop(worksheet, None)
+
+
+def _resolve_headers(entry, keys, worksheet):
+    """
+    Return the column order for a row with the given keys.
+
+    Row 1 is only read when the cached header is unknown or the row brings
+    keys the cache has not seen; new keys are appended to the header row.
+    Must be called with the entry lock held.
+
+    Parameters:
+        entry: Worksheet cache entry from get_cached_worksheet()
+        keys: Keys of the row about to be written
+        worksheet: Name of worksheet (for logging)
+
+    Returns:
+        Tuple (headers, header_row_to_prepend) where header_row_to_prepend is
+        a header list that must be appended before the data (empty sheet) or None
+    """
+    ws = entry['worksheet']
+    headers = entry['headers']
+
+    if headers is not None and all(k in headers for k in keys):
+        return headers, None
+
+    # Unknown or outdated schema: re-read only the header row
+    headers = [h for h in _call('row_values', ws.row_values, 1) if h]
+
+    if not headers:
+        # Sheet is empty, header goes in front of the first row
+        headers = list(keys)
+        entry['headers'] = headers
+        print(f"[INFO] Creating headers in worksheet: {worksheet}")
+        return headers, headers
+
+    new_columns = [k for k in keys if k not in headers]
+    if new_columns:
+        headers = headers + new_columns
+        _call('update', ws.update, '1:1', [headers], value_input_option='RAW')
+
+    entry['headers'] = headers
+    return headers, None
+
+
+def _append_records(records, worksheet):
+    """
+    Append several dictionaries in one append_rows call, keeping column order.
+
+    Parameters:
+        records: List of dictionaries of column name -> value
+        worksheet: Name of worksheet to write to
+
+    Returns:
+        True if successful, False if no worksheet is available
+    """
+    entry = get_cached_worksheet(worksheet)
+    if entry is None:
+        return False
+
+    # Union of keys in first-seen order
+    keys = list(dict.fromkeys(k for record in records for k in record.keys()))
+
+    try:
+        with entry['lock']:
+            headers, header_row = _resolve_headers(entry, keys, worksheet)
+            rows = [[record.get(col, '') for col in headers] for record in records]
+
+            if header_row is not None:
+                _call('append_row', entry['worksheet'].append_row, header_row,
+                      value_input_option='RAW', idempotent=False)
+            _call('append_rows', entry['worksheet'].append_rows, rows,
+                  value_input_option='USER_ENTERED', idempotent=False)
+    except CircuitOpenError:
+        raise
+    except Exception:
+        invalidate_worksheet_cache(worksheet)
+        raise
+
+    return True
+
+
+def _append_record(record, worksheet):
+    """
+    Append one dictionary as a row, keeping the worksheet's column order.
+
+    In steady state (known schema) this costs a single append_row API call.
+
+    Parameters:
+        record: Dictionary of column name -> value
+        worksheet: Name of worksheet to write to
+
+    Returns:
+        True if successful, False if no worksheet is available
+    """
+    entry = get_cached_worksheet(worksheet)
+    if entry is None:
+        return False
+
+    try:
+        with entry['lock']:
+            headers, header_row = _resolve_headers(entry, list(record.keys()), worksheet)
+            row_values = [record.get(col, '') for col in headers]
+
+            if header_row is not None:
+                _call('append_row', entry['worksheet'].append_row, header_row,
+                      value_input_option='RAW', idempotent=False)
+            _call('append_row', entry['worksheet'].append_row, row_values,
+                  value_input_option='USER_ENTERED', idempotent=False)
+    except CircuitOpenError:
+        raise
+    except Exception:
+        # Handle may be stale (worksheet deleted, token expired): reopen next time
+        invalidate_worksheet_cache(worksheet)
+        raise
+
+    return True
+
+
 def append_rating_to_gsheets(rating_data, worksheet="v2_ImageSliders_ratings"):
     """
     Append a single rating row to Google Sheets using true append (no overwrite).
@@ -88,75 +375,126 @@ def append_rating_to_gsheets(rating_data, worksheet="v2_ImageSliders_ratings"):
         True if successful, False otherwise
     """
     try:
-        # Get the gspread client for advanced operations
-        gspread_client = get_gspread_client()
-        if gspread_client is None:
-            print("[WARNING] No gspread client available")
-            return False
-
         # Add timestamp
         rating_data_with_timestamp = rating_data.copy()
         rating_data_with_timestamp['timestamp'] = datetime.now().isoformat()
 
-        # Get spreadsheet URL from secrets
-        spreadsheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
+        if not _append_record(rating_data_with_timestamp, worksheet):
+            return False
 
-        # Open the spreadsheet
-        spreadsheet = gspread_client.open_by_url(spreadsheet_url)
+        print(f"[INFO] Rating appended to Google Sheets (worksheet: {worksheet})")
+        return True
 
-        # Try to get the worksheet, create if it doesn't exist
-        try:
-            ws = spreadsheet.worksheet(worksheet)
-        except Exception:
-            # Worksheet doesn't exist, create it
-            ws = spreadsheet.add_worksheet(title=worksheet, rows=1000, cols=26)
-            print(f"[INFO] Created new worksheet: {worksheet}")
+    except Exception as e:
+        print(f"[ERROR] Failed to append rating to Google Sheets: {e}")
+        return False
 
-        # Check if this is the first row (header needed)
-        existing_data = ws.get_all_values()
 
-        if len(existing_data) == 0 or (len(existing_data) == 1 and not existing_data[0]):
-            # Sheet is empty, write header first
-            headers = list(rating_data_with_timestamp.keys())
-            values = list(rating_data_with_timestamp.values())
+def append_ratings_to_gsheets(ratings, worksheet="v2_ImageSliders_ratings", raise_on_error=False):
+    """
+    Append several rating rows to Google Sheets in a single API call.
 
-            ws.append_row(headers, value_input_option='RAW')
-            ws.append_row(values, value_input_option='USER_ENTERED')
-            print(f"[INFO] Created headers and appended first rating to worksheet: {worksheet}")
-        else:
-            # Sheet has data, check if we need to add new columns
-            existing_headers = existing_data[0]
-            new_keys = set(rating_data_with_timestamp.keys())
-            existing_keys = set(existing_headers)
-
-            # If there are new columns, we need to update headers
-            if new_keys != existing_keys:
-                all_keys = existing_keys | new_keys
-                # Create ordered list of all columns
-                all_columns = existing_headers + [k for k in new_keys if k not in existing_keys]
-
-                # Update header row
-                ws.update('1:1', [all_columns], value_input_option='RAW')
-
-                # Prepare row with values in correct column order
-                row_values = [rating_data_with_timestamp.get(col, '') for col in all_columns]
-            else:
-                # Use existing column order
-                row_values = [rating_data_with_timestamp.get(col, '') for col in existing_headers]
-
-            # Append the new row
-            ws.append_row(row_values, value_input_option='USER_ENTERED')
-            print(f"[INFO] Rating appended to Google Sheets (worksheet: {worksheet})")
+    Unlike append_rating_to_gsheets, no timestamp is added here: rows come
+    from the write-behind queue and already carry the time they were submitted
+    (and a row_uuid that readers deduplicate on).
 
+    Parameters:
+        ratings: List of rating dictionaries
+        worksheet: Name of worksheet to write to (default: "ratings")
+        raise_on_error: Raise instead of returning False when the append fails
+
+    Returns:
+        True if successful, False otherwise
+    """
+    if not ratings:
+        return True
+
+    try:
+        if not _append_records(ratings, worksheet):
+            return False
+
+        print(f"[INFO] {len(ratings)} rating(s) appended to Google Sheets (worksheet: {worksheet})")
         return True
 
     except Exception as e:
-        print(f"[ERROR] Failed to append rating to Google Sheets: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"[ERROR] Failed to append ratings batch to Google Sheets: {e}")
+        if raise_on_error:
+            raise
         return False
 
 
+def read_columns_from_gsheets(columns, worksheet, start_row=2):
+    """
+    Read selected columns (by header name) from row start_row downward.
+
+    Uses one ranged batch_get call instead of downloading the whole sheet,
+    so the transfer is proportional to the columns and rows actually needed.
+
+    Parameters:
+        columns: List of header names to read
+        worksheet: Name of worksheet to read from
+        start_row: First (1-based) row to read; 2 skips the header row
+
+    Returns:
+        Tuple (column_values, next_row): dict header -> list of cell strings
+        (all lists padded to the same length) and the row after the last one
+        read. None if the worksheet or a column is unavailable.
+    """
+    entry = get_cached_worksheet(worksheet)
+    if entry is None:
+        return None
+
+    ws = entry['worksheet']
+    with entry['lock']:
+        headers = entry['headers']
+        if headers is None or not all(c in headers for c in columns):
+            headers = [h for h in _call('row_values', ws.row_values, 1) if h]
+            entry['headers'] = headers or None
+
+    if not headers or not all(c in headers for c in columns):
+        return None
+
+    ranges = []
+    for column in columns:
+        letter = rowcol_to_a1(1, headers.index(column) + 1).rstrip('0123456789')
+        ranges.append(f"{letter}{start_row}:{letter}")
+
+    value_ranges = _call('batch_get', ws.batch_get, ranges)
+
+    # Sheets trims trailing empty cells, so columns can differ in length
+    raw_columns = [[row[0] if row else '' for row in value_range] for value_range in value_ranges]
+    n_rows = max((len(values) for values in raw_columns), default=0)
+    column_values = {
+        column: values + [''] * (n_rows - len(values))
+        for column, values in zip(columns, raw_columns)
+    }
+
+    return column_values, start_row + n_rows
+
+
+def drop_duplicate_rows(df):
+    """
+    Drop rows appended more than once by write-behind flush retries.
+
+    Rows from the write-behind queue carry a unique row_uuid; a retried
+    append whose first attempt was applied after all leaves a copy with the
+    same row_uuid. Rows without a row_uuid (direct appends) are all kept.
+
+    Parameters:
+        df: DataFrame read from a worksheet
+
+    Returns:
+        DataFrame with the first row of each row_uuid
+    """
+    if df is None or df.empty or 'row_uuid' not in df.columns:
+        return df
+    has_uuid = df['row_uuid'].notna() & (df['row_uuid'].astype(str) != '')
+    duplicate = has_uuid & df['row_uuid'].duplicated()
+    if duplicate.any():
+        print(f"[INFO] Dropped {int(duplicate.sum())} duplicate row(s) (same row_uuid)")
+    return df[~duplicate]
+
+
 def read_ratings_from_gsheets(worksheet="v2_ImageSliders_ratings"):
     """
     Read all ratings from Google Sheets.
@@ -172,7 +510,8 @@ def read_ratings_from_gsheets(worksheet="v2_ImageSliders_ratings"):
         if conn is None:
             return pd.DataFrame()
 
-        df = conn.read(worksheet=worksheet)
+        df = _call('read', conn.read, worksheet=worksheet)
+        df = drop_duplicate_rows(df)
         print(f"[INFO] Read {len(df)} ratings from Google Sheets")
         return df
 
@@ -181,38 +520,90 @@ def read_ratings_from_gsheets(worksheet="v2_ImageSliders_ratings"):
         return pd.DataFrame()
 
 
-def get_rated_videos_for_user_from_gsheets(user_id, worksheet="v2_ImageSliders_ratings"):
+def _remember_rated_videos(cache_key, rated_ids):
+    """Memoize a user's rated-video list; sweep expired entries and evict the least recently used."""
+    now = time.monotonic()
+    with _rated_videos_cache_lock:
+        _rated_videos_cache[cache_key] = {'ids': rated_ids, 'time': now}
+        _rated_videos_cache.move_to_end(cache_key)
+        expired = [key for key, entry in _rated_videos_cache.items() if now - entry['time'] >= RATED_VIDEOS_CACHE_TTL]
+        for key in expired:
+            del _rated_videos_cache[key]
+        while len(_rated_videos_cache) > RATED_VIDEOS_CACHE_MAX_USERS:
+            _rated_videos_cache.popitem(last=False)
+
+
+def get_rated_videos_for_user_from_gsheets(user_id, worksheet="v2_ImageSliders_ratings", raise_on_error=False):
     """
     Get list of video IDs already rated by a specific user from Google Sheets (case-insensitive).
 
+    Only the user_id and id columns are fetched (one ranged batch read), and
+    the result is memoized per user for RATED_VIDEOS_CACHE_TTL seconds (at
+    most RATED_VIDEOS_CACHE_MAX_USERS users, least recently used evicted).
+
     Parameters:
         user_id: User identifier
         worksheet: Name of worksheet to read from (default: "ratings")
+        raise_on_error: Raise instead of returning [] when Sheets, the worksheet
+            or its user_id/id columns cannot be read
 
     Returns:
         List of action IDs
     """
-    try:
-        df = read_ratings_from_gsheets(worksheet=worksheet)
+    cache_key = (worksheet, user_id.lower())
+    with _rated_videos_cache_lock:
+        cached = _rated_videos_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached['time'] < RATED_VIDEOS_CACHE_TTL:
+            _rated_videos_cache.move_to_end(cache_key)
+            return list(cached['ids'])
 
-        if df.empty or 'user_id' not in df.columns or 'id' not in df.columns:
+    try:
+        result = read_columns_from_gsheets(['user_id', 'id'], worksheet)
+        if result is None:
+            # No connection, worksheet or user_id/id header: not the same as "rated nothing"
+            if raise_on_error:
+                raise RuntimeError(f"Worksheet '{worksheet}' or its user_id/id columns are not readable")
             return []
 
-        # Filter by user_id (case-insensitive)
-        user_id_lower = user_id.lower()
-        df['user_id_lower'] = df['user_id'].astype(str).str.lower()
-        user_ratings = df[df['user_id_lower'] == user_id_lower]
+        column_values, _ = result
 
-        # Get unique action IDs
-        rated_ids = user_ratings['id'].unique().tolist()
+        # Filter by user_id (case-insensitive), keep unique IDs in sheet order
+        user_id_lower = user_id.lower()
+        rated_ids = list(dict.fromkeys(
+            action_id
+            for row_user_id, action_id in zip(column_values['user_id'], column_values['id'])
+            if action_id and row_user_id.lower() == user_id_lower
+        ))
 
-        return rated_ids
+        _remember_rated_videos(cache_key, rated_ids)
+        return list(rated_ids)
 
     except Exception as e:
         print(f"[ERROR] Failed to get rated videos from Google Sheets: {e}")
+        if raise_on_error:
+            raise
         return []
 
 
+def remember_rated_video(user_id, action_id, worksheet="v2_ImageSliders_ratings"):
+    """
+    Add a just-saved rating to the memoized rated-videos list of its user.
+
+    Keeps the memo current until the TTL expires. Rows still waiting in the
+    write-behind queue after that are merged in by the storage backend
+    (storage_backends.GSheetsBackend.get_rated_videos).
+
+    Parameters:
+        user_id: User identifier
+        action_id: Action/video identifier
+        worksheet: Name of ratings worksheet
+    """
+    with _rated_videos_cache_lock:
+        cached = _rated_videos_cache.get((worksheet, user_id.lower()))
+        if cached is not None and action_id not in cached['ids']:
+            cached['ids'].append(action_id)
+
+
 def append_user_to_gsheets(user_data, worksheet="v2_ImageSliders_users"):
     """
     Append a single user row to Google Sheets using true append (no overwrite).
@@ -225,72 +616,50 @@ def append_user_to_gsheets(user_data, worksheet="v2_ImageSliders_users"):
         True if successful, False otherwise
     """
     try:
-        # Get the gspread client for advanced operations
-        gspread_client = get_gspread_client()
-        if gspread_client is None:
-            print("[WARNING] No gspread client available")
-            return False
-
         # Add timestamp
         user_data_with_timestamp = user_data.copy()
         user_data_with_timestamp['timestamp'] = datetime.now().isoformat()
 
-        # Get spreadsheet URL from secrets
-        spreadsheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
+        if not _append_record(user_data_with_timestamp, worksheet):
+            return False
 
-        # Open the spreadsheet
-        spreadsheet = gspread_client.open_by_url(spreadsheet_url)
+        print(f"[INFO] User data appended to Google Sheets (worksheet: {worksheet})")
+        return True
 
-        # Try to get the worksheet, create if it doesn't exist
-        try:
-            ws = spreadsheet.worksheet(worksheet)
-        except Exception:
-            # Worksheet doesn't exist, create it
-            ws = spreadsheet.add_worksheet(title=worksheet, rows=1000, cols=26)
-            print(f"[INFO] Created new worksheet: {worksheet}")
+    except Exception as e:
+        print(f"[ERROR] Failed to append user to Google Sheets: {e}")
+        return False
 
-        # Check if this is the first row (header needed)
-        existing_data = ws.get_all_values()
 
-        if len(existing_data) == 0 or (len(existing_data) == 1 and not existing_data[0]):
-            # Sheet is empty, write header first
-            headers = list(user_data_with_timestamp.keys())
-            values = list(user_data_with_timestamp.values())
+def append_users_to_gsheets(users, worksheet="v2_ImageSliders_users", raise_on_error=False):
+    """
+    Append several user rows to Google Sheets in a single API call.
 
-            ws.append_row(headers, value_input_option='RAW')
-            ws.append_row(values, value_input_option='USER_ENTERED')
-            print(f"[INFO] Created headers and appended first user to worksheet: {worksheet}")
-        else:
-            # Sheet has data, check if we need to add new columns
-            existing_headers = existing_data[0]
-            new_keys = set(user_data_with_timestamp.keys())
-            existing_keys = set(existing_headers)
-
-            # If there are new columns, we need to update headers
-            if new_keys != existing_keys:
-                all_keys = existing_keys | new_keys
-                # Create ordered list of all columns
-                all_columns = existing_headers + [k for k in new_keys if k not in existing_keys]
-
-                # Update header row
-                ws.update('1:1', [all_columns], value_input_option='RAW')
-
-                # Prepare row with values in correct column order
-                row_values = [user_data_with_timestamp.get(col, '') for col in all_columns]
-            else:
-                # Use existing column order
-                row_values = [user_data_with_timestamp.get(col, '') for col in existing_headers]
-
-            # Append the new row
-            ws.append_row(row_values, value_input_option='USER_ENTERED')
-            print(f"[INFO] User data appended to Google Sheets (worksheet: {worksheet})")
+    Used to flush users spooled while Google Sheets was unavailable; rows
+    already carry their original timestamp.
 
+    Parameters:
+        users: List of user dictionaries
+        worksheet: Name of worksheet to write to (default: "users")
+        raise_on_error: Raise instead of returning False when the append fails
+
+    Returns:
+        True if successful, False otherwise
+    """
+    if not users:
+        return True
+
+    try:
+        if not _append_records(users, worksheet):
+            return False
+
+        print(f"[INFO] {len(users)} user(s) appended to Google Sheets (worksheet: {worksheet})")
         return True
 
     except Exception as e:
-        print(f"[ERROR] Failed to append user to Google Sheets: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"[ERROR] Failed to append users batch to Google Sheets: {e}")
+        if raise_on_error:
+            raise
         return False
 
 
@@ -309,7 +678,8 @@ def read_users_from_gsheets(worksheet="v2_ImageSliders_users"):
         if conn is None:
             return pd.DataFrame()
 
-        df = conn.read(worksheet=worksheet)
+        df = _call('read', conn.read, worksheet=worksheet)
+        df = drop_duplicate_rows(df)
         print(f"[INFO] Read {len(df)} users from Google Sheets")
         return df
 
@@ -0,0 +1,251 @@
+"""
+Faststart audit and remux of the stimulus MP4s.
+
+In loop mode the videos play through st.video with progressive download. If
+an MP4's moov atom (the index) is stored after the media data, the browser
+must fetch nearly the whole file before it can show the first frame. The
+audit checks every video in the configured media folders (and their
+renditions/) in parallel and reports:
+
+    - moov position (offset, before or after mdat)
+    - video codec and overall bitrate
+    - keyframe interval (mean and maximum, seconds)
+
+With --remux, files whose moov is at the end are rewritten with
+`-c copy -movflags +faststart`: the streams are copied bit for bit, only the
+container layout changes. Remuxed build outputs are updated in the stimulus
+build manifest so the next build does not treat them as modified.
+
+Usage:
+    python -m utils.media_audit                  # report only
+    python -m utils.media_audit --remux          # also fix files that are not faststart
+    python -m utils.media_audit --folder data/videos/ --workers 8
+"""
+import argparse
+import os
+import shutil
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from utils.build_stimuli import DEFAULT_MANIFEST_PATH, load_manifest, save_manifest
+from utils.config_loader import load_config
+from utils.media_manifest import MEDIA_FOLDER_KEYS
+from utils.media_probe import probe_media, run_ffmpeg
+from utils.renditions import RENDITION_DIR
+
+DEFAULT_REPORT_PATH = 'data/media_audit_report.csv'
+AUDIT_EXTENSIONS = ('.mp4', '.mov')
+
+
+def read_top_level_boxes(path):
+    """
+    List the top-level boxes (atoms) of an MP4/MOV file.
+
+    Returns:
+        List of (box type, offset, size) tuples
+    """
+    boxes = []
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            size, box_type = struct.unpack('>I4s', f.read(8))
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0]   # 64-bit largesize
+            elif size == 0:
+                size = file_size - offset                  # box extends to the end of the file
+            if size < 8:
+                break                                      # corrupt header, stop scanning
+            boxes.append((box_type.decode('latin-1'), offset, size))
+            offset += size
+    return boxes
+
+
+def _keyframe_intervals(path):
+    """Mean and maximum seconds between keyframes, from packet flags (no decoding)."""
+    output = run_ffmpeg([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path,
+    ])
+    times = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            times.append(float(pts_time))
+    times.sort()
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    if not gaps:
+        return None, None
+    return sum(gaps) / len(gaps), max(gaps)
+
+
+def audit_file(path):
+    """
+    Audit one file (process pool worker).
+
+    Returns:
+        Dict with path, size_bytes, moov_offset, faststart, video_codec,
+        bitrate_kbps, keyframe_interval_mean/max and error
+    """
+    row = {'path': path, 'size_bytes': os.path.getsize(path)}
+    try:
+        boxes = read_top_level_boxes(path)
+        offsets = {box_type: offset for box_type, offset, _ in reversed(boxes)}
+        row['moov_offset'] = offsets.get('moov')
+        row['faststart'] = 'moov' in offsets and offsets['moov'] < offsets.get('mdat', float('inf'))
+
+        if shutil.which('ffprobe'):
+            probe = probe_media(path)
+            row['video_codec'] = probe['video_codec']
+            row['bitrate_kbps'] = round(probe['bit_rate'] / 1000) if probe['bit_rate'] else None
+            mean_gap, max_gap = _keyframe_intervals(path)
+            row['keyframe_interval_mean'] = round(mean_gap, 3) if mean_gap is not None else None
+            row['keyframe_interval_max'] = round(max_gap, 3) if max_gap is not None else None
+        row['error'] = None
+    except (OSError, RuntimeError, ValueError, struct.error) as e:
+        row['error'] = str(e)
+    return row
+
+
+def remux_faststart(path):
+    """
+    Losslessly move the moov atom to the front (stream copy, no re-encode).
+
+    The result is written to "<path>.partial" and renamed over the original.
+
+    Returns:
+        Tuple (path, error message or None)
+    """
+    partial_path = path + '.partial'
+    container = 'mov' if path.lower().endswith('.mov') else 'mp4'
+    try:
+        run_ffmpeg([
+            'ffmpeg', '-y', '-loglevel', 'error', '-i', path,
+            '-map', '0', '-c', 'copy', '-movflags', '+faststart',
+            '-f', container, partial_path,
+        ])
+        os.replace(partial_path, path)
+        return path, None
+    except (OSError, RuntimeError) as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return path, str(e)
+
+
+def collect_media_files(config, folders=None):
+    """Videos in the given folders (default: the configured media folders), including renditions/."""
+    if not folders:
+        folders = [config['paths'][key] for key in MEDIA_FOLDER_KEYS if config.get('paths', {}).get(key)]
+
+    files = []
+    for folder in folders:
+        for directory in (folder, os.path.join(folder, RENDITION_DIR)):
+            if not os.path.isdir(directory):
+                continue
+            files.extend(
+                os.path.join(directory, filename) for filename in sorted(os.listdir(directory))
+                if filename.lower().endswith(AUDIT_EXTENSIONS)
+            )
+    return files
+
+
+def _update_build_manifest(config, paths):
+    """Record the new size/mtime of remuxed build outputs so the build does not rebuild them."""
+    manifest_path = (config.get('stimulus_build', {}) or {}).get('manifest_path', DEFAULT_MANIFEST_PATH)
+    if not os.path.exists(manifest_path):
+        return
+    manifest = load_manifest(manifest_path)
+    changed = False
+    for path in paths:
+        entry = manifest['outputs'].get(path)
+        if entry is not None:
+            stat_result = os.stat(path)
+            entry['output_size'] = stat_result.st_size
+            entry['output_mtime_ns'] = stat_result.st_mtime_ns
+            changed = True
+    if changed:
+        save_manifest(manifest, manifest_path)
+
+
+def audit(config, folders=None, remux=False, workers=None, report_path=DEFAULT_REPORT_PATH):
+    """
+    Audit the media files in parallel and optionally remux them to faststart.
+
+    Parameters:
+        config: Configuration dictionary
+        folders: Optional list of folders (default: paths.video_path / familiarization_video_path)
+        remux: Rewrite files whose moov atom is not at the front
+        workers: Number of worker processes (default: CPU count)
+        report_path: CSV file for the per-file results
+
+    Returns:
+        pandas DataFrame with one row per file
+    """
+    files = collect_media_files(config, folders)
+    if not files:
+        print("[WARNING] No media files found")
+        return pd.DataFrame()
+
+    if not shutil.which('ffprobe'):
+        print("[WARNING] ffprobe not found, reporting moov position only")
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        df = pd.DataFrame(executor.map(audit_file, files))
+
+        df['remuxed'] = False
+        if remux:
+            if shutil.which('ffmpeg') is None:
+                raise RuntimeError("FFmpeg is not installed (Ubuntu/Debian: sudo apt install ffmpeg, macOS: brew install ffmpeg)")
+            pending = df.loc[~df['faststart'].fillna(True).astype(bool) & df['error'].isna(), 'path'].tolist()
+            remuxed = []
+            for path, error in executor.map(remux_faststart, pending):
+                if error:
+                    print(f"[ERROR] Remux failed for {path}: {error}")
+                    continue
+                remuxed.append(path)
+                print(f"[INFO] Remuxed {path} to faststart")
+            if remuxed:
+                df.loc[df['path'].isin(remuxed), 'remuxed'] = True
+                _update_build_manifest(config, remuxed)
+
+    directory = os.path.dirname(report_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    df.to_csv(report_path, index=False)
+
+    columns = [c for c in ('path', 'size_bytes', 'faststart', 'video_codec', 'bitrate_kbps',
+                           'keyframe_interval_mean', 'keyframe_interval_max', 'remuxed') if c in df]
+    print(df[columns].to_string(index=False))
+
+    not_faststart = int((df['faststart'] == False).sum())
+    errors = int(df['error'].notna().sum())
+    print(f"[INFO] {len(df)} files audited: {not_faststart} without faststart, "
+          f"{int(df['remuxed'].sum())} remuxed, {errors} errors")
+    print(f"[INFO] Report written to {report_path}")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit stimulus MP4s for faststart, codec, keyframes and bitrate")
+    parser.add_argument('--remux', action='store_true', help="Losslessly remux files whose moov atom is at the end")
+    parser.add_argument('--folder', action='append', dest='folders', help="Folder to audit (repeatable)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    try:
+        audit(load_config(), folders=args.folders, remux=args.remux, workers=args.workers)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Process-wide LRU cache of encoded video payloads.
+
+All participants draw from the same small stimulus pool, so the base64
+data: URI of a video (inline delivery, see utils/media_server.py) is built
+once per process and shared by every session and rerun. Entries are keyed
+by (absolute path, mtime, size), so a replaced file is re-encoded, and the
+cache is bounded by a byte budget with least-recently-used eviction.
+
+An optional warm-up pre-encodes the whole stimulus set on a thread pool in
+the background at startup (settings.media_cache.warm_up). Reading and
+base64-encoding are I/O and memory bound, and a process pool forked from a
+thread of the multithreaded Streamlit server can deadlock in the child.
+"""
+import base64
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.media_manifest import get_folder_entries, get_media_entry
+
+DEFAULT_MAX_MB = 256
+DEFAULT_WARM_UP_WORKERS = 4
+MEDIA_EXTENSIONS = ('.mp4', '.webm', '.mov')
+
+# Process-wide cache instance
+_media_cache = None
+_media_cache_lock = threading.Lock()
+_warm_up_started = False
+
+
+class MediaCache:
+    """
+    Thread-safe LRU map with a total size budget in bytes.
+
+    Parameters:
+        max_bytes: Total size of cached values before the oldest are evicted
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Insert a value; values larger than the whole budget are not cached."""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+
+            self._entries[key] = value
+            self._size += size
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def size_bytes(self):
+        with self._lock:
+            return self._size
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _cache_key(path, stat_result):
+    return (os.path.abspath(path), stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def encode_file(path):
+    """Read a media file and return it as a base64 data: URI."""
+    mime_type = mimetypes.guess_type(path)[0] or 'video/mp4'
+    with open(path, 'rb') as f:
+        return f"data:{mime_type};base64,{base64.b64encode(f.read()).decode()}"
+
+
+def get_media_cache(config=None):
+    """
+    Get or create the process-wide media cache.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.media_cache.max_mb)
+
+    Returns:
+        MediaCache instance
+    """
+    global _media_cache
+
+    with _media_cache_lock:
+        if _media_cache is None:
+            settings = (config or {}).get('settings', {}) or {}
+            cache_config = settings.get('media_cache', {}) or {}
+            max_mb = float(cache_config.get('max_mb', DEFAULT_MAX_MB))
+            _media_cache = MediaCache(max_bytes=int(max_mb * 1024 * 1024))
+
+    return _media_cache
+
+
+def get_encoded_video(path, config=None):
+    """
+    Return the data: URI of a video, encoding it only on a cache miss.
+
+    Parameters:
+        path: Path to the video file
+        config: Configuration dictionary
+
+    Returns:
+        data: URI string
+    """
+    cache = get_media_cache(config)
+    # Signature from the in-memory media manifest; os.stat only for files it does not index
+    entry = get_media_entry(path)
+    if entry is not None:
+        key = (os.path.abspath(path), entry['mtime_ns'], entry['size'])
+    else:
+        key = _cache_key(path, os.stat(path))
+
+    payload = cache.get(key)
+    if payload is None:
+        payload = encode_file(path)
+        cache.put(key, payload)
+    return payload
+
+
+def _list_stimulus_files(config):
+    """(path, manifest entry) of every video in video_path and familiarization_video_path."""
+    paths = config.get('paths', {}) or {}
+    files = []
+    for key in ('video_path', 'familiarization_video_path'):
+        directory = paths.get(key)
+        if not directory:
+            continue
+        for filename, entry in get_folder_entries(directory, warn_missing=False).items():
+            if filename.lower().endswith(MEDIA_EXTENSIONS):
+                files.append((os.path.join(directory, filename), entry))
+    return files
+
+
+def warm_up_media_cache(config, workers=DEFAULT_WARM_UP_WORKERS):
+    """
+    Pre-encode the stimulus set (video_path and familiarization_video_path) on a thread pool.
+
+    The files and their signatures come from the media manifest. Files are
+    added until the cache budget is reached; already-cached files are skipped.
+
+    Parameters:
+        config: Configuration dictionary
+        workers: Number of worker threads
+
+    Returns:
+        Number of files encoded
+    """
+    cache = get_media_cache(config)
+
+    # Only schedule what fits: base64 grows the payload by 4/3
+    pending = []
+    budget = cache.max_bytes - cache.size_bytes()
+    for path, entry in _list_stimulus_files(config):
+        key = (os.path.abspath(path), entry['mtime_ns'], entry['size'])
+        if cache.get(key) is not None:
+            continue
+        encoded_size = (entry['size'] + 2) // 3 * 4
+        if encoded_size > budget:
+            break
+        budget -= encoded_size
+        pending.append((path, key))
+
+    if not pending:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media-cache-warm-up') as executor:
+        payloads = executor.map(encode_file, [path for path, _ in pending])
+        for (_, key), payload in zip(pending, payloads):
+            cache.put(key, payload)
+
+    print(f"[INFO] Media cache warmed with {len(pending)} file(s) ({cache.size_bytes() / 1e6:.1f} MB)")
+    return len(pending)
+
+
+def start_media_cache_warm_up(config):
+    """Run warm_up_media_cache in a background thread once per process, if enabled in config."""
+    global _warm_up_started
+
+    settings = (config or {}).get('settings', {}) or {}
+    cache_config = settings.get('media_cache', {}) or {}
+    if not cache_config.get('warm_up', False):
+        return
+
+    with _media_cache_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+
+    def run():
+        try:
+            warm_up_media_cache(config, int(cache_config.get('warm_up_workers', DEFAULT_WARM_UP_WORKERS)))
+        except Exception as e:
+            print(f"[WARNING] Media cache warm-up failed: {e}")
+
+    threading.Thread(target=run, name='media-cache-warm-up', daemon=True).start()
@@ -0,0 +1,318 @@
+"""
+Precomputed manifest of the stimulus media folders.
+
+Every session used to list the media folders (os.listdir) when it started
+and check os.path.exists on every render. The manifest holds one entry per
+file (filename, id, size, mtime, duration, resolution, content hash) of the
+media folders, their renditions/ subfolders and the still-image folders, is
+loaded once per process and answers all lookups from memory: listings,
+existence checks, rendition and still-image lookups and the cache-busting
+file signatures of the media server.
+
+The manifest is written to data/media_manifest.json by the stimulus build
+(python -m utils.build_stimuli) or by `python -m utils.media_manifest`, and
+refreshed at startup: entries whose size and mtime are unchanged are reused,
+so only new or replaced files are hashed and probed. A background watcher
+polls the folders' modification times and rescans a folder when files are
+added, removed or renamed into place (as the stimulus build does).
+
+Usage:
+    python -m utils.media_manifest        # (re)generate data/media_manifest.json
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.media_probe import file_hash, probe_media
+from utils.config_loader import load_config
+
+DEFAULT_MANIFEST_PATH = 'data/media_manifest.json'
+DEFAULT_POLL_SECONDS = 5.0
+VIDEO_EXTENSIONS = ('.mp4',)
+# Every indexed folder holds all media types (videos, renditions, stills)
+MEDIA_EXTENSIONS = ('.mp4', '.webm', '.webp', '.jpg', '.jpeg', '.png')
+MEDIA_FOLDER_KEYS = ('video_path', 'familiarization_video_path')
+IMAGE_FOLDER_KEYS = ('image_path', 'familiarization_image_path')
+RENDITION_SUBFOLDER = 'renditions'   # utils/renditions.RENDITION_DIR (not imported: circular)
+
+# Process-wide state: folder -> {'mtime_ns': ..., 'entries': {filename: entry}}
+_folders = {}
+_folders_lock = threading.Lock()
+_manifest_settings = {'path': DEFAULT_MANIFEST_PATH, 'poll_seconds': DEFAULT_POLL_SECONDS}
+_watcher_started = False
+_warned_no_ffprobe = False
+
+
+def _folder_key(folder):
+    return os.path.normpath(folder)
+
+
+def _load_saved_manifest(manifest_path):
+    """Saved manifest {"folders": {folder: {filename: entry}}}, empty if missing or corrupt."""
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f).get('folders', {})
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[WARNING] Ignoring unreadable media manifest {manifest_path}: {e}")
+        return {}
+
+
+def _save_manifest(manifest_path):
+    with _folders_lock:
+        folders = {folder: state['entries'] for folder, state in _folders.items()}
+    directory = os.path.dirname(manifest_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique temp file: the watcher and request threads of one process may save concurrently
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(manifest_path) + '.', suffix='.tmp',
+                                    dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'folders': folders}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _describe(path, stat_result):
+    """Manifest entry of one file: content hash and (if ffprobe is installed) duration and resolution."""
+    global _warned_no_ffprobe
+
+    filename = os.path.basename(path)
+    entry = {
+        'filename': filename,
+        'id': os.path.splitext(filename)[0],
+        'size': stat_result.st_size,
+        'mtime_ns': stat_result.st_mtime_ns,
+        'content_hash': file_hash(path),
+        'duration': None,
+        'width': None,
+        'height': None,
+    }
+
+    if shutil.which('ffprobe') is None:
+        if not _warned_no_ffprobe:
+            _warned_no_ffprobe = True
+            print("[WARNING] ffprobe not found, media manifest entries have no duration/resolution")
+        return entry
+
+    try:
+        probe = probe_media(path)
+        entry.update(duration=probe['duration'], width=probe['width'], height=probe['height'])
+    except (RuntimeError, ValueError) as e:
+        print(f"[WARNING] Failed to probe {path}: {e}")
+    return entry
+
+
+def scan_folder(folder, previous=None):
+    """
+    Build the manifest entries of a folder.
+
+    Parameters:
+        folder: Media folder
+        previous: Earlier entries {filename: entry}; reused when size and mtime match
+
+    Returns:
+        Tuple (folder mtime_ns or None if missing, {filename: entry})
+    """
+    previous = previous or {}
+    try:
+        mtime_ns = os.stat(folder).st_mtime_ns
+        filenames = [f for f in os.listdir(folder) if f.lower().endswith(MEDIA_EXTENSIONS)]
+    except FileNotFoundError:
+        return None, {}
+
+    entries = {}
+    for filename in sorted(filenames):
+        path = os.path.join(folder, filename)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            continue
+        old = previous.get(filename)
+        if old and old.get('size') == stat_result.st_size and old.get('mtime_ns') == stat_result.st_mtime_ns:
+            entries[filename] = old
+        else:
+            entries[filename] = _describe(path, stat_result)
+    return mtime_ns, entries
+
+
+def _get_folder(folder, warn_missing=True):
+    """Entries of a folder, scanned on first use (seeded from the saved manifest)."""
+    key = _folder_key(folder)
+    with _folders_lock:
+        state = _folders.get(key)
+    if state is not None:
+        return state
+
+    saved = _load_saved_manifest(_manifest_settings['path']).get(key)
+    mtime_ns, entries = scan_folder(folder, saved)
+    state = {'mtime_ns': mtime_ns, 'entries': entries}
+    with _folders_lock:
+        state = _folders.setdefault(key, state)
+
+    if mtime_ns is None:
+        if warn_missing:
+            print(f"[WARNING] Media folder not found: {folder}")
+    else:
+        print(f"[INFO] Media manifest: {len(entries)} files in {folder}")
+        if entries != saved:
+            _save_manifest(_manifest_settings['path'])
+    return state
+
+
+def refresh_folder(folder):
+    """
+    Rescan a folder if its modification time changed.
+
+    Returns:
+        True if the entries were replaced
+    """
+    key = _folder_key(folder)
+    with _folders_lock:
+        state = _folders.get(key)
+    if state is None:
+        _get_folder(folder)
+        return True
+
+    try:
+        mtime_ns = os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+    if mtime_ns == state['mtime_ns']:
+        return False
+
+    mtime_ns, entries = scan_folder(folder, state['entries'])
+    with _folders_lock:
+        # Swap the whole state: readers see either the old or the new listing
+        _folders[key] = {'mtime_ns': mtime_ns, 'entries': entries}
+    print(f"[INFO] Media manifest refreshed: {len(entries)} files in {folder}")
+    _save_manifest(_manifest_settings['path'])
+    return True
+
+
+def list_videos(folder):
+    """Sorted video filenames of a folder (from the manifest)."""
+    return [f for f in _get_folder(folder)['entries'] if f.lower().endswith(VIDEO_EXTENSIONS)]
+
+
+def get_folder_entries(folder, warn_missing=True):
+    """
+    All manifest entries of a folder.
+
+    Parameters:
+        folder: Media, renditions or still-image folder
+        warn_missing: Log a warning if the folder does not exist (first use only)
+
+    Returns:
+        Dict filename -> entry (do not modify)
+    """
+    return _get_folder(folder, warn_missing)['entries']
+
+
+def get_media_entry(video_file_path):
+    """
+    Manifest entry of a media file (video, rendition or still image).
+
+    Parameters:
+        video_file_path: Path to the file (folder + filename)
+
+    Returns:
+        Entry dict (filename, id, size, mtime_ns, duration, width, height, content_hash), or None
+    """
+    folder, filename = os.path.split(video_file_path)
+    return _get_folder(folder)['entries'].get(filename)
+
+
+def _watch():
+    while True:
+        time.sleep(_manifest_settings['poll_seconds'])
+        with _folders_lock:
+            folders = list(_folders)
+        for folder in folders:
+            try:
+                refresh_folder(folder)
+            except Exception as e:
+                print(f"[WARNING] Media manifest refresh failed for {folder}: {e}")
+
+
+def start_media_manifest_watcher():
+    """Start the folder watcher thread once per process (poll_seconds <= 0 disables it)."""
+    global _watcher_started
+
+    with _folders_lock:
+        if _watcher_started or _manifest_settings['poll_seconds'] <= 0:
+            return
+        _watcher_started = True
+    threading.Thread(target=_watch, name='media-manifest-watcher', daemon=True).start()
+
+
+def _required_folders(config):
+    """The configured video folders (and still-image folders in image mode)."""
+    paths = config.get('paths', {}) or {}
+    keys = MEDIA_FOLDER_KEYS
+    if (config.get('settings', {}) or {}).get('stimulus_type') == 'image':
+        keys = keys + IMAGE_FOLDER_KEYS
+    return [paths[key] for key in keys if paths.get(key)]
+
+
+def _configured_folders(config):
+    """All folders to index: required folders plus the videos' renditions/ subfolders."""
+    paths = config.get('paths', {}) or {}
+    folders = _required_folders(config)
+    folders += [os.path.join(paths[key], RENDITION_SUBFOLDER) for key in MEDIA_FOLDER_KEYS if paths.get(key)]
+    return folders
+
+
+def configure_media_manifest(config, watch=True):
+    """
+    Apply settings.media_manifest and load the configured media folders.
+
+    Parameters:
+        config: Configuration dictionary
+        watch: Start the folder watcher thread
+    """
+    settings = (config or {}).get('settings', {}) or {}
+    manifest_config = settings.get('media_manifest', {}) or {}
+    _manifest_settings['path'] = manifest_config.get('path', DEFAULT_MANIFEST_PATH)
+    _manifest_settings['poll_seconds'] = float(manifest_config.get('poll_seconds', DEFAULT_POLL_SECONDS))
+
+    for folder in _configured_folders(config):
+        _get_folder(folder, warn_missing=folder in _required_folders(config))
+    if watch:
+        start_media_manifest_watcher()
+
+
+def write_media_manifest(config):
+    """
+    Rescan the configured media folders and write the manifest (build time).
+
+    Parameters:
+        config: Configuration dictionary
+
+    Returns:
+        Number of files in the manifest
+    """
+    configure_media_manifest(config, watch=False)
+    for folder in _configured_folders(config):
+        refresh_folder(folder)
+    _save_manifest(_manifest_settings['path'])
+    with _folders_lock:
+        total = sum(len(state['entries']) for state in _folders.values())
+    print(f"[INFO] Media manifest written to {_manifest_settings['path']} ({total} files)")
+    return total
+
+
+if __name__ == "__main__":
+    write_media_manifest(load_config())
@@ -0,0 +1,57 @@
+"""
+Small media helpers shared by the app and the offline build tools.
+
+The app's media manifest (utils/media_manifest.py) and session plans need
+content hashes and ffprobe metadata at runtime; the stimulus build and the
+faststart audit use the same functions. They live here so the app does not
+import the build pipeline (and pandas) just to hash or probe a file.
+"""
+import hashlib
+import json
+import os
+import subprocess
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_ffmpeg(args):
+    """Run ffmpeg/ffprobe; raise RuntimeError with the tail of stderr on failure."""
+    result = subprocess.run(args, capture_output=True, text=True)
+    if result.returncode != 0:
+        tail = '\n'.join(result.stderr.strip().splitlines()[-3:])
+        raise RuntimeError(f"{os.path.basename(args[0])} failed: {tail}")
+    return result.stdout
+
+
+def probe_media(path):
+    """
+    Read stream/format metadata with a single ffprobe call.
+
+    Returns:
+        Dict with width, height, fps (string, e.g. "30/1"), duration (seconds),
+        video_codec, bit_rate and has_audio
+    """
+    probe = json.loads(run_ffmpeg([
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name,width,height,r_frame_rate:format=duration,bit_rate',
+        '-of', 'json', path,
+    ]))
+    streams = probe.get('streams', [])
+    video = next((st for st in streams if st.get('codec_type') == 'video'), {})
+    media_format = probe.get('format', {})
+    return {
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'fps': video.get('r_frame_rate'),
+        'duration': float(media_format['duration']) if media_format.get('duration') else None,
+        'video_codec': video.get('codec_name'),
+        'bit_rate': int(media_format['bit_rate']) if media_format.get('bit_rate') else None,
+        'has_audio': any(st.get('codec_type') == 'audio' for st in streams),
+    }
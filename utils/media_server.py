@@ -0,0 +1,340 @@
+"""
+URL-based delivery of stimulus videos for the "once" playback mode.
+
+The once-mode player is a components.html iframe. Inlining the MP4 as a
+base64 data: URI re-reads and re-encodes the file on every rerun, inflates
+the payload by a third and rules out HTTP range requests. Instead the player
+references the video by URL, chosen by settings.media_delivery:
+
+    "sidecar" - a small range-capable HTTP server started once per process
+                (settings.media_server: host, port, public_url), default
+    "static"  - Streamlit static file serving (server.enableStaticServing):
+                videos are hard-linked (or copied) into static/media/ and
+                served from /app/static/media/...
+    "inline"  - the previous base64 data: URI
+
+"static" is not verified to play with any Streamlit release. The
+Tornado-based static route serves files outside a small extension
+allow-list (images, fonts, ...) as text/plain with "X-Content-Type-Options:
+nosniff", so browsers refuse to play .mp4/.webm from it; on such a version
+"static" is replaced by "sidecar". Streamlit 1.60 (Starlette-based) guesses
+the type from the extension, but answered binary static files with HTTP 500
+when tried. If the selected delivery is unavailable (static serving disabled, sidecar
+port in use), the video falls back to inline delivery.
+"""
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+import streamlit as st
+
+from utils.media_cache import get_encoded_video
+from utils.media_manifest import get_media_entry
+from utils.renditions import select_video_sources
+
+DEFAULT_MEDIA_DELIVERY = 'sidecar'
+STATIC_ROOT = 'static'
+STATIC_MEDIA_DIR = os.path.join(STATIC_ROOT, 'media')
+DEFAULT_SIDECAR_HOST = '0.0.0.0'
+DEFAULT_SIDECAR_PORT = 8502
+CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+# Static delivery: published file path -> (src mtime_ns, src size)
+_published_files = {}
+_publish_lock = threading.Lock()
+
+# Sidecar delivery: one server per process, serving registered directories
+_sidecar_server = None
+_sidecar_roots = {}   # URL name -> absolute directory
+_sidecar_lock = threading.Lock()
+
+# Deliveries that failed once (warn once, then use inline)
+_disabled_deliveries = set()
+
+# Whether Streamlit's static route sends videos with a playable Content-Type (None = not checked yet)
+_static_plays_video = None
+
+
+def _media_settings(config):
+    settings = (config or {}).get('settings', {}) or {}
+    return settings.get('media_delivery', DEFAULT_MEDIA_DELIVERY), settings.get('media_server', {}) or {}
+
+
+def _root_name(directory):
+    """URL-safe name for a media directory, e.g. data/videos_screenshots -> data_videos_screenshots."""
+    relative = os.path.relpath(os.path.abspath(directory))
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', relative).strip('_') or 'media'
+
+
+def _file_signature(video_file_path):
+    """(mtime_ns, size) of a media file, from the in-memory media manifest (os.stat if not indexed)."""
+    entry = get_media_entry(video_file_path)
+    if entry is not None:
+        return entry['mtime_ns'], entry['size']
+    stat_result = os.stat(video_file_path)
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def _version_tag(signature):
+    """Cache-busting query value that changes whenever the file is replaced."""
+    mtime_ns, size = signature
+    return f"{mtime_ns:x}-{size:x}"
+
+
+def _disable(delivery, reason):
+    if delivery not in _disabled_deliveries:
+        _disabled_deliveries.add(delivery)
+        print(f"[WARNING] Media delivery '{delivery}' unavailable ({reason}), falling back to inline")
+
+
+def static_serving_plays_video():
+    """
+    Return False if Streamlit's static route is known to send videos as text/plain.
+
+    The Tornado-based server has streamlit.web.server.app_static_file_handler
+    with SAFE_APP_STATIC_FILE_EXTENSIONS; anything not listed there is served
+    as text/plain with nosniff. Without that module (Starlette-based server)
+    the Content-Type follows the file extension, so it is not ruled out.
+    """
+    global _static_plays_video
+
+    if _static_plays_video is None:
+        try:
+            from streamlit.web.server import app_static_file_handler
+        except ImportError:
+            _static_plays_video = True
+        else:
+            safe_extensions = getattr(app_static_file_handler, 'SAFE_APP_STATIC_FILE_EXTENSIONS', ())
+            _static_plays_video = '.mp4' in safe_extensions
+            if not _static_plays_video:
+                print("[WARNING] This Streamlit version serves static .mp4/.webm files as text/plain, "
+                      "using media_delivery 'sidecar' instead of 'static'")
+    return _static_plays_video
+
+
+def get_inline_src(video_file_path, config=None):
+    """Return the video as a base64 data: URI (inline delivery), from the shared media cache."""
+    return get_encoded_video(video_file_path, config)
+
+
+def _publish_static(video_file_path, signature):
+    """
+    Make the file available under static/media/<dir name>/ and return its URL.
+
+    Files are hard-linked when possible (no extra disk space) and copied
+    otherwise; they are re-published when the source is replaced (signature
+    changes). Already published files are not checked on disk again.
+    """
+    name = _root_name(os.path.dirname(video_file_path))
+    filename = os.path.basename(video_file_path)
+    dest_dir = os.path.join(STATIC_MEDIA_DIR, name)
+    dest_path = os.path.join(dest_dir, filename)
+
+    with _publish_lock:
+        if _published_files.get(dest_path) != signature:
+            os.makedirs(dest_dir, exist_ok=True)
+            tmp_path = dest_path + '.tmp'
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            try:
+                os.link(video_file_path, tmp_path)
+            except OSError:
+                shutil.copy2(video_file_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+            _published_files[dest_path] = signature
+
+    base_url = (st.get_option('server.baseUrlPath') or '').strip('/')
+    prefix = f"/{base_url}" if base_url else ''
+    return f"{prefix}/app/static/media/{name}/{quote(filename)}?v={_version_tag(signature)}"
+
+
+class _RangeRequestHandler(BaseHTTPRequestHandler):
+    """Serves /media/<name>/<file> from registered directories, with byte ranges."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _resolve(self):
+        parts = unquote(urlsplit(self.path).path).split('/')
+        if len(parts) != 4 or parts[0] != '' or parts[1] != 'media':
+            return None
+        root = _sidecar_roots.get(parts[2])
+        if root is None:
+            return None
+        path = os.path.realpath(os.path.join(root, parts[3]))
+        if os.path.dirname(path) != root or not os.path.isfile(path):
+            return None
+        return path
+
+    def _send_error(self, code):
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        path = self._resolve()
+        if path is None:
+            self._send_error(404)
+            return
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+
+        range_header = self.headers.get('Range')
+        if range_header:
+            match = _RANGE_RE.match(range_header.strip())
+            if match is None or (not match.group(1) and not match.group(2)):
+                self._send_error(416)
+                return
+            if match.group(1):
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), size - 1)
+            else:
+                # Suffix range: last N bytes
+                start = max(0, size - int(match.group(2)))
+            if start > end or start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Cache-Control', 'public, max-age=86400')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+        if not send_body:
+            return
+
+        try:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # Browser cancelled the request (seek, navigation)
+            pass
+
+
+def start_media_server(host=DEFAULT_SIDECAR_HOST, port=DEFAULT_SIDECAR_PORT):
+    """
+    Start the sidecar media server once per process (daemon thread).
+
+    Parameters:
+        host: Interface to bind
+        port: TCP port to listen on
+
+    Returns:
+        ThreadingHTTPServer instance
+    """
+    global _sidecar_server
+
+    with _sidecar_lock:
+        if _sidecar_server is None:
+            server = ThreadingHTTPServer((host, port), _RangeRequestHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='media-server', daemon=True).start()
+            _sidecar_server = server
+            print(f"[INFO] Media server listening on http://{host}:{port}")
+
+    return _sidecar_server
+
+
+def _sidecar_url(video_file_path, signature, server_config):
+    directory = os.path.realpath(os.path.dirname(video_file_path))
+    name = _root_name(os.path.dirname(video_file_path))
+
+    host = server_config.get('host', DEFAULT_SIDECAR_HOST)
+    port = int(server_config.get('port', DEFAULT_SIDECAR_PORT))
+    start_media_server(host, port)
+    _sidecar_roots.setdefault(name, directory)
+
+    public_url = (server_config.get('public_url') or f"http://localhost:{port}").rstrip('/')
+    filename = quote(os.path.basename(video_file_path))
+    return f"{public_url}/media/{name}/{filename}?v={_version_tag(signature)}"
+
+
+def get_video_src(video_file_path, config):
+    """
+    Return the src for the once-mode <video> element, following settings.media_delivery.
+
+    Parameters:
+        video_file_path: Path to the local video file
+        config: Configuration dictionary
+
+    Returns:
+        URL ("static"/"sidecar") or data: URI ("inline", or as fallback)
+    """
+    delivery, server_config = _media_settings(config)
+
+    if delivery == 'static' and not static_serving_plays_video():
+        delivery = 'sidecar'
+    if delivery in _disabled_deliveries:
+        delivery = 'inline'
+
+    try:
+        if delivery == 'static':
+            if not st.get_option('server.enableStaticServing'):
+                _disable('static', "set server.enableStaticServing = true in .streamlit/config.toml")
+            else:
+                return _publish_static(video_file_path, _file_signature(video_file_path))
+
+        elif delivery == 'sidecar':
+            return _sidecar_url(video_file_path, _file_signature(video_file_path), server_config)
+
+    except OSError as e:
+        _disable(delivery, e)
+
+    return get_inline_src(video_file_path, config)
+
+
+def get_video_sources(video_file_path, config, video_width=None):
+    """
+    Return the <source> list for a once-mode video: the smallest renditions
+    covering the participant's player size, best codec first (see utils/renditions.py).
+
+    Parameters:
+        video_file_path: Path to the full-size video file
+        config: Configuration dictionary
+        video_width: Player width in pixels or percentage string (None = full width)
+
+    Returns:
+        List of (src, MIME type) tuples; the last one is H.264
+    """
+    sources = select_video_sources(video_file_path, config, st.session_state.get('device_info'), video_width)
+    return [(get_video_src(source['path'], config), source['mime']) for source in sources]
+
+
+def get_source_tags(video_sources):
+    """HTML <source> elements for a list of (src, MIME type) tuples."""
+    return ''.join(f"<source src=\"{src}\" type='{mime}'>" for src, mime in video_sources)
@@ -0,0 +1,199 @@
+"""
+Process-wide per-video rating-count index for the min_ratings_per_video quota.
+
+One index is kept per storage source: the ratings worksheet ("gsheets") or
+the local rating log ("local"). An index is built once per process, then
+kept current by save_rating (record()) and by incremental refreshes that
+read only rows/records added since the last refresh. Each (user_id, id)
+pair counts once, case-insensitive on user_id. The same pass keeps the set
+of rated videos per user, so rated-video lookups don't rescan the ratings.
+"""
+import threading
+import time
+
+from utils.gsheets_manager import read_columns_from_gsheets
+from utils.rating_log import get_rating_log
+
+DEFAULT_REFRESH_TTL = 30.0   # seconds between incremental refreshes
+RATINGS_WORKSHEET = "v2_ImageSliders_ratings"
+
+# Process-wide index instances (source -> RatingCountIndex)
+_rating_count_indexes = {}
+_rating_count_indexes_lock = threading.Lock()
+
+
+class RatingCountIndex:
+    """
+    In-memory map video ID -> number of distinct raters, plus user -> rated videos.
+
+    count(), is_below_quota() and record() are O(1); videos_below_quota() is
+    linear in the number of candidate videos only, and rated_by() in the
+    user's own ratings, not in total ratings.
+    """
+
+    def __init__(self, source='gsheets', worksheet=RATINGS_WORKSHEET,
+                 refresh_ttl=DEFAULT_REFRESH_TTL, config=None):
+        if source not in ('gsheets', 'local'):
+            raise ValueError(f"Unknown rating count source: {source}")
+
+        self.source = source
+        self.worksheet = worksheet
+        self.refresh_ttl = refresh_ttl
+        self.config = config
+
+        self._counts = {}
+        self._rated_by_user = {}   # lowercase user ID -> {video ID: None}, in first-rated order
+        self._total = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._next_row = 2        # gsheets: first row not yet read
+        self._log_cursor = None   # local: rating log read cursor
+
+    def record(self, user_id, action_id):
+        """
+        Count one rating (no-op if this user already rated this video).
+
+        Returns:
+            True if the count changed
+        """
+        action_id = str(action_id)
+        with self._lock:
+            rated = self._rated_by_user.setdefault(str(user_id).lower(), {})
+            if not action_id or action_id in rated:
+                return False
+            rated[action_id] = None
+            self._total += 1
+            self._counts[action_id] = self._counts.get(action_id, 0) + 1
+            return True
+
+    def _record_many(self, pairs):
+        for user_id, action_id in pairs:
+            self.record(user_id, action_id)
+
+    def warm(self):
+        """Build the index from its storage source."""
+        if self.source == 'local':
+            # Legacy per-rating files are read once; the log is then followed
+            legacy = get_rating_log(self.config).iter_legacy_records()
+            self._record_many((r.get('user_id', ''), r.get('id', '')) for _, r in legacy)
+        self.refresh()
+        print(f"[INFO] Rating count index ({self.source}) warmed: {len(self._counts)} videos, {self._total} ratings")
+
+    def refresh(self):
+        """
+        Read ratings added since the last refresh (other processes/sessions).
+
+        Returns:
+            True on success, False if the source could not be read
+        """
+        with self._refresh_lock:
+            try:
+                if self.source == 'local':
+                    records, self._log_cursor = get_rating_log(self.config).read_new_records(self._log_cursor)
+                    self._record_many((r.get('user_id', ''), r.get('id', '')) for r in records)
+                    return True
+
+                result = read_columns_from_gsheets(['user_id', 'id'], self.worksheet, start_row=self._next_row)
+                if result is None:
+                    return False
+                column_values, self._next_row = result
+                self._record_many(zip(column_values['user_id'], column_values['id']))
+                return True
+
+            except Exception as e:
+                print(f"[WARNING] Rating count index refresh ({self.source}) failed: {e}")
+                return False
+
+            finally:
+                self._last_refresh = time.monotonic()
+
+    def _refresh_if_stale(self):
+        if time.monotonic() - self._last_refresh > self.refresh_ttl:
+            self.refresh()
+
+    def count(self, action_id):
+        """Return the number of distinct raters of a video."""
+        with self._lock:
+            return self._counts.get(str(action_id), 0)
+
+    def is_below_quota(self, action_id, min_ratings):
+        """Return True if the video has fewer than min_ratings ratings."""
+        return self.count(action_id) < min_ratings
+
+    def videos_below_quota(self, action_ids, min_ratings):
+        """
+        Filter video IDs to those still below the rating quota.
+
+        Parameters:
+            action_ids: Candidate video IDs
+            min_ratings: Quota (min_ratings_per_video)
+
+        Returns:
+            List of IDs (input order preserved) with fewer than min_ratings ratings
+        """
+        self._refresh_if_stale()
+        with self._lock:
+            counts = self._counts
+            return [a for a in action_ids if counts.get(str(a), 0) < min_ratings]
+
+    def counts_for(self, action_ids):
+        """
+        Return the current count of each candidate video.
+
+        Parameters:
+            action_ids: Candidate video IDs
+
+        Returns:
+            Dict video ID -> number of distinct raters (0 if unrated)
+        """
+        self._refresh_if_stale()
+        with self._lock:
+            counts = self._counts
+            return {a: counts.get(str(a), 0) for a in action_ids}
+
+    def rated_by(self, user_id):
+        """
+        Return the video IDs a user has rated (case-insensitive on user_id).
+
+        Parameters:
+            user_id: User identifier
+
+        Returns:
+            List of video IDs in the order they were first rated
+        """
+        self._refresh_if_stale()
+        with self._lock:
+            return list(self._rated_by_user.get(str(user_id).lower(), ()))
+
+    def counts(self):
+        """Return a copy of the video ID -> count map."""
+        self._refresh_if_stale()
+        with self._lock:
+            return dict(self._counts)
+
+
+def get_rating_count_index(config, source='gsheets'):
+    """
+    Get or create (and warm) the process-wide rating count index for a source.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.rating_count_ttl_seconds)
+        source: "gsheets" (ratings worksheet) or "local" (rating log)
+
+    Returns:
+        RatingCountIndex instance
+    """
+    with _rating_count_indexes_lock:
+        index = _rating_count_indexes.get(source)
+        if index is None:
+            settings = (config or {}).get('settings', {}) or {}
+            index = RatingCountIndex(
+                source=source,
+                refresh_ttl=float(settings.get('rating_count_ttl_seconds', DEFAULT_REFRESH_TTL)),
+                config=config,
+            )
+            index.warm()
+            _rating_count_indexes[source] = index
+
+    return index
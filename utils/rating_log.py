@@ -0,0 +1,384 @@
+"""
+Append-only JSONL log for locally stored ratings.
+
+Ratings are appended as one JSON object per line to numbered segment files
+(rating_log/ratings-000001.jsonl, ...). A new segment is started once the
+active one reaches the configured size. Appends take an exclusive file lock,
+so several app processes can share the same log directory.
+
+The old layout (one user_ratings/{user_id}_{action_id}.json file per rating)
+is still read as a legacy source and can be folded into the log with:
+
+    python -m utils.rating_log import-legacy
+    python -m utils.rating_log compact
+"""
+import fcntl
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Defaults (overridable via settings.rating_log in config.yaml)
+DEFAULT_LOG_DIR = 'rating_log'
+DEFAULT_FSYNC_POLICY = 'always'                # "always", "interval" or "never"
+DEFAULT_FSYNC_INTERVAL = 1.0                   # seconds, for fsync policy "interval"
+DEFAULT_SEGMENT_MAX_BYTES = 16 * 1024 * 1024   # rotate after 16 MB
+LEGACY_RATINGS_DIR = 'user_ratings'
+
+SEGMENT_PREFIX = 'ratings-'
+SEGMENT_SUFFIX = '.jsonl'
+LOCK_FILENAME = '.lock'
+
+# Process-wide log instance
+_rating_log = None
+_rating_log_lock = threading.Lock()
+
+
+def _segment_name(number):
+    return f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+
+
+def _segment_number(path):
+    name = os.path.basename(path)
+    return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+class RatingLog:
+    """
+    Segmented append-only JSONL rating log.
+
+    Records are cached in memory per segment and only the bytes appended since
+    the last read are parsed, so repeated reads stay cheap as the log grows.
+    """
+
+    def __init__(self, log_dir=DEFAULT_LOG_DIR, fsync_policy=DEFAULT_FSYNC_POLICY,
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL, segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES,
+                 legacy_dir=LEGACY_RATINGS_DIR):
+        if fsync_policy not in ('always', 'interval', 'never'):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.log_dir = log_dir
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.legacy_dir = legacy_dir
+
+        self._last_fsync = 0.0
+        self._read_lock = threading.Lock()
+        # segment path -> {'offset': bytes parsed, 'records': [...]}
+        self._segment_cache = {}
+        # (legacy dir mtime, [(filename, record), ...])
+        self._legacy_cache = None
+
+        os.makedirs(log_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock across threads and processes for appends and rotation."""
+        lock_path = os.path.join(self.log_dir, LOCK_FILENAME)
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def segment_paths(self):
+        """Return segment file paths in log order."""
+        paths = glob.glob(os.path.join(self.log_dir, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+        return sorted(paths, key=_segment_number)
+
+    def _active_segment(self):
+        """Return the segment to append to, rotating when it is full. Caller holds the lock."""
+        paths = self.segment_paths()
+        if not paths:
+            return os.path.join(self.log_dir, _segment_name(1))
+
+        active = paths[-1]
+        if os.path.getsize(active) >= self.segment_max_bytes:
+            active = os.path.join(self.log_dir, _segment_name(_segment_number(active) + 1))
+        return active
+
+    def _should_fsync(self):
+        if self.fsync_policy == 'always':
+            return True
+        if self.fsync_policy == 'interval':
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                self._last_fsync = now
+                return True
+        return False
+
+    def append(self, record):
+        """
+        Append one record as a single JSON line.
+
+        Parameters:
+            record: JSON-serializable dictionary
+        """
+        line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+
+        with self._locked():
+            path = self._active_segment()
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                if self._should_fsync():
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _read_segment(self, path):
+        """Return all records of a segment, parsing only newly appended bytes."""
+        entry = self._segment_cache.get(path)
+        if entry is None:
+            entry = {'offset': 0, 'records': []}
+            self._segment_cache[path] = entry
+
+        size = os.path.getsize(path)
+        if size < entry['offset']:
+            # Segment was rewritten (compaction): start over
+            entry['offset'] = 0
+            entry['records'] = []
+
+        if size > entry['offset']:
+            with open(path, 'rb') as f:
+                f.seek(entry['offset'])
+                data = f.read(size - entry['offset'])
+
+            # Only consume complete lines; a partial tail is re-read next time
+            end = data.rfind(b'\n') + 1
+            for raw in data[:end].splitlines():
+                if not raw.strip():
+                    continue
+                try:
+                    entry['records'].append(json.loads(raw))
+                except json.JSONDecodeError:
+                    print(f"[WARNING] Skipping corrupt line in {path}")
+            entry['offset'] += end
+
+        return entry['records']
+
+    def iter_log_records(self):
+        """Yield (segment_filename, record) for every record in the log, in order."""
+        with self._read_lock:
+            paths = self.segment_paths()
+            # Forget segments removed by compaction
+            for stale in set(self._segment_cache) - set(paths):
+                del self._segment_cache[stale]
+            snapshot = [(path, list(self._read_segment(path))) for path in paths]
+
+        for path, records in snapshot:
+            filename = os.path.basename(path)
+            for record in records:
+                yield filename, record
+
+    def read_new_records(self, cursor=None):
+        """
+        Return log records appended since a previous call.
+
+        Parameters:
+            cursor: Cursor returned by the previous call (None = from the start)
+
+        Returns:
+            Tuple (records, cursor). If segments were compacted in between,
+            records may repeat; callers should treat records idempotently.
+        """
+        cursor = dict(cursor or {})
+        new_records = []
+
+        with self._read_lock:
+            for path in self.segment_paths():
+                filename = os.path.basename(path)
+                records = self._read_segment(path)
+                start = cursor.get(filename, 0)
+                if start > len(records):
+                    start = 0
+                new_records.extend(records[start:])
+                cursor[filename] = len(records)
+
+        return new_records, cursor
+
+    def iter_legacy_records(self):
+        """
+        Yield (filename, record) for each legacy per-rating JSON file.
+
+        The parsed files are cached until the legacy directory changes.
+        """
+        if not self.legacy_dir or not os.path.exists(self.legacy_dir):
+            return
+
+        with self._read_lock:
+            mtime = os.path.getmtime(self.legacy_dir)
+            if self._legacy_cache is None or self._legacy_cache[0] != mtime:
+                records = []
+                for filename in sorted(os.listdir(self.legacy_dir)):
+                    if not filename.endswith('.json'):
+                        continue
+                    try:
+                        with open(os.path.join(self.legacy_dir, filename), 'r') as f:
+                            record = json.load(f)
+                    except Exception as e:
+                        print(f"[WARNING] Failed to read legacy rating {filename}: {e}")
+                        continue
+                    if isinstance(record, dict):
+                        records.append((filename, record))
+                self._legacy_cache = (mtime, records)
+            records = self._legacy_cache[1]
+
+        yield from records
+
+    def iter_records(self, include_legacy=True):
+        """Yield (source_filename, record) from the log and, optionally, legacy files."""
+        yield from self.iter_log_records()
+        if include_legacy:
+            yield from self.iter_legacy_records()
+
+    def _compaction_sources(self, import_legacy):
+        """Yield (source_filename, record) oldest first: timestamped legacy records, then the log."""
+        if import_legacy:
+            for filename, record in self.iter_legacy_records():
+                if 'timestamp' not in record:
+                    path = os.path.join(self.legacy_dir, filename)
+                    try:
+                        mtime = os.path.getmtime(path)
+                    except OSError:
+                        mtime = None
+                    if mtime is not None:
+                        record = dict(record, timestamp=datetime.fromtimestamp(mtime).isoformat())
+                yield filename, record
+        yield from self.iter_log_records()
+
+    def compact(self, import_legacy=False):
+        """
+        Rewrite the log into fresh segments, dropping duplicate ratings.
+
+        Only the last record per (user_id, id) is kept (case-insensitive user
+        ID). Legacy files are older than the log, so they are read first and a
+        log record always wins over a legacy one. Imported legacy records are
+        stamped with their file's modification time (unless they carry a
+        timestamp), which is lost once the files are moved away. Intended to
+        run offline, while the app is stopped.
+
+        Parameters:
+            import_legacy: Also fold legacy per-rating JSON files into the log
+
+        Returns:
+            Tuple (records_read, records_written)
+        """
+        with self._locked():
+            latest = {}
+            records_read = 0
+            for _, record in self._compaction_sources(import_legacy):
+                records_read += 1
+                key = (str(record.get('user_id', '')).lower(), str(record.get('id', '')))
+                # Re-insert so dict order follows the latest write
+                latest.pop(key, None)
+                latest[key] = record
+
+            old_paths = self.segment_paths()
+            next_number = _segment_number(old_paths[-1]) + 1 if old_paths else 1
+
+            # Write new segments next to the old ones, then drop the old ones
+            written = 0
+            current_path = None
+            current_file = None
+            try:
+                for record in latest.values():
+                    if current_file is None or current_file.tell() >= self.segment_max_bytes:
+                        if current_file is not None:
+                            current_file.flush()
+                            os.fsync(current_file.fileno())
+                            current_file.close()
+                        current_path = os.path.join(self.log_dir, _segment_name(next_number))
+                        next_number += 1
+                        current_file = open(current_path + '.tmp', 'w')
+                    current_file.write(json.dumps(record, default=str) + '\n')
+                    written += 1
+            finally:
+                if current_file is not None:
+                    current_file.flush()
+                    os.fsync(current_file.fileno())
+                    current_file.close()
+
+            for tmp_path in glob.glob(os.path.join(self.log_dir, f"*{SEGMENT_SUFFIX}.tmp")):
+                os.replace(tmp_path, tmp_path[:-len('.tmp')])
+            for path in old_paths:
+                os.remove(path)
+
+        with self._read_lock:
+            self._segment_cache.clear()
+            self._legacy_cache = None
+
+        if import_legacy and self.legacy_dir and os.path.exists(self.legacy_dir):
+            # Imported files must not be read again as a legacy source
+            # (timestamped if an earlier import's folder exists, which must not be replaced)
+            base_dir = self.legacy_dir.rstrip('/') + '_imported'
+            imported_dir = base_dir
+            attempt = 0
+            while os.path.exists(imported_dir):
+                attempt += 1
+                imported_dir = f"{base_dir}_{time.strftime('%Y%m%d_%H%M%S')}" + (f"_{attempt}" if attempt > 1 else '')
+            os.replace(self.legacy_dir, imported_dir)
+            print(f"[INFO] Legacy rating files moved to {imported_dir}")
+
+        return records_read, written
+
+
+def get_rating_log(config=None):
+    """
+    Get or create the process-wide rating log.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.rating_log); optional
+
+    Returns:
+        RatingLog instance
+    """
+    global _rating_log
+
+    with _rating_log_lock:
+        if _rating_log is None:
+            log_config = ((config or {}).get('settings', {}) or {}).get('rating_log', {}) or {}
+            _rating_log = RatingLog(
+                log_dir=log_config.get('dir', DEFAULT_LOG_DIR),
+                fsync_policy=log_config.get('fsync', DEFAULT_FSYNC_POLICY),
+                fsync_interval=float(log_config.get('fsync_interval_seconds', DEFAULT_FSYNC_INTERVAL)),
+                segment_max_bytes=int(log_config.get('segment_max_mb', DEFAULT_SEGMENT_MAX_BYTES / (1024 * 1024)) * 1024 * 1024),
+            )
+
+    return _rating_log
+
+
+def main(argv=None):
+    """Offline maintenance commands: compact, import-legacy."""
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else 'compact'
+
+    from utils.config_loader import load_config
+    try:
+        config = load_config()
+    except FileNotFoundError:
+        config = {}
+
+    log = get_rating_log(config)
+
+    if command == 'compact':
+        read, written = log.compact(import_legacy=False)
+    elif command == 'import-legacy':
+        read, written = log.compact(import_legacy=True)
+    else:
+        print(f"Unknown command: {command}")
+        print("Usage: python -m utils.rating_log [compact|import-legacy]")
+        return 1
+
+    print(f"[INFO] {command}: read {read} records, wrote {written} to {log.log_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
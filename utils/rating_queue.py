@@ -0,0 +1,313 @@
+"""
+Write-behind queue for Google Sheets rating (and spooled user) rows.
+
+Submitting a rating appends the row to a local spool file (fsynced) and
+returns immediately. A single background thread per process collects the
+queued rows and flushes them to Google Sheets with one append_rows call per
+interval or batch. Rows stay in the spool until the flush succeeds, so a
+crash or restart loses nothing: pending rows are re-queued on startup.
+
+Every row gets a row_uuid when it is queued. If an append was applied but
+its response was lost, the retried batch lands a second time; readers drop
+the copy by row_uuid (gsheets_manager.drop_duplicate_rows), and the count
+and rated-video indexes count each (user, video) pair once anyway.
+
+A batch that fails with a permanent error (not a timeout, rate limit, server
+error or open breaker), e.g. because of a malformed row, would otherwise be
+retried forever and hold back every later row. After max_failed_attempts
+such failures its rows are retried one at a time, and the ones that still
+fail are moved to a dead-letter file next to the spool.
+
+The same queue class also spools user rows that could not be written while
+Google Sheets was unavailable (circuit breaker open); one queue and spool
+file exist per worksheet.
+"""
+import atexit
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from utils.circuit_breaker import CircuitOpenError, is_retryable_error
+from utils.gsheets_manager import append_ratings_to_gsheets, append_users_to_gsheets
+
+# Defaults (overridable via settings.write_behind in config.yaml)
+DEFAULT_FLUSH_INTERVAL = 5.0     # seconds between flushes
+DEFAULT_BATCH_SIZE = 20          # flush early once this many rows are queued
+DEFAULT_SPOOL_DIR = 'spool'
+DEFAULT_MAX_FAILED_ATTEMPTS = 5  # permanent failures of a batch before its bad rows are dead-lettered
+SPOOL_FILENAME = 'ratings_pending.jsonl'
+RATINGS_WORKSHEET = "v2_ImageSliders_ratings"
+USERS_WORKSHEET = "v2_ImageSliders_users"
+
+# Spool file and batch writer per worksheet
+_QUEUE_TARGETS = {
+    RATINGS_WORKSHEET: (SPOOL_FILENAME, append_ratings_to_gsheets),
+    USERS_WORKSHEET: ('users_pending.jsonl', append_users_to_gsheets),
+}
+
+# Process-wide queue instances (worksheet -> RatingQueue, shared by all sessions)
+_rating_queues = {}
+_rating_queue_lock = threading.Lock()
+
+
+class RatingQueue:
+    """
+    Durable in-process queue that batches rating rows into Google Sheets.
+
+    Each pending row is kept both in memory and in an append-only spool file.
+    After a successful flush the spool is rewritten with whatever is still
+    pending.
+    """
+
+    def __init__(self, worksheet, spool_dir=DEFAULT_SPOOL_DIR,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_func=append_ratings_to_gsheets, spool_filename=SPOOL_FILENAME,
+                 max_failed_attempts=DEFAULT_MAX_FAILED_ATTEMPTS):
+        self.worksheet = worksheet
+        self.spool_dir = spool_dir
+        self.spool_path = os.path.join(spool_dir, spool_filename)
+        self.dead_letter_path = os.path.splitext(self.spool_path)[0] + '_dead.jsonl'
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.flush_func = flush_func
+        self.max_failed_attempts = max(1, int(max_failed_attempts))
+
+        self._pending = []
+        self._failed_attempts = 0   # consecutive permanent failures of the head batch
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+
+        os.makedirs(spool_dir, exist_ok=True)
+        self._recover_spool()
+
+        self._thread = threading.Thread(target=self._run, name='rating-queue', daemon=True)
+        self._thread.start()
+
+    def _recover_spool(self):
+        """Re-queue rows left in the spool by a previous process."""
+        if not os.path.exists(self.spool_path):
+            return
+
+        recovered = []
+        with open(self.spool_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    recovered.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Torn last line from a crash mid-write
+                    print(f"[WARNING] Skipping corrupt line in {self.spool_path}")
+
+        self._pending.extend(recovered)
+        if recovered:
+            print(f"[INFO] Recovered {len(recovered)} pending row(s) from {self.spool_path}")
+
+    def enqueue(self, rating_data):
+        """
+        Durably queue one row.
+
+        The row is timestamped here (submission time), given a row_uuid (kept
+        if already set) and fsynced to the spool before this returns.
+
+        Parameters:
+            rating_data: Dictionary with rating (or user) information
+
+        Returns:
+            True once the row is on disk, False if spooling failed
+        """
+        row = rating_data.copy()
+        row['timestamp'] = datetime.now().isoformat()
+        row.setdefault('row_uuid', uuid.uuid4().hex)
+
+        try:
+            with self._cond:
+                with open(self.spool_path, 'a') as f:
+                    f.write(json.dumps(row) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._pending.append(row)
+                if len(self._pending) == self.batch_size:
+                    self._cond.notify()
+            return True
+        except Exception as e:
+            print(f"[ERROR] Failed to spool row for {self.worksheet}: {e}")
+            return False
+
+    def pending_count(self):
+        """Return the number of rows not yet written to Google Sheets."""
+        with self._cond:
+            return len(self._pending)
+
+    def pending_rows(self):
+        """Return a copy of the rows not yet written to Google Sheets."""
+        with self._cond:
+            return list(self._pending)
+
+    def _write(self, rows):
+        """
+        Append rows with the flush function.
+
+        Returns:
+            'ok', 'transient' (keep and retry later) or 'permanent'
+        """
+        try:
+            if self.flush_func(rows, worksheet=self.worksheet, raise_on_error=True):
+                return 'ok'
+            return 'transient'   # no worksheet handle (connection unavailable)
+        except CircuitOpenError:
+            return 'transient'
+        except Exception as e:
+            return 'transient' if is_retryable_error(e) else 'permanent'
+
+    def flush(self):
+        """
+        Write all currently pending rows to Google Sheets in one call.
+
+        Returns:
+            True if nothing was pending or the write succeeded, False otherwise
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending)
+            if not batch:
+                return True
+
+            outcome = self._write(batch)
+            if outcome == 'permanent':
+                self._failed_attempts += 1
+                if self._failed_attempts >= self.max_failed_attempts:
+                    return self._isolate_bad_rows(batch)
+            if outcome != 'ok':
+                print(f"[WARNING] Queue flush to {self.worksheet} failed ({outcome}), "
+                      f"{len(batch)} row(s) kept in spool")
+                return False
+
+            self._failed_attempts = 0
+            self._remove_head(len(batch))
+            return True
+
+    def _isolate_bad_rows(self, batch):
+        """
+        Retry a repeatedly failing batch row by row; dead-letter the rows that fail permanently.
+
+        Stops at the first transient failure and keeps that row and the rest.
+        Caller holds _flush_lock.
+
+        Returns:
+            True if no row is left pending from the batch
+        """
+        done = 0
+        dead = []
+        for row in batch:
+            outcome = self._write([row])
+            if outcome == 'transient':
+                break
+            if outcome == 'permanent':
+                dead.append(row)
+            done += 1
+
+        if dead:
+            self._dead_letter(dead)
+        self._remove_head(done)
+        self._failed_attempts = 0
+        print(f"[WARNING] Queue for {self.worksheet}: {done - len(dead)} row(s) written one by one, "
+              f"{len(dead)} moved to {self.dead_letter_path}, {len(batch) - done} kept in spool")
+        return done == len(batch)
+
+    def _dead_letter(self, rows):
+        """Append rows that cannot be written to the dead-letter file (fsynced)."""
+        with open(self.dead_letter_path, 'a') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _remove_head(self, count):
+        """Drop the first count pending rows (written or dead-lettered) and rewrite the spool."""
+        if count == 0:
+            return
+        with self._cond:
+            # Rows enqueued during the flush are appended after the batch
+            del self._pending[:count]
+            self._rewrite_spool()
+
+    def _rewrite_spool(self):
+        """Atomically replace the spool with the still-pending rows. Caller holds _cond."""
+        tmp_path = self.spool_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for row in self._pending:
+                f.write(json.dumps(row) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def _run(self):
+        """Background loop: flush every interval, or early when a batch fills up."""
+        failed = False
+        while True:
+            with self._cond:
+                # After a failed flush, always wait a full interval before retrying
+                if not self._stopped and (failed or len(self._pending) < self.batch_size):
+                    self._cond.wait(timeout=self.flush_interval)
+                stopped = self._stopped
+
+            try:
+                failed = not self.flush()
+            except Exception as e:
+                print(f"[ERROR] Rating queue flush raised: {e}")
+                failed = True
+
+            if stopped:
+                return
+
+    def stop(self, timeout=10.0):
+        """Stop the background thread after a final flush attempt."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+
+
+def get_rating_queue(config, worksheet=RATINGS_WORKSHEET):
+    """
+    Get or create the process-wide queue for a worksheet.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.write_behind)
+        worksheet: Name of worksheet to flush to (ratings or users worksheet)
+
+    Returns:
+        RatingQueue instance
+    """
+    with _rating_queue_lock:
+        queue = _rating_queues.get(worksheet)
+        if queue is None:
+            spool_filename, flush_func = _QUEUE_TARGETS.get(
+                worksheet, (f"{worksheet}_pending.jsonl", append_ratings_to_gsheets)
+            )
+            queue_config = config.get('settings', {}).get('write_behind', {}) or {}
+            queue = RatingQueue(
+                worksheet=worksheet,
+                spool_dir=queue_config.get('spool_dir', DEFAULT_SPOOL_DIR),
+                flush_interval=float(queue_config.get('flush_interval_seconds', DEFAULT_FLUSH_INTERVAL)),
+                batch_size=int(queue_config.get('batch_size', DEFAULT_BATCH_SIZE)),
+                flush_func=flush_func,
+                spool_filename=spool_filename,
+                max_failed_attempts=int(queue_config.get('max_failed_attempts', DEFAULT_MAX_FAILED_ATTEMPTS)),
+            )
+            atexit.register(queue.stop)
+            _rating_queues[worksheet] = queue
+            print(f"[INFO] Write-behind queue for {worksheet} started (spool: {queue.spool_path})")
+
+    return queue
+
+
+def is_write_behind_enabled(config):
+    """Return True unless settings.write_behind.enabled is set to false in config."""
+    queue_config = config.get('settings', {}).get('write_behind', {}) or {}
+    return bool(queue_config.get('enabled', True))
@@ -0,0 +1,152 @@
+"""
+Resolution/codec ladder of stimulus videos.
+
+The stimulus build (utils/build_stimuli.py, "renditions" of a job) writes
+smaller copies of each output next to it:
+
+    data/videos_screenshots/img_1.mp4                        full size (H.264)
+    data/videos_screenshots/renditions/img_1_480p.mp4        H.264
+    data/videos_screenshots/renditions/img_1_720p_vp9.webm   VP9
+
+The player picks, per codec, the smallest rendition whose height covers the
+space the video occupies on the participant's screen (video_width, limited
+by the browser window, times the device pixel ratio) and lists them as
+<source> elements in settings.rendition_codecs order, so the browser plays
+the first codec it supports. Without device information, or when no
+rendition is large enough, the full-size file is used. Renditions are looked
+up in the in-memory media manifest (utils/media_manifest.py), whose folder
+watcher picks up newly built files.
+"""
+import math
+import os
+import re
+import threading
+
+RENDITION_DIR = 'renditions'
+DEFAULT_CODEC_PREFERENCE = ('h264',)
+DEFAULT_ASPECT_RATIO = 16 / 9
+
+# Encoder -> short codec name, filename suffix, container extension and <source> type
+RENDITION_CODECS = {
+    'libx264': {'codec': 'h264', 'suffix': '', 'extension': '.mp4', 'mime': 'video/mp4; codecs="avc1.640028"'},
+    'libvpx-vp9': {'codec': 'vp9', 'suffix': '_vp9', 'extension': '.webm', 'mime': 'video/webm; codecs="vp9"'},
+    'libsvtav1': {'codec': 'av1', 'suffix': '_av1', 'extension': '.mp4', 'mime': 'video/mp4; codecs="av01.0.08M.08"'},
+    'libaom-av1': {'codec': 'av1', 'suffix': '_av1', 'extension': '.mp4', 'mime': 'video/mp4; codecs="av01.0.08M.08"'},
+}
+_CODECS_BY_SUFFIX = {info['suffix']: info for info in RENDITION_CODECS.values()}
+
+_RENDITION_RE = re.compile(r'^(?P<stem>.+)_(?P<height>\d+)p(?P<suffix>_vp9|_av1)?\.\w+$')
+
+# Rendition folder -> (manifest entries it was built from, {stem: [rendition, ...]})
+_rendition_index = {}
+_rendition_index_lock = threading.Lock()
+
+
+def rendition_path(output_path, height, encoder):
+    """Path of a rendition of a build output, e.g. .../renditions/img_1_720p_vp9.webm."""
+    info = RENDITION_CODECS[encoder]
+    directory, filename = os.path.split(output_path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, RENDITION_DIR, f"{stem}_{int(height)}p{info['suffix']}{info['extension']}")
+
+
+def _index_renditions(rendition_dir, filenames):
+    index = {}
+    for filename in filenames:
+        match = _RENDITION_RE.match(filename)
+        if match is None:
+            continue
+        info = _CODECS_BY_SUFFIX[match.group('suffix') or '']
+        index.setdefault(match.group('stem'), []).append({
+            'path': os.path.join(rendition_dir, filename),
+            'height': int(match.group('height')),
+            'codec': info['codec'],
+            'mime': info['mime'],
+        })
+    for renditions in index.values():
+        renditions.sort(key=lambda r: r['height'])
+    return index
+
+
+def list_renditions(video_file_path):
+    """
+    Return the renditions of a video, smallest first (from the in-memory media manifest).
+
+    Returns:
+        List of dicts (path, height, codec, mime); empty if the video has no renditions
+    """
+    # Lazy import: utils.media_manifest imports utils.build_stimuli, which imports this module
+    from utils.media_manifest import get_folder_entries
+
+    rendition_dir = os.path.join(os.path.dirname(video_file_path), RENDITION_DIR)
+    entries = get_folder_entries(rendition_dir, warn_missing=False)
+
+    with _rendition_index_lock:
+        cached = _rendition_index.get(rendition_dir)
+        # The manifest swaps in a new entries dict when the folder changes
+        if cached is None or cached[0] is not entries:
+            cached = _rendition_index[rendition_dir] = (entries, _index_renditions(rendition_dir, entries))
+
+    stem = os.path.splitext(os.path.basename(video_file_path))[0]
+    return cached[1].get(stem, [])
+
+def required_height(device_info, video_width=None, aspect_ratio=DEFAULT_ASPECT_RATIO):
+    """
+    Video height in device pixels the player occupies on this participant's screen.
+
+    Parameters:
+        device_info: Dict from utils.device_detection.get_device_info
+        video_width: Player width in CSS pixels or percentage string (None = full width)
+        aspect_ratio: Width / height of the stimuli
+
+    Returns:
+        Height in pixels, or None if the window size is unknown
+    """
+    device_info = device_info or {}
+    window_width = device_info.get('window_innerWidth') or device_info.get('screen_width')
+    if not window_width:
+        return None
+
+    if isinstance(video_width, str) and '%' in video_width:
+        css_width = window_width * float(video_width.strip().rstrip('%')) / 100
+    elif video_width:
+        css_width = min(float(video_width), window_width)
+    else:
+        css_width = window_width
+
+    pixel_ratio = device_info.get('devicePixelRatio') or 1
+    return math.ceil(css_width * pixel_ratio / aspect_ratio)
+
+
+def select_video_sources(video_file_path, config, device_info, video_width=None):
+    """
+    Choose the files to list as <source> elements for a video, best codec first.
+
+    Parameters:
+        video_file_path: Path to the full-size video
+        config: Configuration dictionary (reads settings.rendition_codecs)
+        device_info: Dict from utils.device_detection.get_device_info
+        video_width: Player width in CSS pixels or percentage string
+
+    Returns:
+        List of dicts (path, codec, mime); the last entry is always H.264
+    """
+    full_size = {'path': video_file_path, 'codec': 'h264', 'mime': 'video/mp4'}
+    renditions = list_renditions(video_file_path)
+    needed = required_height(device_info, video_width)
+    if not renditions or needed is None:
+        return [full_size]
+
+    settings = (config or {}).get('settings', {}) or {}
+    preference = [c for c in settings.get('rendition_codecs', DEFAULT_CODEC_PREFERENCE) if c != 'h264'] + ['h264']
+
+    sources = []
+    for codec in preference:
+        covering = [r for r in renditions if r['codec'] == codec and r['height'] >= needed]
+        if covering:
+            sources.append(covering[0])
+
+    # Nothing small enough in H.264 covers the player: the full-size file does
+    if not sources or sources[-1]['codec'] != 'h264':
+        sources.append(full_size)
+    return sources
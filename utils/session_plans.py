@@ -0,0 +1,282 @@
+"""
+Deterministic, seeded per-user session plans.
+
+Without plans, every login of a returning participant re-lists the media
+folders, re-reads all of their ratings, reloads the metadata and draws a new
+sample with the unseeded global random generator. A plan is generated once
+per user instead: the ordered video IDs of their session plus a cursor (the
+index of the next video to rate), stored in a small SQLite table. Resuming
+is a single primary-key lookup; the cursor advances with every saved rating.
+
+Plans are reproducible. The random generator is seeded from the
+lower-cased user ID (user IDs are case-insensitive, as in the ratings
+store) and the plan round, the candidates are taken in sorted order, and
+the plan records a fingerprint of the settings and metadata content it was
+drawn from. The "least_rated" policy and video leases make the draw depend
+on live rating counts and on other sessions' leases as well, so the plan
+also records its draw inputs: the candidate IDs and the counts the draw
+used. Replaying a plan takes the seed, the metadata and these inputs; only
+the "random" policy without leases is reproducible from the metadata
+alone. Given the same inputs, the same user always gets the same videos.
+Their order is seeded as well with the "random" presentation order (the
+default); with "williams" it is the next row of the study's rotation, which is logged
+(see utils/counterbalancing.py). A plan whose fingerprint no longer
+matches the configuration (e.g., new metadata or a changed
+number_of_videos) is regenerated; a finished plan is followed by the next
+round (new seed), drawn from the videos the user has not rated yet.
+
+Usage (inspect a stored plan, optionally with its draw inputs):
+    python -m utils.session_plans --user P001 [--show-inputs]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.config_loader import load_config
+
+DEFAULT_PLAN_PATH = 'data_store/session_plans.sqlite3'
+
+# Settings that shape a plan; a change in any of them invalidates stored plans
+PLAN_SETTINGS = ('number_of_videos', 'min_ratings_per_video', 'variables_for_stratification', 'assignment_policy',
+                 'presentation_order')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    user_id      TEXT PRIMARY KEY,
+    plan_round   INTEGER NOT NULL,
+    seed         INTEGER NOT NULL,
+    fingerprint  TEXT NOT NULL,
+    video_ids    TEXT NOT NULL,
+    cursor       INTEGER NOT NULL DEFAULT 0,
+    created_at   REAL NOT NULL,
+    draw_inputs  TEXT
+);
+"""
+
+# Process-wide plan store instances (path -> SessionPlanStore)
+_plan_stores = {}
+_plan_stores_lock = threading.Lock()
+
+
+def _plan_key(user_id):
+    """Plans are keyed and seeded by the lower-cased user ID."""
+    return str(user_id).lower()
+
+
+def plan_seed(user_id, plan_round=0):
+    """Seed of a user's plan: the first 63 bits of SHA-256("<lower-cased user_id>:<round>")."""
+    digest = hashlib.sha256(f"{_plan_key(user_id)}:{plan_round}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') >> 1
+
+
+def plan_rng(user_id, plan_round=0):
+    """numpy Generator seeded for a user's plan."""
+    return np.random.default_rng(plan_seed(user_id, plan_round))
+
+
+def plan_fingerprint(config, metadata_hash):
+    """
+    Short hash of everything a plan is drawn from besides the seed.
+
+    Parameters:
+        config: Configuration dictionary (PLAN_SETTINGS and paths.video_path)
+        metadata_hash: Content hash of the metadata file
+
+    Returns:
+        16-character hex string
+    """
+    settings = config.get('settings', {}) or {}
+    payload = {key: settings.get(key) for key in PLAN_SETTINGS}
+    payload['video_path'] = config.get('paths', {}).get('video_path')
+    payload['metadata'] = metadata_hash
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def draw_inputs_hash(draw_inputs):
+    """Short hash of a plan's recorded draw inputs (None if none were recorded)."""
+    if draw_inputs is None:
+        return None
+    return hashlib.sha256(json.dumps(draw_inputs, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class SessionPlanStore:
+    """
+    SQLite-backed session plans: user ID -> ordered video IDs and cursor.
+
+    Parameters:
+        db_path: Path to the SQLite database file
+    """
+
+    def __init__(self, db_path=DEFAULT_PLAN_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(plans)")}
+        if 'draw_inputs' not in columns:
+            conn.execute("ALTER TABLE plans ADD COLUMN draw_inputs TEXT")
+
+    def _connection(self):
+        """This thread's connection (autocommit mode)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        """
+        Stored plan of a user.
+
+        Returns:
+            Dict with user_id (lower-cased), plan_round, seed, fingerprint, video_ids,
+            cursor, created_at and draw_inputs, or None if the user has no plan
+        """
+        key = _plan_key(user_id)
+        row = self._connection().execute(
+            "SELECT plan_round, seed, fingerprint, video_ids, cursor, created_at, draw_inputs "
+            "FROM plans WHERE user_id = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        plan_round, seed, fingerprint, video_ids, cursor, created_at, draw_inputs = row
+        return {
+            'user_id': key,
+            'plan_round': plan_round,
+            'seed': seed,
+            'fingerprint': fingerprint,
+            'video_ids': json.loads(video_ids),
+            'cursor': cursor,
+            'created_at': created_at,
+            'draw_inputs': json.loads(draw_inputs) if draw_inputs else None,
+        }
+
+    def save(self, user_id, plan_round, seed, fingerprint, video_ids, draw_inputs=None):
+        """
+        Store (or replace) a user's plan with the cursor at the start.
+
+        Parameters:
+            user_id: User identifier (case-insensitive)
+            plan_round: Plan round the seed was derived from
+            seed: Seed of the draw
+            fingerprint: plan_fingerprint() of the settings and metadata
+            video_ids: Video IDs in presentation order
+            draw_inputs: Optional dict of the candidates and counts the draw used
+
+        Returns:
+            The plan dict
+        """
+        key = _plan_key(user_id)
+        video_ids = [str(v) for v in video_ids]
+        created_at = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO plans "
+            "(user_id, plan_round, seed, fingerprint, video_ids, cursor, created_at, draw_inputs) "
+            "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+            (key, plan_round, seed, fingerprint, json.dumps(video_ids, separators=(',', ':')), created_at,
+             json.dumps(draw_inputs, sort_keys=True, separators=(',', ':')) if draw_inputs is not None else None)
+        )
+        return {
+            'user_id': key,
+            'plan_round': plan_round,
+            'seed': seed,
+            'fingerprint': fingerprint,
+            'video_ids': video_ids,
+            'cursor': 0,
+            'created_at': created_at,
+            'draw_inputs': draw_inputs,
+        }
+
+    def advance(self, user_id, video_id):
+        """
+        Move the cursor past a rated video.
+
+        Parameters:
+            user_id: User identifier
+            video_id: The video that was just rated
+
+        Returns:
+            New cursor, or None if the video is not ahead of the cursor in the user's plan
+        """
+        plan = self.get(user_id)
+        if plan is None:
+            return None
+        try:
+            position = plan['video_ids'].index(str(video_id), plan['cursor'])
+        except ValueError:
+            return None
+        self._connection().execute(
+            "UPDATE plans SET cursor = MAX(cursor, ?) WHERE user_id = ?", (position + 1, _plan_key(user_id))
+        )
+        return position + 1
+
+
+def is_session_plans_enabled(config):
+    """Return True if settings.session_plans.enabled is set."""
+    settings = (config or {}).get('settings', {}) or {}
+    return bool((settings.get('session_plans', {}) or {}).get('enabled', False))
+
+
+def get_plan_store(config):
+    """
+    Get or create the process-wide plan store.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.session_plans.path)
+
+    Returns:
+        SessionPlanStore instance
+    """
+    settings = (config or {}).get('settings', {}) or {}
+    db_path = (settings.get('session_plans', {}) or {}).get('path', DEFAULT_PLAN_PATH)
+
+    with _plan_stores_lock:
+        store = _plan_stores.get(db_path)
+        if store is None:
+            store = SessionPlanStore(db_path)
+            _plan_stores[db_path] = store
+
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a participant's stored session plan")
+    parser.add_argument('--user', required=True, help="User ID (case-insensitive)")
+    parser.add_argument('--show-inputs', action='store_true',
+                        help="Also print the recorded draw inputs (candidates and counts) for replay")
+    args = parser.parse_args()
+
+    plan = get_plan_store(load_config()).get(args.user)
+    if plan is None:
+        print(f"[INFO] No session plan stored for user {args.user}")
+        return
+    print(f"[INFO] User {plan['user_id']}: round {plan['plan_round']}, seed {plan['seed']}, "
+          f"fingerprint {plan['fingerprint']}, draw inputs {draw_inputs_hash(plan['draw_inputs'])}, "
+          f"{plan['cursor']}/{len(plan['video_ids'])} rated")
+    if args.show_inputs and plan['draw_inputs'] is not None:
+        print(json.dumps(plan['draw_inputs'], indent=2, sort_keys=True))
+    for index, video_id in enumerate(plan['video_ids']):
+        marker = '>' if index == plan['cursor'] else ' '
+        print(f"{marker} {index:>4} {video_id}")
+
+
+if __name__ == "__main__":
+    main()
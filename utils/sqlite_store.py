@@ -0,0 +1,222 @@
+"""
+SQLite storage for user data and ratings (storage_mode: "sqlite").
+
+A single WAL-mode database file holds both tables, so many concurrent
+sessions on one host can read while another writes. Lookups use indexes on
+the lowercase user ID and on (user_id, id) instead of scanning JSON files.
+Writes are upserts: saving the same rating twice (e.g. a double-clicked
+Submit) updates the existing row instead of adding a duplicate.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_SQLITE_PATH = 'data_store/ratings.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id_lower TEXT PRIMARY KEY,
+    user_id       TEXT NOT NULL,
+    data          TEXT NOT NULL,
+    timestamp     TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ratings (
+    user_id_lower TEXT NOT NULL,
+    id            TEXT NOT NULL,
+    user_id       TEXT NOT NULL,
+    data          TEXT NOT NULL,
+    timestamp     TEXT NOT NULL,
+    PRIMARY KEY (user_id_lower, id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ratings_id ON ratings (id);
+"""
+
+# Per-thread connections (Streamlit serves each session on its own thread)
+_local = threading.local()
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def get_sqlite_path(config):
+    """Return the configured database path (settings.sqlite_path)."""
+    settings = (config or {}).get('settings', {}) or {}
+    return settings.get('sqlite_path', DEFAULT_SQLITE_PATH)
+
+
+def get_connection(db_path=DEFAULT_SQLITE_PATH):
+    """
+    Get this thread's connection to the database, creating the schema once.
+
+    Parameters:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        sqlite3.Connection
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(db_path, timeout=30.0)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+
+        with _schema_lock:
+            if db_path not in _initialized_paths:
+                conn.executescript(_SCHEMA)
+                _initialized_paths.add(db_path)
+
+        connections[db_path] = conn
+
+    return conn
+
+
+def save_user(user_data, db_path=DEFAULT_SQLITE_PATH):
+    """
+    Insert or update a user row.
+
+    Parameters:
+        user_data: Dictionary with user information (must contain 'user_id')
+        db_path: Path to the SQLite database file
+
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        user_id = str(user_data['user_id'])
+        conn = get_connection(db_path)
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO users (user_id_lower, user_id, data, timestamp)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (user_id_lower) DO UPDATE SET
+                    data = excluded.data,
+                    timestamp = excluded.timestamp
+                """,
+                (user_id.lower(), user_id, json.dumps(user_data, default=str), datetime.now().isoformat())
+            )
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to save user to SQLite: {e}")
+        return False
+
+
+def save_rating(rating_data, db_path=DEFAULT_SQLITE_PATH):
+    """
+    Insert or update a rating row keyed by (lowercase user_id, id).
+
+    Parameters:
+        rating_data: Dictionary with rating information (must contain 'user_id' and 'id')
+        db_path: Path to the SQLite database file
+
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        user_id = str(rating_data['user_id'])
+        action_id = str(rating_data['id'])
+        conn = get_connection(db_path)
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO ratings (user_id_lower, id, user_id, data, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (user_id_lower, id) DO UPDATE SET
+                    data = excluded.data,
+                    timestamp = excluded.timestamp
+                """,
+                (user_id.lower(), action_id, user_id, json.dumps(rating_data, default=str),
+                 datetime.now().isoformat())
+            )
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to save rating to SQLite: {e}")
+        return False
+
+
+def user_exists(user_id, db_path=DEFAULT_SQLITE_PATH):
+    """Check if a user exists (case-insensitive), via users or ratings."""
+    conn = get_connection(db_path)
+    user_id_lower = str(user_id).lower()
+    row = conn.execute(
+        """
+        SELECT 1 FROM users WHERE user_id_lower = ?
+        UNION ALL
+        SELECT 1 FROM ratings WHERE user_id_lower = ?
+        LIMIT 1
+        """,
+        (user_id_lower, user_id_lower)
+    ).fetchone()
+    return row is not None
+
+
+def get_all_user_ids(db_path=DEFAULT_SQLITE_PATH):
+    """Return all user IDs (original case)."""
+    conn = get_connection(db_path)
+    return [row[0] for row in conn.execute("SELECT user_id FROM users")]
+
+
+def get_rated_videos_for_user(user_id, db_path=DEFAULT_SQLITE_PATH):
+    """Return the video IDs rated by a user (case-insensitive)."""
+    conn = get_connection(db_path)
+    rows = conn.execute(
+        "SELECT id FROM ratings WHERE user_id_lower = ?",
+        (str(user_id).lower(),)
+    )
+    return [row[0] for row in rows]
+
+
+def get_rating_counts(db_path=DEFAULT_SQLITE_PATH):
+    """Return a dict video ID -> number of ratings."""
+    conn = get_connection(db_path)
+    return dict(conn.execute("SELECT id, COUNT(*) FROM ratings GROUP BY id"))
+
+
+def get_videos_below_quota(video_ids, min_ratings, db_path=DEFAULT_SQLITE_PATH):
+    """
+    Filter video IDs to those with fewer than min_ratings ratings.
+
+    Parameters:
+        video_ids: Candidate video IDs
+        min_ratings: Quota (min_ratings_per_video)
+        db_path: Path to the SQLite database file
+
+    Returns:
+        List of IDs (input order preserved) still below quota
+    """
+    conn = get_connection(db_path)
+    full = {
+        row[0] for row in conn.execute(
+            "SELECT id FROM ratings GROUP BY id HAVING COUNT(*) >= ?",
+            (min_ratings,)
+        )
+    }
+    return [v for v in video_ids if str(v) not in full]
+
+
+def read_table(table, db_path=DEFAULT_SQLITE_PATH):
+    """
+    Return all rows of 'users' or 'ratings' as a list of dicts (for export).
+    """
+    if table not in ('users', 'ratings'):
+        raise ValueError(f"Unknown table: {table}")
+
+    conn = get_connection(db_path)
+    records = []
+    for data, timestamp in conn.execute(f"SELECT data, timestamp FROM {table}"):
+        record = json.loads(data)
+        record['timestamp'] = timestamp
+        records.append(record)
+    return records
@@ -0,0 +1,494 @@
+"""
+Pluggable storage backends for user data and ratings.
+
+Each store (Google Sheets, local JSON + rating log, SQLite) implements the
+StorageBackend interface. StorageDispatcher fans writes out to all
+configured backends concurrently on a shared thread pool and returns as soon
+as a durability quorum of backends has succeeded; the remaining writes keep
+running in the background. Reads go to the fastest healthy backend and fall
+back to the next one on failure; the other backends' latencies are
+re-measured in the background every LATENCY_PROBE_INTERVAL seconds. The
+rated videos of a user are the exception: they are the union over all
+healthy backends, since a lagging store must not hide a user's ratings.
+
+Which backends are active follows settings.storage_mode:
+    "online" -> Google Sheets
+    "local"  -> local JSON + rating log
+    "both"   -> Google Sheets + local JSON + rating log
+    "sqlite" -> SQLite
+"""
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from utils.gsheets_manager import (
+    append_rating_to_gsheets,
+    append_user_to_gsheets,
+    configure_gsheets_backend,
+    configure_gsheets_breaker,
+    get_rated_videos_for_user_from_gsheets,
+    is_gsheets_available,
+    remember_rated_video
+)
+from utils.rating_queue import get_rating_queue, is_write_behind_enabled
+from utils.rating_log import get_rating_log
+from utils.user_registry import get_user_registry
+from utils.rating_counts import get_rating_count_index
+from utils import sqlite_store
+
+USERS_WORKSHEET = "v2_ImageSliders_users"
+RATINGS_WORKSHEET = "v2_ImageSliders_ratings"
+
+DEFAULT_WRITE_TIMEOUT = 30.0      # seconds to wait for the write quorum
+UNHEALTHY_COOLDOWN = 30.0         # seconds a failed backend is skipped for reads
+LATENCY_SMOOTHING = 0.2           # EWMA weight of the newest read latency
+LATENCY_PROBE_INTERVAL = 60.0     # seconds between background latency probes of the unused backends
+
+# Shared pool for concurrent backend writes (all sessions in the process)
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='storage')
+
+# Process-wide dispatchers (storage_mode -> StorageDispatcher)
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+class StorageBackend(ABC):
+    """
+    Interface for a user/rating store.
+
+    Write methods return True/False; read methods raise on failure so the
+    dispatcher can fall back to another backend. A backend that does not
+    implement every abstract method cannot be instantiated.
+    """
+
+    name = 'base'
+
+    def warm(self):
+        """Prepare in-memory indexes (optional)."""
+
+    @abstractmethod
+    def save_user(self, user_data):
+        """Store a user's demographic data; returns True on success."""
+
+    @abstractmethod
+    def save_rating(self, rating_data):
+        """Store one rating; returns True on success."""
+
+    @abstractmethod
+    def user_exists(self, user_id):
+        """Return True if the user ID is known (case-insensitive)."""
+
+    @abstractmethod
+    def get_all_user_ids(self):
+        """Return all known user IDs."""
+
+    @abstractmethod
+    def get_rated_videos(self, user_id):
+        """Return the set of video IDs the user has rated."""
+
+    @abstractmethod
+    def get_videos_below_quota(self, video_ids, min_ratings):
+        """Return the video IDs with fewer than min_ratings ratings."""
+
+    @abstractmethod
+    def get_rating_counts(self, video_ids):
+        """Return a dict video ID -> number of ratings."""
+
+
+class GSheetsBackend(StorageBackend):
+    """
+    Google Sheets (users/ratings worksheets), with write-behind for ratings.
+
+    Users are appended directly; while the circuit breaker is open, or if the
+    append fails, the user row is spooled and flushed once Sheets recovers.
+    """
+
+    name = 'gsheets'
+
+    def __init__(self, config):
+        self.config = config
+        configure_gsheets_backend(config)
+        configure_gsheets_breaker(config)
+
+    def warm(self):
+        get_user_registry(self.config, source='gsheets')
+        get_rating_count_index(self.config, source='gsheets')
+
+    def save_user(self, user_data):
+        success = is_gsheets_available() and append_user_to_gsheets(user_data, worksheet=USERS_WORKSHEET)
+        if not success:
+            success = get_rating_queue(self.config, worksheet=USERS_WORKSHEET).enqueue(user_data)
+            if success:
+                print(f"[INFO] Google Sheets unavailable, user {user_data.get('user_id')} spooled")
+        if success:
+            get_user_registry(self.config, source='gsheets').add(user_data.get('user_id'))
+        return success
+
+    def save_rating(self, rating_data):
+        if is_write_behind_enabled(self.config):
+            success = get_rating_queue(self.config, worksheet=RATINGS_WORKSHEET).enqueue(rating_data)
+        else:
+            success = is_gsheets_available() and append_rating_to_gsheets(rating_data, worksheet=RATINGS_WORKSHEET)
+
+        if success:
+            remember_rated_video(rating_data['user_id'], rating_data['id'], worksheet=RATINGS_WORKSHEET)
+            get_rating_count_index(self.config, source='gsheets').record(rating_data['user_id'], rating_data['id'])
+        return success
+
+    def user_exists(self, user_id):
+        return get_user_registry(self.config, source='gsheets').contains(user_id)
+
+    def get_all_user_ids(self):
+        return get_user_registry(self.config, source='gsheets').all_ids()
+
+    def get_rated_videos(self, user_id):
+        rated_ids = get_rated_videos_for_user_from_gsheets(user_id, worksheet=RATINGS_WORKSHEET, raise_on_error=True)
+        if is_write_behind_enabled(self.config):
+            # Ratings still in the spool (e.g. while the breaker is open) are not in the sheet yet
+            user_id_lower = user_id.lower()
+            pending_ids = [
+                str(row.get('id', ''))
+                for row in get_rating_queue(self.config, worksheet=RATINGS_WORKSHEET).pending_rows()
+                if str(row.get('user_id', '')).lower() == user_id_lower
+            ]
+            rated_ids = list(dict.fromkeys(rated_ids + [action_id for action_id in pending_ids if action_id]))
+        return rated_ids
+
+    def get_videos_below_quota(self, video_ids, min_ratings):
+        return get_rating_count_index(self.config, source='gsheets').videos_below_quota(video_ids, min_ratings)
+
+    def get_rating_counts(self, video_ids):
+        return get_rating_count_index(self.config, source='gsheets').counts_for(video_ids)
+
+
+class LocalBackend(StorageBackend):
+    """Local filesystem: user_data/{user_id}.json and the JSONL rating log."""
+
+    name = 'local'
+
+    def __init__(self, config):
+        self.config = config
+
+    def warm(self):
+        get_user_registry(self.config, source='local')
+        get_rating_count_index(self.config, source='local')
+
+    def save_user(self, user_data):
+        os.makedirs('user_data', exist_ok=True)
+        path = os.path.join('user_data', f"{user_data['user_id']}.json")
+        with open(path, 'w') as f:
+            json.dump(user_data, f, indent=2)
+        get_user_registry(self.config, source='local').add(user_data['user_id'])
+        return True
+
+    def save_rating(self, rating_data):
+        log_record = rating_data.copy()
+        log_record['timestamp'] = datetime.now().isoformat()
+        get_rating_log(self.config).append(log_record)
+        get_rating_count_index(self.config, source='local').record(rating_data['user_id'], rating_data['id'])
+        return True
+
+    def user_exists(self, user_id):
+        return get_user_registry(self.config, source='local').contains(user_id)
+
+    def get_all_user_ids(self):
+        return get_user_registry(self.config, source='local').all_ids()
+
+    def get_rated_videos(self, user_id):
+        # Per-user index kept alongside the rating counts (log + legacy files)
+        return get_rating_count_index(self.config, source='local').rated_by(user_id)
+
+    def get_videos_below_quota(self, video_ids, min_ratings):
+        return get_rating_count_index(self.config, source='local').videos_below_quota(video_ids, min_ratings)
+
+    def get_rating_counts(self, video_ids):
+        return get_rating_count_index(self.config, source='local').counts_for(video_ids)
+
+
+class SQLiteBackend(StorageBackend):
+    """Single-file SQLite database (see utils/sqlite_store.py)."""
+
+    name = 'sqlite'
+
+    def __init__(self, config):
+        self.db_path = sqlite_store.get_sqlite_path(config)
+
+    def warm(self):
+        sqlite_store.get_connection(self.db_path)
+
+    def save_user(self, user_data):
+        return sqlite_store.save_user(user_data, db_path=self.db_path)
+
+    def save_rating(self, rating_data):
+        return sqlite_store.save_rating(rating_data, db_path=self.db_path)
+
+    def user_exists(self, user_id):
+        return sqlite_store.user_exists(user_id, db_path=self.db_path)
+
+    def get_all_user_ids(self):
+        return sqlite_store.get_all_user_ids(db_path=self.db_path)
+
+    def get_rated_videos(self, user_id):
+        return sqlite_store.get_rated_videos_for_user(user_id, db_path=self.db_path)
+
+    def get_videos_below_quota(self, video_ids, min_ratings):
+        return sqlite_store.get_videos_below_quota(video_ids, min_ratings, db_path=self.db_path)
+
+    def get_rating_counts(self, video_ids):
+        counts = sqlite_store.get_rating_counts(db_path=self.db_path)
+        return {v: counts.get(str(v), 0) for v in video_ids}
+
+
+BACKENDS_BY_STORAGE_MODE = {
+    'online': [GSheetsBackend],
+    'local': [LocalBackend],
+    'both': [GSheetsBackend, LocalBackend],
+    'sqlite': [SQLiteBackend],
+}
+
+
+class StorageDispatcher:
+    """
+    Fans writes out to several backends and routes reads to the fastest one.
+
+    Parameters:
+        backends: List of StorageBackend instances (first = preferred for reads
+            until latencies are known)
+        write_quorum: Number of backends that must confirm a write before it
+            counts as saved ("all" = every backend)
+        write_timeout: Seconds to wait for the quorum
+    """
+
+    def __init__(self, backends, write_quorum=1, write_timeout=DEFAULT_WRITE_TIMEOUT):
+        if not backends:
+            raise ValueError("At least one storage backend is required")
+
+        self.backends = list(backends)
+        if write_quorum == 'all':
+            write_quorum = len(self.backends)
+        self.write_quorum = max(1, min(int(write_quorum), len(self.backends)))
+        self.write_timeout = write_timeout
+
+        self._lock = threading.Lock()
+        # backend name -> smoothed read latency (seconds), unhealthy-until time
+        self._latency = {b.name: 0.0 for b in self.backends}
+        self._unhealthy_until = {b.name: 0.0 for b in self.backends}
+        self._last_probe = time.monotonic()
+
+    def warm(self):
+        """Warm all backends concurrently."""
+        futures = [_executor.submit(backend.warm) for backend in self.backends]
+        for backend, future in zip(self.backends, futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[WARNING] Failed to warm storage backend '{backend.name}': {e}")
+
+    def _mark_failed(self, backend):
+        with self._lock:
+            self._unhealthy_until[backend.name] = time.monotonic() + UNHEALTHY_COOLDOWN
+
+    def _record_latency(self, backend, elapsed):
+        with self._lock:
+            previous = self._latency[backend.name]
+            self._latency[backend.name] = (
+                elapsed if previous == 0.0
+                else (1 - LATENCY_SMOOTHING) * previous + LATENCY_SMOOTHING * elapsed
+            )
+            self._unhealthy_until[backend.name] = 0.0
+
+    def _probe(self, backend, method_name, args):
+        """Re-measure a backend's read latency in the background (result discarded)."""
+        start = time.monotonic()
+        try:
+            getattr(backend, method_name)(*args)
+        except Exception as e:
+            print(f"[WARNING] Storage backend '{backend.name}' latency probe ({method_name}) failed: {e}")
+            self._mark_failed(backend)
+            return
+        self._record_latency(backend, time.monotonic() - start)
+
+    def _maybe_probe(self, used, method_name, args):
+        """
+        Every LATENCY_PROBE_INTERVAL, repeat a read on the other healthy backends.
+
+        Latency is only measured on the backend that serves a read, so without
+        probes a backend that was slow once would never be chosen (or measured)
+        again, even after it became the fastest.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_probe < LATENCY_PROBE_INTERVAL:
+                return
+            self._last_probe = now
+            others = [b for b in self.backends if b is not used and self._unhealthy_until[b.name] <= now]
+        for backend in others:
+            _executor.submit(self._probe, backend, method_name, args)
+
+    def _read_order(self):
+        """Healthy backends by smoothed latency, then unhealthy ones as last resort."""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(
+                self.backends,
+                key=lambda b: (self._unhealthy_until[b.name] > now, self._latency[b.name])
+            )
+
+    def _write(self, method_name, record, label):
+        """Run a write on all backends concurrently; wait until the quorum is met."""
+
+        def run(backend):
+            try:
+                success = bool(getattr(backend, method_name)(record))
+            except Exception as e:
+                print(f"[WARNING] Storage backend '{backend.name}' {method_name} failed: {e}")
+                success = False
+            if success:
+                print(f"[INFO] ✓ {label} saved to {backend.name}")
+            else:
+                self._mark_failed(backend)
+            return success
+
+        pending = {_executor.submit(run, backend) for backend in self.backends}
+        successes = 0
+        deadline = time.monotonic() + self.write_timeout
+
+        while pending and successes < self.write_quorum:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            successes += sum(1 for future in done if future.result())
+            # Give up early if the quorum can no longer be reached
+            if successes + len(pending) < self.write_quorum:
+                break
+
+        return successes >= self.write_quorum
+
+    def save_user(self, user_data):
+        return self._write('save_user', user_data, f"User data {user_data.get('user_id')}")
+
+    def save_rating(self, rating_data):
+        return self._write('save_rating', rating_data, f"Rating {rating_data.get('user_id')}_{rating_data.get('id')}")
+
+    def _read(self, method_name, *args):
+        """Call a read method on the fastest healthy backend, falling back in order."""
+        last_error = None
+        for backend in self._read_order():
+            start = time.monotonic()
+            try:
+                result = getattr(backend, method_name)(*args)
+            except Exception as e:
+                print(f"[WARNING] Storage backend '{backend.name}' {method_name} failed: {e}")
+                self._mark_failed(backend)
+                last_error = e
+                continue
+            self._record_latency(backend, time.monotonic() - start)
+            if len(self.backends) > 1:
+                self._maybe_probe(backend, method_name, args)
+            return result
+
+        raise RuntimeError(f"All storage backends failed for {method_name}: {last_error}")
+
+    def user_exists(self, user_id):
+        # A miss on one backend is not authoritative: another may know the user
+        for backend in self._read_order():
+            try:
+                if backend.user_exists(user_id):
+                    return True
+            except Exception as e:
+                print(f"[WARNING] Storage backend '{backend.name}' user_exists failed: {e}")
+                self._mark_failed(backend)
+        return False
+
+    def get_all_user_ids(self):
+        # Union over backends, so generated IDs never collide with any store
+        user_ids = {}
+        for backend in self.backends:
+            try:
+                for user_id in backend.get_all_user_ids():
+                    user_ids.setdefault(str(user_id).lower(), user_id)
+            except Exception as e:
+                print(f"[WARNING] Storage backend '{backend.name}' get_all_user_ids failed: {e}")
+                self._mark_failed(backend)
+        return list(user_ids.values())
+
+    def get_rated_videos(self, user_id):
+        """
+        Union of the rated videos over all healthy backends (queried concurrently).
+
+        One store can lag behind another (an empty or unreachable sheet, a
+        memo from before the last ratings), and showing a returning user a
+        video they already rated is worse than a slower read. If no healthy
+        backend answers, the unhealthy ones are tried in order.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [b for b in self.backends if self._unhealthy_until[b.name] <= now]
+
+        def timed(backend):
+            start = time.monotonic()
+            result = backend.get_rated_videos(user_id)
+            return result, time.monotonic() - start
+
+        futures = [(backend, _executor.submit(timed, backend)) for backend in healthy]
+        rated_ids = {}
+        answered = False
+        for backend, future in futures:
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                print(f"[WARNING] Storage backend '{backend.name}' get_rated_videos failed: {e}")
+                self._mark_failed(backend)
+                continue
+            self._record_latency(backend, elapsed)
+            answered = True
+            for action_id in result:
+                rated_ids.setdefault(str(action_id), None)
+
+        if not answered:
+            return self._read('get_rated_videos', user_id)
+        return list(rated_ids)
+
+    def get_videos_below_quota(self, video_ids, min_ratings):
+        return self._read('get_videos_below_quota', video_ids, min_ratings)
+
+    def get_rating_counts(self, video_ids):
+        return self._read('get_rating_counts', video_ids)
+
+
+def get_storage(config):
+    """
+    Get or create (and warm) the process-wide dispatcher for the configured storage_mode.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.storage_mode,
+            settings.write_quorum and settings.write_timeout_seconds)
+
+    Returns:
+        StorageDispatcher instance
+    """
+    settings = (config or {}).get('settings', {}) or {}
+    storage_mode = settings.get('storage_mode', 'both')
+
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(storage_mode)
+        if dispatcher is None:
+            backend_classes = BACKENDS_BY_STORAGE_MODE.get(storage_mode)
+            if backend_classes is None:
+                print(f"[WARNING] Unknown storage_mode '{storage_mode}', using 'both'")
+                backend_classes = BACKENDS_BY_STORAGE_MODE['both']
+
+            dispatcher = StorageDispatcher(
+                [backend_class(config) for backend_class in backend_classes],
+                write_quorum=settings.get('write_quorum', 1),
+                write_timeout=float(settings.get('write_timeout_seconds', DEFAULT_WRITE_TIMEOUT)),
+            )
+            dispatcher.warm()
+            _dispatchers[storage_mode] = dispatcher
+
+    return dispatcher
@@ -0,0 +1,219 @@
+"""
+Vectorized hierarchical stratified sampling of videos.
+
+Each row of the metadata is assigned to one stratum cell (one level of every
+variable in variables_for_stratification) in a single grouping pass over the
+level codes. Quotas are then allocated on the small cell table, variable by
+variable in priority order: the first variable splits the target by its
+proportions, the second splits each of those counts, and so on. Every split
+uses largest-remainder rounding, so the quotas add up to exactly the target,
+and a stratum with too few videos passes its shortfall on to its siblings
+instead of shrinking the total. Finally the rows are ordered within each
+cell (randomly, or by an optional priority such as the current rating count
+with random tie-breaks) and the first `quota` rows of each cell are kept
+with NumPy index arithmetic.
+
+Usage (scaling benchmark):
+    python -m utils.stratified_sampler --rows 1000 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def largest_remainder(total, weights, capacities=None, rng=None):
+    """
+    Split an integer total in proportion to weights, with integer results.
+
+    Floors of the exact shares are handed out first, the remaining units go to
+    the largest fractional remainders; equal remainders are ordered at random,
+    so no level is favoured across sessions. With capacities, strata are capped
+    and the excess is re-split among the strata that still have room.
+
+    Parameters:
+        total: Integer to split
+        weights: Non-negative weights (need not sum to 1); zero-weight strata get nothing
+        capacities: Optional maximum per stratum
+        rng: numpy Generator for tie-breaks (default: fresh, unseeded)
+
+    Returns:
+        numpy int array that sums to total (or to the total capacity of the
+        positive-weight strata, if that is smaller)
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    weights = np.asarray(weights, dtype=float)
+    if capacities is None:
+        # No stratum can take more than the total (an int64-max cap would overflow the sum)
+        caps = np.full(len(weights), max(int(total), 0), dtype=np.int64)
+    else:
+        caps = np.asarray(capacities, dtype=np.int64)
+    caps = np.where(weights > 0, caps, 0)
+    total = int(min(total, caps.sum()))
+
+    allocation = np.zeros(len(weights), dtype=np.int64)
+    remaining = total
+    while remaining > 0:
+        active = weights * (allocation < caps)
+        shares = remaining * active / active.sum()
+        base = np.floor(shares).astype(np.int64)
+        extra = remaining - int(base.sum())
+        if extra:
+            # Largest remainders first, equal remainders in random order
+            remainders = np.round(shares - base, 9)
+            order = np.lexsort((rng.random(len(weights)), -remainders))
+            base[order[:extra]] += 1
+        allocation = np.minimum(allocation + base, caps)
+        remaining = total - int(allocation.sum())
+    return allocation
+
+
+def _allocate(capacity, target, proportions, rng):
+    """Hierarchical quotas for an n-d capacity array (one axis per variable)."""
+    if capacity.ndim == 0:
+        return np.array(min(target, int(capacity)))
+    child_capacity = capacity.reshape(capacity.shape[0], -1).sum(axis=1)
+    child_targets = largest_remainder(target, proportions[0], child_capacity, rng)
+    return np.stack([_allocate(capacity[i], int(child_targets[i]), proportions[1:], rng)
+                     for i in range(capacity.shape[0])])
+
+
+def _valid_strata(df, strat_config):
+    """Leading usable entries of strat_config (the original sampler's checks and warnings)."""
+    valid = []
+    for level, var_config in enumerate(strat_config):
+        variable = var_config.get('variable')
+        levels_list = var_config.get('levels', [])
+        proportions = var_config.get('proportions', [])
+
+        if not variable or not levels_list or not proportions:
+            print(f"[WARNING] Invalid stratification config at level {level}: {var_config}")
+            break
+        if len(levels_list) != len(proportions):
+            print(f"[WARNING] Levels and proportions length mismatch for '{variable}'")
+            break
+        if abs(sum(proportions) - 1.0) > 0.01:
+            print(f"[WARNING] Proportions for '{variable}' don't sum to 1.0: {sum(proportions)}")
+        if variable not in df.columns:
+            print(f"[WARNING] Variable '{variable}' not found in metadata. Skipping stratification.")
+            break
+        valid.append((variable, list(levels_list), np.asarray(proportions, dtype=float)))
+    return valid
+
+
+def _priority_order(cells, priority, rng):
+    """Row order grouped by cell; within a cell by ascending priority, ties in random order."""
+    tie_break = rng.random(len(cells))
+    if priority is None:
+        return np.lexsort((tie_break, cells))
+    return np.lexsort((tie_break, priority, cells))
+
+
+def _unstratified_sample(ids, target, rng, priority):
+    """The first `target` IDs in priority (or random) order, ignoring strata."""
+    target = len(ids) if target is None else min(target, len(ids))
+    order = _priority_order(np.zeros(len(ids), dtype=np.int64), priority, rng)
+    return ids[order[:target]].tolist()
+
+
+def stratified_sample(df, strat_config, target=None, rng=None, priority=None):
+    """
+    Select video IDs from metadata following the stratification proportions.
+
+    Parameters:
+        df: Metadata DataFrame with an 'id' column (one row per available video)
+        strat_config: List of {'variable', 'levels', 'proportions'} in priority order
+        target: Number of videos to select (None = all eligible)
+        rng: numpy Generator (default: fresh, unseeded)
+        priority: Optional per-row values (aligned with df); within each stratum
+            the lowest values are taken first, ties at random (default: all random)
+
+    Returns:
+        List of selected IDs, grouped by stratum (shuffle for presentation)
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    strata = _valid_strata(df, strat_config)
+    ids = df['id'].to_numpy()
+    if priority is not None:
+        priority = np.asarray(priority)
+
+    if not strata:
+        return _unstratified_sample(ids, target, rng, priority)
+
+    # Level codes per variable; rows outside the configured levels (or with proportion 0) are excluded
+    codes = np.empty((len(strata), len(df)), dtype=np.int64)
+    for axis, (variable, levels_list, proportions) in enumerate(strata):
+        codes[axis] = pd.Categorical(df[variable], categories=levels_list).codes
+    eligible = (codes >= 0).all(axis=0)
+    for axis, (_, _, proportions) in enumerate(strata):
+        eligible &= proportions[np.where(codes[axis] >= 0, codes[axis], 0)] > 0
+
+    if not eligible.any():
+        # Like the original sampler: fall back to the unfiltered candidates
+        variables = [variable for variable, _, _ in strata]
+        print(f"[WARNING] No videos found for the configured levels of {variables}, sampling without strata")
+        return _unstratified_sample(ids, target, rng, priority)
+
+    ids = ids[eligible]
+    if priority is not None:
+        priority = priority[eligible]
+    shape = tuple(len(levels_list) for _, levels_list, _ in strata)
+    cells = np.ravel_multi_index(codes[:, eligible], shape)
+    capacity = np.bincount(cells, minlength=int(np.prod(shape))).reshape(shape)
+
+    target = len(ids) if target is None else min(target, len(ids))
+    quotas = _allocate(capacity, target, [p for _, _, p in strata], rng).ravel()
+
+    # Priority (or random) order within each cell, then keep the first `quota` rows of every cell
+    order = _priority_order(cells, priority, rng)
+    sorted_cells = cells[order]
+    cell_starts = np.searchsorted(sorted_cells, np.arange(len(quotas)))
+    rank = np.arange(len(order)) - cell_starts[sorted_cells]
+    return ids[order[rank < quotas[sorted_cells]]].tolist()
+
+
+def _synthetic_metadata(rows, rng):
+    return pd.DataFrame({
+        'id': [f"vid_{i:06d}" for i in range(rows)],
+        'LowHighPD': rng.choice(['Low', 'High'], size=rows, p=[0.7, 0.3]),
+        'WinLoss': rng.choice(['Win', 'Loss'], size=rows),
+        'OlympicParalympic': rng.choice(['Olympic', 'Paralympic'], size=rows, p=[0.8, 0.2]),
+    })
+
+
+def run_benchmark(row_counts, target, repeats):
+    """Print the median sampling time for synthetic metadata of each size."""
+    strat_config = [
+        {'variable': 'LowHighPD', 'levels': ['Low', 'High'], 'proportions': [0.5, 0.5]},
+        {'variable': 'WinLoss', 'levels': ['Win', 'Loss'], 'proportions': [0.5, 0.5]},
+        {'variable': 'OlympicParalympic', 'levels': ['Olympic', 'Paralympic'], 'proportions': [0.5, 0.5]},
+    ]
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'target':>8} {'selected':>9} {'median ms':>10}")
+    for rows in row_counts:
+        df = _synthetic_metadata(rows, rng)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            selected = stratified_sample(df, strat_config, target, rng)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{rows:>10} {target:>8} {len(selected):>9} {float(np.median(timings)):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stratified sampler on synthetic metadata")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000], help="Metadata sizes")
+    parser.add_argument('--target', type=int, default=100, help="Videos to select per session")
+    parser.add_argument('--repeats', type=int, default=20, help="Runs per size (median reported)")
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.target, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Process-wide, case-insensitive index of known user IDs.
+
+Login checks and user ID generation used to download the whole users
+worksheet and list the local data folders on every rerun. A registry is
+kept per storage source: the "gsheets" registry is warmed once per process
+and refreshed incrementally (only rows appended since the last refresh are
+fetched); the "local" registry is built from user_data/ and the rating log
+and rebuilt only when user_data/ changes. Both are updated locally whenever
+save_user_data succeeds.
+"""
+import os
+import threading
+import time
+
+from utils.gsheets_manager import read_columns_from_gsheets
+from utils.rating_log import get_rating_log
+
+DEFAULT_REFRESH_TTL = 60.0       # seconds between background Sheets refreshes
+DEFAULT_MISS_REFRESH_MIN = 5.0   # min seconds between refreshes triggered by a miss
+USERS_WORKSHEET = "v2_ImageSliders_users"
+
+# Process-wide registry instances (source -> UserRegistry)
+_user_registries = {}
+_user_registries_lock = threading.Lock()
+
+
+class UserRegistry:
+    """
+    In-memory lowercase user ID index for one storage source.
+
+    Lookups are set membership tests. A hit never waits for the network; a
+    miss triggers at most one synchronous incremental refresh (rate-limited),
+    so a user who registered on another server process is still found.
+    """
+
+    def __init__(self, source='gsheets', worksheet=USERS_WORKSHEET,
+                 refresh_ttl=DEFAULT_REFRESH_TTL, miss_refresh_min=DEFAULT_MISS_REFRESH_MIN,
+                 config=None):
+        if source not in ('gsheets', 'local'):
+            raise ValueError(f"Unknown user registry source: {source}")
+
+        self.source = source
+        self.worksheet = worksheet
+        self.refresh_ttl = refresh_ttl
+        self.miss_refresh_min = miss_refresh_min
+        self.config = config
+
+        # lowercase ID -> ID as first seen (original case)
+        self._ids = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._next_row = 2           # gsheets: first row not yet read
+        self._user_data_mtime = None  # local: user_data/ mtime at last scan
+        self._last_refresh = 0.0
+        self._refresh_thread = None
+
+    def add(self, user_id):
+        """Register a user ID (e.g. after save_user_data succeeded)."""
+        if not user_id:
+            return
+        with self._lock:
+            self._ids.setdefault(str(user_id).lower(), str(user_id))
+
+    def _add_many(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                if user_id:
+                    self._ids.setdefault(str(user_id).lower(), str(user_id))
+
+    def warm(self):
+        """Load all known IDs from the registry's source."""
+        if self.source == 'local':
+            # Users that only appear in the local rating log
+            try:
+                self._add_many(
+                    record.get('user_id') for _, record in get_rating_log(self.config).iter_records()
+                )
+            except Exception as e:
+                print(f"[WARNING] Failed to read local rating log: {e}")
+
+        self.refresh()
+        print(f"[INFO] User registry ({self.source}) warmed with {len(self)} user IDs")
+
+    def _scan_user_data(self):
+        """Add user_data/{user_id}.json IDs if the folder changed since the last scan."""
+        if not os.path.exists('user_data'):
+            return
+
+        mtime = os.path.getmtime('user_data')
+        if mtime == self._user_data_mtime:
+            return
+
+        self._add_many(
+            filename[:-len('.json')] for filename in os.listdir('user_data')
+            if filename.endswith('.json')
+        )
+        self._user_data_mtime = mtime
+
+    def refresh(self):
+        """
+        Pick up user IDs added by other processes since the last refresh.
+
+        Returns:
+            True if the source was read, False on failure
+        """
+        with self._refresh_lock:
+            try:
+                if self.source == 'local':
+                    self._scan_user_data()
+                    return True
+
+                result = read_columns_from_gsheets(['user_id'], self.worksheet, start_row=self._next_row)
+                if result is None:
+                    return False
+
+                column_values, next_row = result
+                self._add_many(column_values['user_id'])
+                self._next_row = next_row
+                return True
+
+            except Exception as e:
+                print(f"[WARNING] User registry refresh ({self.source}) failed: {e}")
+                return False
+
+            finally:
+                self._last_refresh = time.monotonic()
+
+    def _refresh_in_background(self):
+        """Start a background refresh unless one is already running."""
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(target=self.refresh, name='user-registry-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def contains(self, user_id):
+        """
+        Check if a user ID is known (case-insensitive).
+
+        Parameters:
+            user_id: User identifier to check
+
+        Returns:
+            True if the user exists, False otherwise
+        """
+        key = str(user_id).lower()
+        age = time.monotonic() - self._last_refresh
+
+        with self._lock:
+            found = key in self._ids
+
+        if found:
+            if age > self.refresh_ttl:
+                self._refresh_in_background()
+            return True
+
+        # Miss: the ID may have been registered by another process
+        if age > self.miss_refresh_min:
+            self.refresh()
+            with self._lock:
+                return key in self._ids
+
+        return False
+
+    def all_ids(self):
+        """Return all known user IDs (original case)."""
+        if time.monotonic() - self._last_refresh > self.refresh_ttl:
+            self.refresh()
+        with self._lock:
+            return list(self._ids.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+
+def get_user_registry(config, source='gsheets'):
+    """
+    Get or create (and warm) the process-wide user registry for a source.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.user_registry_ttl_seconds)
+        source: "gsheets" (users worksheet) or "local" (user_data/ + rating log)
+
+    Returns:
+        UserRegistry instance
+    """
+    with _user_registries_lock:
+        registry = _user_registries.get(source)
+        if registry is None:
+            settings = (config or {}).get('settings', {}) or {}
+            registry = UserRegistry(
+                source=source,
+                refresh_ttl=float(settings.get('user_registry_ttl_seconds', DEFAULT_REFRESH_TTL)),
+                config=config,
+            )
+            registry.warm()
+            _user_registries[source] = registry
+
+    return registry
@@ -0,0 +1,252 @@
+"""
+Time-limited video reservations (leases) for concurrent sessions.
+
+When many participants start at once, every session sees the same rating
+counts and draws the same under-rated videos, so those videos overshoot
+min_ratings_per_video. A video assigned to a session is therefore leased to
+it: the lease counts as a pending rating until the video is rated or the
+lease expires (abandoned session). Assignment treats rating count + active
+leases as the video's count.
+
+A saved rating does not end its lease at once: other processes see it only
+after their rating count index refreshes (rating_count_ttl_seconds) and, in
+online mode, after the write-behind spool is flushed. Until then the video
+would be neither leased nor counted. The lease is therefore marked rated and
+kept for that visibility window (rated_hold_seconds) before it expires. The
+process that saved the rating counts it at once, so a rated lease is only
+counted as pending by the other processes; with SQLite storage every process
+reads the same database and rated leases are not kept at all.
+
+Leases live in a small SQLite table (WAL mode, one connection per thread).
+Assignment runs inside a BEGIN IMMEDIATE transaction, which takes the
+database write lock, so concurrent assignments in other threads and
+processes on the same host are serialized and each one sees the leases
+granted before it.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.rating_counts import DEFAULT_REFRESH_TTL
+from utils.rating_queue import DEFAULT_FLUSH_INTERVAL, is_write_behind_enabled
+
+DEFAULT_LEASE_PATH = 'data_store/video_leases.sqlite3'
+DEFAULT_TTL_MINUTES = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    video_id    TEXT NOT NULL,
+    session_id  TEXT NOT NULL,
+    user_id     TEXT NOT NULL,
+    expires_at  REAL NOT NULL,
+    rated       INTEGER NOT NULL DEFAULT 0,
+    process_id  TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (video_id, session_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_leases_session ON leases (session_id);
+CREATE INDEX IF NOT EXISTS idx_leases_expires ON leases (expires_at);
+"""
+
+# Identifies the leases written by this process (its rating counts already include their ratings)
+PROCESS_ID = uuid.uuid4().hex
+
+# Leases that count as pending for this process: unrated ones, and rated ones
+# whose rating was saved in another process and may not be counted here yet
+_PENDING_CONDITION = "(rated = 0 OR process_id != ?)"
+
+# Process-wide lease table instances (path -> VideoLeaseTable)
+_lease_tables = {}
+_lease_tables_lock = threading.Lock()
+
+
+class VideoLeaseTable:
+    """
+    SQLite-backed leases: video ID -> sessions holding it until expires_at.
+
+    Parameters:
+        db_path: Path to the SQLite database file
+        ttl_seconds: Lease lifetime; renewed whenever the session saves a rating
+        rated_hold_seconds: How long a rated video's lease is kept, until the
+            rating is visible to every process's rating counts
+    """
+
+    def __init__(self, db_path=DEFAULT_LEASE_PATH, ttl_seconds=DEFAULT_TTL_MINUTES * 60,
+                 rated_hold_seconds=DEFAULT_REFRESH_TTL + DEFAULT_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.rated_hold_seconds = rated_hold_seconds
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(leases)")}
+        if 'rated' not in columns:
+            # Lease tables created before rated leases were kept
+            conn.execute("ALTER TABLE leases ADD COLUMN rated INTEGER NOT NULL DEFAULT 0")
+        if 'process_id' not in columns:
+            conn.execute("ALTER TABLE leases ADD COLUMN process_id TEXT NOT NULL DEFAULT ''")
+
+    def _connection(self):
+        """This thread's connection (autocommit mode; transactions are explicit)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, session_id, user_id, select):
+        """
+        Choose videos for a session and lease them, atomically across processes.
+
+        Expired leases are purged and the session's previous unrated leases
+        are dropped (re-initialisation) before select() is called; its rated
+        leases stay until their hold expires.
+
+        Parameters:
+            session_id: Unique ID of the Streamlit session
+            user_id: Participant ID (for inspection only)
+            select: Callable(pending) -> list of video IDs, where pending maps
+                video ID -> number of active unrated leases of other sessions plus
+                rated leases saved by other processes (this process's rating
+                counts already include its own ratings, this session's too)
+
+        Returns:
+            List of leased video IDs (as returned by select)
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("DELETE FROM leases WHERE expires_at <= ? OR (session_id = ? AND rated = 0)",
+                         (now, session_id))
+            pending = dict(conn.execute(
+                f"SELECT video_id, COUNT(*) FROM leases WHERE {_PENDING_CONDITION} GROUP BY video_id",
+                (PROCESS_ID,)
+            ))
+
+            selected = select(pending)
+
+            expires_at = now + self.ttl_seconds
+            conn.executemany(
+                "INSERT OR REPLACE INTO leases (video_id, session_id, user_id, expires_at, rated, process_id) "
+                "VALUES (?, ?, ?, ?, 0, ?)",
+                [(str(video_id), session_id, str(user_id), expires_at, PROCESS_ID) for video_id in selected]
+            )
+            conn.execute('COMMIT')
+            return selected
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release(self, session_id, video_id):
+        """
+        Mark a lease rated and renew the session's other leases.
+
+        The rated lease is kept for rated_hold_seconds, so the video stays
+        counted in the other processes until they see the new rating (it is
+        deleted at once if the hold is 0).
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.rated_hold_seconds > 0:
+                conn.execute("UPDATE leases SET rated = 1, expires_at = ?, process_id = ? "
+                             "WHERE session_id = ? AND video_id = ?",
+                             (now + self.rated_hold_seconds, PROCESS_ID, session_id, str(video_id)))
+            else:
+                conn.execute("DELETE FROM leases WHERE session_id = ? AND video_id = ?", (session_id, str(video_id)))
+            conn.execute("UPDATE leases SET expires_at = ? WHERE session_id = ? AND rated = 0",
+                         (now + self.ttl_seconds, session_id))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release_session(self, session_id):
+        """
+        Delete the unrated leases of a session (finished or left the rating page).
+
+        Rated leases are kept until their hold expires (see release()).
+        """
+        self._connection().execute("DELETE FROM leases WHERE session_id = ? AND rated = 0", (session_id,))
+
+    def pending_counts(self, video_ids=None):
+        """
+        Number of active (unexpired) leases per video, as counted by this process.
+
+        Rated leases saved by this process are left out: its rating counts
+        already include them.
+
+        Parameters:
+            video_ids: Optional IDs to restrict to
+
+        Returns:
+            Dict video ID -> number of active leases (only leased videos)
+        """
+        rows = self._connection().execute(
+            f"SELECT video_id, COUNT(*) FROM leases WHERE expires_at > ? AND {_PENDING_CONDITION} GROUP BY video_id",
+            (time.time(), PROCESS_ID)
+        )
+        pending = dict(rows)
+        if video_ids is not None:
+            wanted = {str(v) for v in video_ids}
+            pending = {v: n for v, n in pending.items() if v in wanted}
+        return pending
+
+
+def is_leasing_enabled(config):
+    """Return True if settings.video_leases.enabled is set."""
+    settings = (config or {}).get('settings', {}) or {}
+    return bool((settings.get('video_leases', {}) or {}).get('enabled', False))
+
+
+def rated_hold_seconds(config):
+    """
+    Seconds until a saved rating is visible to every process: count refresh + spool flush.
+
+    0 with SQLite storage, whose counts are read from the shared database.
+    """
+    settings = (config or {}).get('settings', {}) or {}
+    if settings.get('storage_mode') == 'sqlite':
+        return 0.0
+    hold = float(settings.get('rating_count_ttl_seconds', DEFAULT_REFRESH_TTL))
+    if is_write_behind_enabled(config or {}):
+        write_behind = settings.get('write_behind', {}) or {}
+        hold += float(write_behind.get('flush_interval_seconds', DEFAULT_FLUSH_INTERVAL))
+    return hold
+
+
+def get_lease_table(config):
+    """
+    Get or create the process-wide lease table.
+
+    Parameters:
+        config: Configuration dictionary (reads settings.video_leases: path, ttl_minutes;
+            the rated hold is rating_count_ttl_seconds plus the write-behind flush interval)
+
+    Returns:
+        VideoLeaseTable instance
+    """
+    settings = (config or {}).get('settings', {}) or {}
+    lease_config = settings.get('video_leases', {}) or {}
+    db_path = lease_config.get('path', DEFAULT_LEASE_PATH)
+
+    with _lease_tables_lock:
+        table = _lease_tables.get(db_path)
+        if table is None:
+            ttl_minutes = float(lease_config.get('ttl_minutes', DEFAULT_TTL_MINUTES))
+            table = VideoLeaseTable(db_path, ttl_seconds=ttl_minutes * 60,
+                                    rated_hold_seconds=rated_hold_seconds(config))
+            _lease_tables[db_path] = table
+
+    return table
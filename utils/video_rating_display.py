@@ -3,8 +3,155 @@ Shared display logic for video rating interface.
 Used by both main videoplayer and familiarization screens.
 """
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 
+from utils.media_manifest import get_folder_entries
+from utils.media_server import get_video_src
+
+IMAGE_EXTENSIONS = ('.webp', '.jpg', '.jpeg', '.png')
+
+# Timeline of the image study clips (see convert_images_to_videos.sh)
+DEFAULT_IMAGE_TIMING = {
+    'black_intro_seconds': 0.5,
+    'show_seconds': 2.0,
+    'black_end_seconds': 0.0,
+}
+
+# The once-mode video players stop at this mark of the clip (pages/videoplayer.py,
+# pages/familiarization.py); once-mode images are cut at the same point, so
+# switching stimulus_type does not change the exposure time
+ONCE_MODE_STOP_SECONDS = 2.0
+
+
+def find_stimulus_image(video_file_path, config):
+    """
+    Find the still image for a trial in image mode (settings.stimulus_type: "image").
+
+    Trials keep their video filenames (IDs, ratings and quotas are unchanged);
+    the image with the same stem is looked up in paths.image_path (or
+    paths.familiarization_image_path for familiarization videos).
+
+    Parameters:
+    - video_file_path: Path of the trial's video file
+    - config: Configuration dictionary
+
+    Returns:
+    - Path to the image file, or None if there is none
+    """
+    paths = config.get('paths', {})
+    video_dir = os.path.normpath(os.path.dirname(video_file_path))
+    if video_dir == os.path.normpath(paths.get('familiarization_video_path', '')):
+        image_dir = paths.get('familiarization_image_path')
+    else:
+        image_dir = paths.get('image_path')
+    if not image_dir:
+        return None
+
+    # Looked up in the in-memory media manifest, not on the filesystem
+    entries = get_folder_entries(image_dir)
+    stem = os.path.splitext(os.path.basename(video_file_path))[0]
+    for extension in IMAGE_EXTENSIONS:
+        if stem + extension in entries:
+            return os.path.join(image_dir, stem + extension)
+    return None
+
+
+def display_image_with_timeline(image_file_path, config, playback_mode='once', video_width=None):
+    """
+    Show a still image with the black intro / show / black timeline, timed in the browser.
+
+    The timeline starts only once the image is decoded, so loading time never
+    shortens the presentation. In 'once' mode the image is hidden at
+    ONCE_MODE_STOP_SECONDS, where the once-mode video pauses, and the frame
+    stays black afterwards (like the video resetting to its black first
+    frame); in 'loop' mode the whole timeline plays and repeats.
+
+    Parameters:
+    - image_file_path: Path to the image file
+    - config: Configuration dictionary (reads settings.image_timing)
+    - playback_mode: 'once' or 'loop'
+    - video_width: Width in pixels or percentage string (None = full width)
+    """
+    timing = dict(DEFAULT_IMAGE_TIMING)
+    timing.update(config['settings'].get('image_timing', {}) or {})
+    intro_seconds = float(timing['black_intro_seconds'])
+    show_seconds = float(timing['show_seconds'])
+    if playback_mode != 'loop':
+        show_seconds = min(show_seconds, max(0.0, ONCE_MODE_STOP_SECONDS - intro_seconds))
+
+    image_src = get_video_src(image_file_path, config)
+
+    # Determine width style
+    if video_width:
+        if isinstance(video_width, str) and '%' in video_width:
+            width_style = f"width: {video_width};"
+        else:
+            width_style = f"width: {video_width}px;"
+    else:
+        width_style = "width: 100%;"
+
+    image_html = f"""
+    <div style="width: 100%; height: 100vh; display: flex; align-items: center; justify-content: center; background: transparent;">
+        <div style="{width_style} max-width: 100%; max-height: 85vh; aspect-ratio: 16 / 9; background: black;">
+            <img id="stimulus-image" src="{image_src}" alt=""
+                 style="width: 100%; height: 100%; object-fit: contain; visibility: hidden;">
+        </div>
+    </div>
+    <script>
+        const image = document.getElementById('stimulus-image');
+        const introMs = {intro_seconds * 1000};
+        const showMs = {show_seconds * 1000};
+        const endMs = {float(timing['black_end_seconds']) * 1000};
+        const loop = {'true' if playback_mode == 'loop' else 'false'};
+
+        // Black intro, image, then black; frame-accurate via requestAnimationFrame
+        function runTimeline() {{
+            const start = performance.now();
+            function tick(now) {{
+                const elapsed = now - start;
+                image.style.visibility = (elapsed >= introMs && elapsed < introMs + showMs) ? 'visible' : 'hidden';
+                if (elapsed < introMs + showMs) {{
+                    requestAnimationFrame(tick);
+                }} else if (loop) {{
+                    setTimeout(runTimeline, endMs);
+                }}
+            }}
+            requestAnimationFrame(tick);
+        }}
+
+        (image.decode ? image.decode() : Promise.resolve()).then(runTimeline, runTimeline);
+    </script>
+    """
+    components.html(image_html, height=700)
+
+
+def display_stimulus(video_file, config, display_video_func, video_playback_mode, video_width=None):
+    """
+    Display a trial's stimulus: the video, or its still image in image mode.
+
+    Parameters:
+    - video_file: Path to the trial's video file
+    - config: Configuration dictionary
+    - display_video_func: Function to display video (should accept file_path and playback_mode)
+    - video_playback_mode: 'loop' or 'once'
+    - video_width: Optional width passed to the player
+    """
+    if config['settings'].get('stimulus_type', 'video') == 'image':
+        image_file = find_stimulus_image(video_file, config)
+        if image_file:
+            display_image_with_timeline(image_file, config, video_playback_mode, video_width)
+            return
+        print(f"[WARNING] No image found for {video_file}, showing the video instead")
+
+    if display_video_func:
+        if video_width is not None:
+            display_video_func(video_file, video_playback_mode, video_width, enable_auto_advance=False)
+        else:
+            display_video_func(video_file, video_playback_mode)
+    else:
+        st.video(video_file, autoplay=True, loop=(video_playback_mode == 'loop'))
+
 
 def display_video_only(video_filename, video_path, config, display_video_func, action_id=None, metadata=None):
     """
@@ -45,10 +192,7 @@ def display_video_only(video_filename, video_path, config, display_video_func, a
 
     # Display centered video (no spacing/divider)
     video_file = os.path.join(video_path, video_filename)
-    if display_video_func:
-        display_video_func(video_file, video_playback_mode, video_width, enable_auto_advance=False)
-    else:
-        st.video(video_file, autoplay=True, loop=(video_playback_mode == 'loop'))
+    display_stimulus(video_file, config, display_video_func, video_playback_mode, video_width)
 
 
 def display_rating_scales_only(video_filename, rating_scales, key_prefix, action_id=None):
@@ -275,10 +419,7 @@ def display_video_rating_interface(
 
         with col_video:
             video_file = os.path.join(video_path, video_filename)
-            if display_video_func:
-                display_video_func(video_file, video_playback_mode)
-            else:
-                st.video(video_file, autoplay=True, loop=(video_playback_mode == 'loop'))
+            display_stimulus(video_file, config, display_video_func, video_playback_mode)
 
         with col_pitch:
             # Generate pitch visualization
@@ -325,10 +466,7 @@ def display_video_rating_interface(
 
         with col_video:
             video_file = os.path.join(video_path, video_filename)
-            if display_video_func:
-                display_video_func(video_file, video_playback_mode)
-            else:
-                st.video(video_file, autoplay=True, loop=(video_playback_mode == 'loop'))
+            display_stimulus(video_file, config, display_video_func, video_playback_mode)
 
         with col_rating_scales:
             # Display rating scales